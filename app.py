@@ -1,42 +1,167 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context, abort, current_app
+import itertools
+import json
 import os
-import uuid
+import posixpath
+import threading
+import click
 from datetime import datetime
+from flask.cli import with_appcontext
 from werkzeug.utils import secure_filename
-from flask_migrate import Migrate
-from modules.database import db, init_app
-from modules.models import WardrobeItem
-from modules.garment_analyzer import analyze_garment, save_color_analysis_image
-from modules.outfit_generator import OutfitGenerator, SavedOutfit
+from modules.database import db, init_app, init_migrations
+from modules.models import WardrobeItem, AnalysisJob, DEFAULT_OWNER_ID
+from modules.analysis_cache import AnalysisCache
+from modules.blob_store import BlobStore
+from modules.thumbnails import ThumbnailStore, FORMATS as THUMBNAIL_FORMATS
+from modules.asset_server import AssetServer
+from modules.analysis_jobs import AnalysisWorker
+from modules.bulk_import import BulkImporter, iter_directory, iter_uploads
+from modules.garment_classifier import get_classifier, get_batcher
+from modules.outfit_generator import (OutfitGenerator, SavedOutfit, saved_outfits_page,
+                                     SEASON_CATEGORY_RULES, STYLE_COMPATIBILITY, COLOR_SCHEMES, OUTFIT_MODES)
+from modules.wardrobe_index import WardrobeIndex
+from modules.pagination import encode_cursor, decode_cursor
+from modules.feature_store import FeatureStore
+from modules.similarity import SimilaritySearch
+from modules.wardrobe_queries import WARDROBE_FILTERS, wardrobe_page, category_counts
+from modules import tenancy, instrumentation, color_compatibility
+from modules.tenancy import current_owner_id, owner_shard
 
-# Create Flask application
-app = Flask(__name__)
-
-# Load configuration
-app.config.from_pyfile('config.py')
-
-# Initialize database with Flask-SQLAlchemy
-init_app(app)
+def create_app(config=None):
+    """
+    Create the Flask application with its configuration, database, extensions and routes.
+    
+    Startup is kept cheap for worker boot and autoscaling: the database is
+    not touched (the schema is managed by the migrations, 'flask db
+    upgrade'), Alembic is only loaded for the flask command, and the
+    analysis stack (OpenCV, the quantizers, the classifier) is loaded by the
+    first analysis or by warmup().
+    
+    Every call returns a new application (e.g. one per test) whose services,
+    caches and in-memory indexes live in app.extensions, so two apps on
+    different databases never share data. The analyzer settings (color
+    quantizer, color naming, classifier) are the exception: they are per
+    process, taken from the first app that analyzes an image.
+    
+    Args:
+        config: Optional dictionary of settings applied over config.py and
+            the environment
+    
+    Returns:
+        The configured Flask application
+    """
+    app = Flask(__name__)
+    
+    # Load configuration
+    app.config.from_pyfile('config.py')
+    
+    # Any setting can be overridden from the environment, e.g. FLASK_ANALYSIS_WORKERS=0
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+    
+    # Initialize database with Flask-SQLAlchemy
+    init_app(app)
+    
+    # Initialize Flask-Migrate (for the 'flask db' commands)
+    init_migrations(app)
+    
+    # Resolve the owner (tenant) of every request; all wardrobe queries are scoped to it
+    tenancy.init_app(app)
+    
+    # Per-request timings and SQL statement counts for /metrics (and Server-Timing)
+    instrumentation.init_app(app)
+    
+    # Initialize the persistent analysis cache
+    cache_file = app.config.get('ANALYSIS_CACHE_FILE')
+    app.extensions['analysis_cache'] = AnalysisCache(os.path.join(app.instance_path, cache_file),
+                                                     app.config.get('ANALYSIS_CACHE_MAX_ENTRIES', 2000),
+                                                     app.config.get('ANALYSIS_CACHE_TOUCH_INTERVAL', 60)) \
+        if cache_file else None
+    
+    # Compile the outfit color compatibility rules for this app
+    color_compatibility.init_app(app)
+    
+    # Content-addressed storage for uploaded images (creates the upload folder)
+    blob_store = app.extensions['blob_store'] = BlobStore(app.static_folder, app.config['UPLOAD_FOLDER'])
+    
+    # Uploads and thumbnails with strong ETags and immutable caching (optionally via X-Sendfile/X-Accel-Redirect)
+    AssetServer(app)
+    
+    # Resized WebP/JPEG derivatives of the uploads, generated on first request
+    app.extensions['thumbnail_store'] = ThumbnailStore(blob_store, app.config.get('THUMBNAIL_WIDTHS', (200, 400, 800)),
+                                                       app.config.get('THUMBNAIL_QUALITY', 80))
+    
+    # Garment analysis: on a local process pool, or in this process (loaded on first use)
+    analysis_worker = AnalysisWorker(app)
+    
+    # Bulk wardrobe import (endpoint and CLI)
+    app.extensions['bulk_importer'] = BulkImporter(blob_store, analysis_worker,
+                                                   batch_size=app.config.get('IMPORT_BATCH_SIZE', 50))
+    
+    # In-memory wardrobe index for outfit generation, kept current by session events
+    WardrobeIndex(app=app)
+    
+    # Palettes of every item as one NumPy matrix, kept current the same way
+    feature_store = FeatureStore(app)
+    
+    # "Find similar items" over the palette matrix
+    SimilaritySearch(feature_store).init_app(app)
+    
+    register_routes(app)
+    register_commands(app)
+    
+    if app.config.get('WARMUP_ON_STARTUP'):
+        threading.Thread(target=warmup, args=(app,), name='warmup', daemon=True).start()
+    
+    return app
 
-# Initialize Flask-Migrate
-migrate = Migrate(app, db)
+def warmup(app):
+    """
+    Load everything startup defers, so the first requests are not slower.
+    
+    Imports and configures the analysis stack (loading the classifier
+    model), imports Pillow for thumbnails and builds the palette matrix of
+    the default owner.
+    Runs in the background at startup when WARMUP_ON_STARTUP is set, or can
+    be called from a server hook (e.g. gunicorn's post_worker_init).
+    
+    Args:
+        app: Application returned by create_app()
+    """
+    try:
+        app.extensions['analysis_worker'].load_analyzer()
+        import PIL.Image  # Used by the first thumbnail
+        with app.app_context():
+            app.extensions['feature_store'].for_owner(DEFAULT_OWNER_ID).matrix()
+    except Exception:
+        app.logger.exception("Error during warmup")
 
-# Ensure upload directory exists
-upload_dir = os.path.join('static', app.config['UPLOAD_FOLDER'])
-os.makedirs(upload_dir, exist_ok=True)
+def service(name):
+    """Service create_app() attached to the current application, e.g. 'blob_store'"""
+    return current_app.extensions[name]
 
 def allowed_file(filename):
     """Check if the file has an allowed extension"""
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+def thumbnail_url(image_path, width, fmt='jpeg'):
+    """URL of a resized derivative of an uploaded image"""
+    return url_for('thumbnail', width=width, fmt=fmt, image_path=image_path.replace('\\', '/').removeprefix('static/'))
+
+def thumbnail_srcset(image_path, fmt='jpeg'):
+    """srcset attribute value listing every thumbnail width of an image"""
+    return ', '.join(f"{thumbnail_url(image_path, width, fmt)} {width}w" for width in service('thumbnail_store').widths)
+
+def thumbnail_widths():
+    return {'thumbnail_widths': list(service('thumbnail_store').widths)}
 
 # Routes
-@app.route('/')
 def index():
     """Render the home page"""
     return render_template('index.html')
 
-@app.route('/analyze-image', methods=['POST'])
 def analyze_image():
     """Analyze an uploaded image using AI"""
     if 'file' not in request.files:
@@ -47,35 +172,58 @@ def analyze_image():
         return jsonify({'error': 'No selected file'}), 400
     
     if file and allowed_file(file.filename):
-        # Save temporarily
-        temp_filename = 'temp_' + secure_filename(file.filename)
-        temp_path = os.path.join(upload_dir, temp_filename)
-        file.save(temp_path)
+        # The analysis stack is loaded by the first analysis, not at startup
+        analyzer = service('analysis_worker').load_analyzer()
         
-        # Analyze the image
-        analysis = analyze_garment(temp_path)
+        # Decode straight from the in-memory upload; nothing is written to disk
+        pipeline = analyzer.ImagePipeline.from_upload(file)
         
-        # Create color analysis visualization if the function exists
-        if analysis.get('color_analysis') and 'save_color_analysis_image' in globals():
-            viz_filename = 'color_analysis_' + temp_filename
-            viz_path = os.path.join(upload_dir, viz_filename)
-            try:
-                save_color_analysis_image(temp_path, analysis['color_analysis'], viz_path)
-                analysis['color_visualization'] = os.path.join(app.config['UPLOAD_FOLDER'], viz_filename)
-            except Exception as e:
-                print(f"Error creating color visualization: {e}")
+        # Analyze the image, optionally within a caller-supplied latency budget
+        analysis = analyzer.analyze_garment(pipeline, budget_ms=request.args.get('budget_ms', type=int))
         
-        # Clean up temp file
-        try:
-            os.remove(temp_path)
-        except:
-            pass
+        # Create color analysis visualization
+        if analysis.get('color_analysis'):
+            # Named by content hash so re-submitting the same image reuses the file
+            viz_filename = 'color_analysis_' + service('blob_store').blob_name(pipeline.digest, secure_filename(file.filename))
+            viz_path = os.path.join(service('blob_store').directory, viz_filename)
+            try:
+                analyzer.save_color_analysis_image(pipeline, analysis['color_analysis'], viz_path)
+                analysis['color_visualization'] = os.path.join(current_app.config['UPLOAD_FOLDER'], viz_filename)
+            except Exception:
+                current_app.logger.exception("Error creating color visualization")
         
         return jsonify(analysis)
     
     return jsonify({'error': 'Invalid file type'}), 400
 
-@app.route('/upload', methods=['GET', 'POST'])
+def analysis_cache_stats():
+    """Report hit/miss counts for the analysis cache"""
+    cache = service('analysis_cache')
+    if cache is None:
+        return jsonify({'enabled': False})
+    
+    stats = cache.stats()
+    stats['enabled'] = True
+    return jsonify(stats)
+
+def classifier_stats():
+    """Report micro-batch sizes, latency and throughput of the garment classifier"""
+    classifier = get_classifier()
+    if classifier is None:
+        return jsonify({'enabled': False})
+    
+    batcher = get_batcher()
+    return jsonify({
+        'enabled': True,
+        'loaded': classifier.loaded,
+        'categories': list(classifier.categories),
+        'batches': batcher.stats() if batcher is not None else {}
+    })
+
+def metrics():
+    """Request, SQL and stage timing histograms in the Prometheus text format"""
+    return Response(instrumentation.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def upload():
     """Handle file uploads and garment information"""
     if request.method == 'POST':
@@ -93,16 +241,13 @@ def upload():
             return redirect(request.url)
         
         if file and allowed_file(file.filename):
-            # Generate a unique filename
-            filename = str(uuid.uuid4()) + '_' + secure_filename(file.filename)
-            
-            # Create uploads directory inside static if it doesn't exist
-            upload_dir = os.path.join('static', app.config['UPLOAD_FOLDER'])
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Save the file to the static/uploads directory
-            filepath = os.path.join(upload_dir, filename)
-            file.save(filepath)
+            # Store the file under its content hash; identical uploads share one blob
+            # The returned path is relative to the static folder for url_for to work
+            # Each owner's images live in their own shard of the upload folder
+            owner_id = current_owner_id()
+            data = file.read()
+            with instrumentation.span('upload.store'):
+                relative_path = service('blob_store').put(data, secure_filename(file.filename), shard=owner_shard(owner_id))
             
             # Get form data
             name = request.form.get('name')
@@ -110,88 +255,201 @@ def upload():
             color = request.form.get('color')
             season = request.form.get('season')
             
-            # Analyze the image to extract features
-            # We need to pass the full path for analysis
-            analysis = analyze_garment(filepath)
-            features = analysis.get('features', {})
-            
-            # Store the path relative to the static folder for url_for to work
-            # This is the key change - store only the relative path from static
-            relative_path = app.config['UPLOAD_FOLDER'] + '/' + filename
-            
             item = WardrobeItem(
                 name=name,
                 category=category,
                 color=color,
                 season=season,
-                image_path=relative_path,  # This should be like 'uploads/filename.jpg'
-                features=features
+                image_path=relative_path,  # This should be like 'uploads/u1/filename.jpg'
+                status='pending',
+                owner_id=owner_id
             )
             
             # Use Flask-SQLAlchemy's session
             db.session.add(item)
             db.session.commit()
+            # An item deleted meanwhile may have taken the shared blob with it
+            service('blob_store').ensure(relative_path, lambda: data)
+            
+            # Extract features in the background; the wardrobe page polls for the result
+            service('analysis_worker').submit(item)
             
             flash('Item added successfully!', 'success')
             return redirect(url_for('wardrobe'))
         else:
             flash('Invalid file type. Please upload an image.', 'error')
             return redirect(request.url)
-            
+    
     return render_template('upload.html')
 
-@app.route('/wardrobe')
+def import_items():
+    """Import many images (or zip archives of images) at once"""
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    if not uploads:
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    season = request.form.get('season', 'all')
+    category = request.form.get('category') or None
+    results = service('bulk_importer').iter_import(iter_uploads(uploads), season=season, category=category,
+                                                   owner_id=current_owner_id())
+    
+    # With ?stream=1 each per-file result is sent as an NDJSON line as soon as it is known
+    if request.args.get('stream'):
+        def generate():
+            for result in results:
+                yield json.dumps(result) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    results = list(results)
+    imported = sum(1 for result in results if result['status'] == 'imported')
+    return jsonify({'imported': imported, 'errors': len(results) - imported, 'results': results})
+
+def wardrobe_filters():
+    """Wardrobe filters (?category=, ?season=, ?color=) present in the query string"""
+    return {name: request.args[name] for name in WARDROBE_FILTERS if request.args.get(name)}
+
 def wardrobe():
-    """Display the user's wardrobe"""
-    items = WardrobeItem.query.order_by(WardrobeItem.date_added.desc()).all()
-    return render_template('wardrobe.html', items=items)
+    """Display the first page of the user's wardrobe; later pages load from /api/wardrobe"""
+    filters = wardrobe_filters()
+    try:
+        items, next_cursor = wardrobe_page(current_owner_id(), request.args.get('cursor'),
+                                           current_app.config.get('WARDROBE_PAGE_SIZE', 24), **filters)
+    except ValueError:
+        return redirect(url_for('wardrobe', **filters))
+    counts = category_counts(current_owner_id(), **{name: value for name, value in filters.items() if name != 'category'})
+    return render_template('wardrobe.html', items=items, next_cursor=next_cursor, filters=filters,
+                           counts=counts, total_count=sum(counts.values()))
 
-@app.route('/delete-item/<int:item_id>', methods=['POST'])
-def delete_item(item_id):
-    """Delete an item from the wardrobe"""
-    # Now we can use get_or_404 with Flask-SQLAlchemy
-    item = WardrobeItem.query.get_or_404(item_id)
+def wardrobe_api():
+    """Wardrobe items as JSON, newest first, with filters and keyset pagination (?cursor=, ?limit=)"""
+    page_size = current_app.config.get('WARDROBE_PAGE_SIZE', 24)
+    limit = max(1, min(request.args.get('limit', page_size, type=int), 100))
+    try:
+        items, next_cursor = wardrobe_page(current_owner_id(), request.args.get('cursor'), limit, **wardrobe_filters())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"items": [item.to_dict() for item in items], "next_cursor": next_cursor})
+
+def wardrobe_counts_api():
+    """Number of wardrobe items per category (?season=, ?color= narrow the count)"""
+    filters = {name: value for name, value in wardrobe_filters().items() if name != 'category'}
+    return jsonify({"counts": category_counts(current_owner_id(), **filters)})
+
+def thumbnail(width, fmt, image_path):
+    """Serve a thumbnail of an uploaded image, generating it on first request"""
+    image_path = posixpath.normpath(image_path)
+    if not image_path.startswith(current_app.config['UPLOAD_FOLDER'] + '/') or fmt not in THUMBNAIL_FORMATS:
+        abort(404)
+    
+    # Other owners' images are reported as missing, before any thumbnail is generated
+    asset_server = service('asset_server')
+    asset_server.authorize(image_path)
     
-    # Delete the image file
+    thumbnail_store = service('thumbnail_store')
     try:
-        # Correct path for deletion
-        file_path = os.path.join(app.root_path, 'static', item.image_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception as e:
-        # Log the error but continue
-        print(f"Error deleting file: {e}")
+        thumbnail_store.get(image_path, width, fmt)
+    except (ValueError, FileNotFoundError):
+        abort(404)
+    except Exception:
+        # Not a readable image; fall back to the original file
+        current_app.logger.exception("Error generating thumbnail for %s", image_path)
+        return redirect(url_for('static', filename=image_path))
+    
+    return asset_server.send(thumbnail_store.relative_path(image_path, width, fmt), THUMBNAIL_FORMATS[fmt]['mimetype'])
+
+def delete_item(item_id):
+    """Delete an item from the wardrobe"""
+    # Other owners' items are reported as missing
+    item = WardrobeItem.query.filter_by(id=item_id, owner_id=current_owner_id()).first_or_404()
+    image_path = item.image_path
     
     # Delete from database using Flask-SQLAlchemy's session
     db.session.delete(item)
     db.session.commit()
     
+    # Delete the image file, unless another item shares the same blob
+    try:
+        service('blob_store').release(image_path, lambda: WardrobeItem.count_image_references(image_path))
+    except Exception:
+        # Log the error but continue
+        current_app.logger.exception("Error deleting file %s", image_path)
+    
     flash('Item deleted successfully!', 'success')
     return redirect(url_for('wardrobe'))
 
-@app.route('/outfits')
+def similar_items(item_id):
+    """Items whose color palette looks most like the given item's (?k=, ?approximate=0|1)"""
+    k = max(1, min(request.args.get('k', 10, type=int), 100))
+    approximate = request.args.get('approximate')
+    if approximate is not None:
+        approximate = approximate.lower() in ('1', 'true', 'yes')
+    
+    owner_id = current_owner_id()
+    items = service('wardrobe_index').for_owner(owner_id).snapshot().items
+    item = items.get(item_id)
+    if item is None:
+        return jsonify({"error": "Item not found"}), 404
+    
+    try:
+        results = service('similarity_search').similar(item_id, owner_id, k, approximate=approximate)
+    except KeyError:
+        return jsonify({"error": "Item has not been analyzed yet"}), 409
+    
+    return jsonify({
+        "item": item.to_dict(),
+        "similar": [{"score": round(score, 4), "item": items[other_id].to_dict()}
+                    for other_id, score in results if other_id in items]
+    })
+
+def owned_jobs():
+    """Analysis jobs of the current owner's items"""
+    return AnalysisJob.query.join(WardrobeItem, WardrobeItem.id == AnalysisJob.item_id) \
+        .filter(WardrobeItem.owner_id == current_owner_id())
+
+def job_status(job_id):
+    """Report the status of one analysis job"""
+    job = owned_jobs().filter(AnalysisJob.id == job_id).first_or_404()
+    return jsonify(job.to_dict())
+
+def jobs_status():
+    """Report the status of several analysis jobs (?ids=1,2) or of the latest job per item (?item_ids=3,4)"""
+    def parse_ids(name):
+        return [int(value) for value in request.args.get(name, '').split(',') if value.strip().isdigit()]
+    
+    job_ids = parse_ids('ids')
+    item_ids = parse_ids('item_ids')
+    
+    jobs = []
+    if job_ids:
+        jobs.extend(owned_jobs().filter(AnalysisJob.id.in_(job_ids)).all())
+    if item_ids:
+        latest = db.session.query(db.func.max(AnalysisJob.id)).filter(AnalysisJob.item_id.in_(item_ids)).group_by(AnalysisJob.item_id)
+        jobs.extend(owned_jobs().filter(AnalysisJob.id.in_(latest)).all())
+    
+    return jsonify({'jobs': [job.to_dict() for job in jobs]})
+
 def outfits():
     """Display outfit generation page"""
     # Count items by category to check if we have enough for outfits
-    tops_count = WardrobeItem.query.filter_by(category='tops').count()
-    bottoms_count = WardrobeItem.query.filter_by(category='bottoms').count()
-    item_count = tops_count + bottoms_count
+    counts = category_counts(current_owner_id())
+    item_count = counts.get('tops', 0) + counts.get('bottoms', 0)
     
     return render_template('outfits.html', item_count=item_count)
 
-@app.route('/generate-outfits')
 def generate_outfits():
     """Generate outfit recommendations"""
     # Get filter parameters
     season = request.args.get('season')
     style = request.args.get('style')
     color_scheme = request.args.get('color_scheme')
+    mode = request.args.get('mode', 'sample')
+    seed = request.args.get('seed', type=int)
     
     # Create outfit generator
-    generator = OutfitGenerator(season=season, style=style, color_scheme=color_scheme)
+    generator = OutfitGenerator(season=season, style=style, color_scheme=color_scheme, owner_id=current_owner_id())
     
-    # Generate outfits
-    outfits = generator.generate_multiple_outfits(count=3)
+    # Generate outfits ('top' = best scored, 'sample' = varied, reproducible with seed)
+    outfits = generator.generate_multiple_outfits(count=3, mode=mode, seed=seed)
     
     # Check for errors
     if outfits and "error" in outfits[0]:
@@ -206,9 +464,115 @@ def generate_outfits():
                 serialized_outfit[category] = item.to_dict()
         serialized_outfits.append(serialized_outfit)
     
-    return jsonify({"outfits": serialized_outfits})
+    return jsonify({"outfits": serialized_outfits, "seed": generator.seed})
+
+def check_stream_state(state):
+    """
+    Validate the parameters of an outfit stream, read from the query string
+    or decoded from a cursor (which the client may have tampered with)
+    
+    Args:
+        state: Dictionary with season, style, color_scheme, mode, seed and offset
+        
+    Raises:
+        ValueError: If a field has the wrong type or an unknown value
+    """
+    # 'Any' (or no value) means no filter; seasons may also be lowercase
+    filters = (
+        ('season', {'Any'} | set(SEASON_CATEGORY_RULES) | {season.capitalize() for season in SEASON_CATEGORY_RULES}),
+        ('style', {'Any'} | set(STYLE_COMPATIBILITY)),
+        ('color_scheme', {'Any'} | set(COLOR_SCHEMES))
+    )
+    for name, allowed in filters:
+        value = state.get(name)
+        if value is not None and (not isinstance(value, str) or value not in allowed):
+            raise ValueError(f'Invalid {name}')
+    if state.get('mode') not in OUTFIT_MODES:
+        raise ValueError('Invalid mode')
+    # bool is a subclass of int, but true/false are not seeds or offsets
+    seed = state.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise ValueError('Invalid seed')
+    offset = state.get('offset')
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise ValueError('Invalid offset')
+
+def generate_outfits_stream():
+    """
+    Stream outfit recommendations as they are found
+    
+    Query parameters: season, style, color_scheme, mode ('sample' or 'top'),
+    seed, count and cursor (from a previous response, to continue the same
+    sequence). Responds with NDJSON, or server-sent events when
+    format=sse or the client accepts text/event-stream.
+    """
+    cursor = request.args.get('cursor')
+    try:
+        if cursor:
+            state = decode_cursor(cursor)
+        else:
+            state = {
+                'season': request.args.get('season'),
+                'style': request.args.get('style'),
+                'color_scheme': request.args.get('color_scheme'),
+                'mode': request.args.get('mode', 'sample'),
+                'seed': request.args.get('seed', type=int),
+                'offset': 0
+            }
+        check_stream_state(state)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    count = request.args.get('count', 10, type=int)
+    count = max(1, min(count, current_app.config.get('OUTFIT_STREAM_MAX_COUNT', 200)))
+    use_sse = request.args.get('format') == 'sse' or \
+        request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream'
+    
+    generator = OutfitGenerator(season=state.get('season'), style=state.get('style'),
+                                color_scheme=state.get('color_scheme'), owner_id=current_owner_id())
+    error = generator.check()
+    outfits = None if error else generator.iter_outfits(mode=state.get('mode'), seed=state.get('seed'))
+    
+    def events():
+        if error:
+            yield 'error', error
+            return
+        
+        offset = state['offset']
+        produced = 0
+        for score, outfit in itertools.islice(outfits, offset, offset + count):
+            produced += 1
+            yield 'outfit', {
+                'rank': offset + produced,
+                'score': score,
+                'outfit': {category: item.to_dict() for category, item in outfit.items()}
+            }
+        
+        # A cursor is only returned while more outfits may follow
+        next_cursor = None
+        if produced == count:
+            next_cursor = encode_cursor(dict(state, seed=generator.seed, offset=offset + produced))
+        yield 'done', {'count': produced, 'seed': generator.seed, 'cursor': next_cursor}
+    
+    if use_sse:
+        def generate():
+            for event, data in events():
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        mimetype = 'text/event-stream'
+    else:
+        def generate():
+            for event, data in events():
+                if event == 'done':
+                    data = dict(data, done=True)
+                yield json.dumps(data) + '\n'
+        mimetype = 'application/x-ndjson'
+    
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    # Keep proxies from buffering the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-@app.route('/save-outfit', methods=['POST'])
 def save_outfit():
     """Save an outfit to the database"""
     data = request.json
@@ -217,6 +581,8 @@ def save_outfit():
         return jsonify({"success": False, "error": "Invalid outfit data"})
     
     try:
+        owner_id = current_owner_id()
+        
         # Create new saved outfit
         outfit = SavedOutfit(
             name=data['name'],
@@ -224,9 +590,16 @@ def save_outfit():
             bottom_id=data['bottoms']['id'],
             outerwear_id=data.get('outerwear', {}).get('id'),
             footwear_id=data.get('footwear', {}).get('id'),
-            accessory_id=data.get('accessories', {}).get('id')
+            accessory_id=data.get('accessories', {}).get('id'),
+            owner_id=owner_id
         )
         
+        # Outfits may only reference the owner's own items
+        item_ids = {outfit.top_id, outfit.bottom_id, outfit.outerwear_id, outfit.footwear_id, outfit.accessory_id} - {None}
+        owned = WardrobeItem.query.filter(WardrobeItem.id.in_(item_ids), WardrobeItem.owner_id == owner_id).count()
+        if owned != len(item_ids):
+            return jsonify({"success": False, "error": "Unknown wardrobe item"})
+        
         db.session.add(outfit)
         db.session.commit()
         
@@ -235,16 +608,28 @@ def save_outfit():
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/saved-outfits')
 def saved_outfits():
-    """Display saved outfits"""
-    outfits = SavedOutfit.query.order_by(SavedOutfit.date_created.desc()).all()
-    return render_template('saved_outfits.html', outfits=outfits)
+    """Display saved outfits, one page at a time"""
+    cursor = request.args.get('cursor')
+    try:
+        outfits, next_cursor = saved_outfits_page(current_owner_id(), cursor, current_app.config.get('SAVED_OUTFITS_PAGE_SIZE', 12))
+    except ValueError:
+        return redirect(url_for('saved_outfits'))
+    return render_template('saved_outfits.html', outfits=outfits, next_cursor=next_cursor, is_first_page=not cursor)
+
+def saved_outfits_api():
+    """Saved outfits as JSON, with keyset pagination (?cursor=, ?limit=)"""
+    page_size = current_app.config.get('SAVED_OUTFITS_PAGE_SIZE', 12)
+    limit = max(1, min(request.args.get('limit', page_size, type=int), 100))
+    try:
+        outfits, next_cursor = saved_outfits_page(current_owner_id(), request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"outfits": [outfit.to_dict() for outfit in outfits], "next_cursor": next_cursor})
 
-@app.route('/delete-outfit/<int:outfit_id>', methods=['POST'])
 def delete_outfit(outfit_id):
     """Delete a saved outfit"""
-    outfit = SavedOutfit.query.get_or_404(outfit_id)
+    outfit = SavedOutfit.query.filter_by(id=outfit_id, owner_id=current_owner_id()).first_or_404()
     
     db.session.delete(outfit)
     db.session.commit()
@@ -252,10 +637,9 @@ def delete_outfit(outfit_id):
     flash('Outfit deleted successfully!', 'success')
     return redirect(url_for('saved_outfits'))
 
-@app.route('/fix-image-paths')
 def fix_image_paths():
-    """Fix image paths for existing items"""
-    items = WardrobeItem.query.all()
+    """Fix image paths for the current owner's items"""
+    items = WardrobeItem.query.filter_by(owner_id=current_owner_id()).all()
     fixed_count = 0
     
     for item in items:
@@ -265,11 +649,11 @@ def fix_image_paths():
             item.image_path = item.image_path[7:]  # 'static/' is 7 characters
             fixed_count += 1
         # If path doesn't start with 'uploads/'
-        elif not item.image_path.startswith(app.config['UPLOAD_FOLDER']):
+        elif not item.image_path.startswith(current_app.config['UPLOAD_FOLDER']):
             # Get just the filename
             filename = os.path.basename(item.image_path)
             # Set the correct path
-            item.image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            item.image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
             fixed_count += 1
     
     if fixed_count > 0:
@@ -278,6 +662,119 @@ def fix_image_paths():
     else:
         return "No paths needed fixing"
 
+def register_routes(app):
+    """Register the views, template helpers and URL rules on an application"""
+    app.add_template_global(thumbnail_url)
+    app.add_template_global(thumbnail_srcset)
+    app.context_processor(thumbnail_widths)
+    
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/analyze-image', view_func=analyze_image, methods=['POST'])
+    app.add_url_rule('/analysis-cache/stats', view_func=analysis_cache_stats)
+    app.add_url_rule('/classifier/stats', view_func=classifier_stats)
+    app.add_url_rule('/metrics', view_func=metrics)
+    app.add_url_rule('/upload', view_func=upload, methods=['GET', 'POST'])
+    app.add_url_rule('/import', view_func=import_items, methods=['POST'])
+    app.add_url_rule('/wardrobe', view_func=wardrobe)
+    app.add_url_rule('/api/wardrobe', view_func=wardrobe_api)
+    app.add_url_rule('/api/wardrobe/counts', view_func=wardrobe_counts_api)
+    app.add_url_rule('/thumbnails/<int:width>/<fmt>/<path:image_path>', view_func=thumbnail)
+    app.add_url_rule('/delete-item/<int:item_id>', view_func=delete_item, methods=['POST'])
+    app.add_url_rule('/items/<int:item_id>/similar', view_func=similar_items)
+    app.add_url_rule('/jobs/<int:job_id>', view_func=job_status)
+    app.add_url_rule('/jobs', view_func=jobs_status)
+    app.add_url_rule('/outfits', view_func=outfits)
+    app.add_url_rule('/generate-outfits', view_func=generate_outfits)
+    app.add_url_rule('/generate-outfits/stream', view_func=generate_outfits_stream)
+    app.add_url_rule('/save-outfit', view_func=save_outfit, methods=['POST'])
+    app.add_url_rule('/saved-outfits', view_func=saved_outfits)
+    app.add_url_rule('/api/saved-outfits', view_func=saved_outfits_api)
+    app.add_url_rule('/delete-outfit/<int:outfit_id>', view_func=delete_outfit, methods=['POST'])
+    app.add_url_rule('/fix-image-paths', view_func=fix_image_paths)
+
+@click.command('compact-uploads')
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+@with_appcontext
+def compact_uploads(dry_run):
+    """Deduplicate the uploads folder into per-owner blobs and point items at them"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    
+    # Items whose image sits at the top of the uploads folder, by filename.
+    # Older rows store paths like 'static\\uploads\\<file>', so match on the filename
+    items = {}
+    for item in WardrobeItem.query.all():
+        folder, _, filename = item.image_path.replace('\\', '/').rpartition('/')
+        if posixpath.basename(folder) == posixpath.basename(upload_folder):
+            items.setdefault(filename, []).append(item)
+    
+    shards = {filename: {owner_shard(item.owner_id) for item in group} for filename, group in items.items()}
+    mapping, stats, originals = service('blob_store').compact(shards, dry_run=dry_run)
+    
+    updated = 0
+    for filename, group in items.items():
+        for item in group:
+            new_path = mapping.get((filename, owner_shard(item.owner_id)))
+            if new_path and new_path != item.image_path:
+                item.image_path = new_path
+                updated += 1
+    
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        # Only once the items point at the blobs
+        service('blob_store').remove_files(originals)
+    
+    click.echo(f"Scanned {stats['files']} files, {stats['duplicates']} duplicates "
+               f"({stats['bytes_freed'] / (1024 * 1024):.1f} MB freed), {updated} items updated"
+               + (' (dry run)' if dry_run else ''))
+
+@click.command('generate-thumbnails')
+@with_appcontext
+def generate_thumbnails():
+    """Pre-generate thumbnails for every wardrobe item"""
+    image_paths = sorted({path for (path,) in db.session.query(WardrobeItem.image_path)})
+    generated = 0
+    with click.progressbar(image_paths, label='Generating thumbnails') as paths:
+        for image_path in paths:
+            try:
+                service('thumbnail_store').generate(image_path.replace('\\', '/').removeprefix('static/'))
+                generated += 1
+            except Exception:
+                current_app.logger.exception("Error generating thumbnails for %s", image_path)
+    click.echo(f"Generated thumbnails for {generated} of {len(image_paths)} images")
+
+@click.command('import-wardrobe')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--season', default='all', show_default=True, help='Season stored on every item.')
+@click.option('--category', default=None, help='Category stored on every item (default: from analysis).')
+@click.option('--owner', 'owner_id', default=DEFAULT_OWNER_ID, type=click.IntRange(min=1), show_default=True,
+              help='Owner of the imported items.')
+@with_appcontext
+def import_wardrobe(directory, season, category, owner_id):
+    """Import every image in DIRECTORY into the wardrobe"""
+    files = list(iter_directory(directory))
+    imported = 0
+    errors = []
+    
+    with click.progressbar(length=len(files), label='Importing') as bar:
+        for result in service('bulk_importer').iter_import(files, season=season, category=category, owner_id=owner_id):
+            if result['status'] == 'imported':
+                imported += 1
+            else:
+                errors.append(result)
+            bar.update(1)
+    
+    for result in errors:
+        click.echo(f"  {result['filename']}: {result['error']}", err=True)
+    click.echo(f"Imported {imported} items, {len(errors)} errors")
+
+def register_commands(app):
+    """Register the 'flask' CLI commands on an application"""
+    app.cli.add_command(compact_uploads)
+    app.cli.add_command(generate_thumbnails)
+    app.cli.add_command(import_wardrobe)
+
 # Run the application
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Throughput and latency benchmark for the garment category classifier.
+
+Times the model directly for each batch size, then drives it with
+concurrent callers: once calling it one image at a time, once through the
+micro-batcher. Reports per-request p50/p99 latency, throughput and the
+batch sizes the micro-batcher formed.
+
+Without --model, a MobileNetV3-Small with random weights is exported to a
+temporary TorchScript file (use --quantize for dynamic int8 quantization);
+the timings are those of a real model of that size, the predictions are not.
+
+Usage:
+    python -m benchmarks.bench_classifier [--model PATH] [--quantize] [--threads N]
+        [--batch-sizes 1 2 4 8 16] [--concurrency 1 4 8 16] [--max-wait-ms 5]
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from benchmarks.bench_tenants import percentile
+from modules.garment_classifier import DEFAULT_CATEGORIES, GarmentClassifier, MicroBatcher
+
+def export_model(path, quantize=False, input_size=224):
+    """Save a randomly initialized MobileNetV3-Small as TorchScript"""
+    import torch
+    import torchvision
+
+    model = torchvision.models.mobilenet_v3_small(num_classes=len(DEFAULT_CATEGORIES)).eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    traced = torch.jit.trace(model, torch.zeros(1, 3, input_size, input_size))
+    torch.jit.save(traced, path)
+    return path
+
+def synthetic_images(n, seed=0):
+    """Photo-sized RGB images (the analysis pipeline hands over 400 px and up)"""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (533, 400, 3), dtype=np.uint8) for _ in range(n)]
+
+def drive(call, images, concurrency, requests):
+    """Run requests calls from concurrency threads; return (latencies in ms, seconds)"""
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            start = time.perf_counter()
+            call(images[n % len(images)])
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', help='TorchScript model to benchmark (default: export a MobileNetV3-Small)')
+    parser.add_argument('--quantize', action='store_true', help='Quantize the exported model to int8')
+    parser.add_argument('--threads', type=int, default=None, help='torch threads')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--max-batch-size', type=int, default=8, help='Micro-batcher batch size')
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='Micro-batcher wait window')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('torch') is None:
+        print("torch is not installed; install torch and torchvision to run this benchmark", file=sys.stderr)
+        sys.exit(1)
+
+    model_path = args.model
+    if model_path is None:
+        model_path = export_model(os.path.join(tempfile.mkdtemp(prefix='bench-classifier-'), 'classifier.pt'),
+                                  quantize=args.quantize)
+
+    classifier = GarmentClassifier(model_path, threads=args.threads)
+    start = time.perf_counter()
+    classifier.load()
+    print(f"model: {model_path} (loaded and warmed up in {(time.perf_counter() - start) * 1000:.0f} ms)")
+    images = synthetic_images(max(args.batch_sizes + [32]))
+
+    print(f"\n{'batch':>6} {'ms/batch':>9} {'ms/image':>9} {'images/s':>9}")
+    for size in args.batch_sizes:
+        runs = []
+        for _ in range(max(3, 64 // size)):
+            start = time.perf_counter()
+            classifier.predict(images[:size])
+            runs.append((time.perf_counter() - start) * 1000)
+        batch_ms = statistics.median(runs)
+        print(f"{size:6d} {batch_ms:9.2f} {batch_ms / size:9.2f} {size / batch_ms * 1000:9.1f}")
+
+    print(f"\n{'callers':>7} {'mode':<9} {'p50 ms':>8} {'p99 ms':>8} {'images/s':>9}")
+    for concurrency in args.concurrency:
+        batcher = MicroBatcher(classifier.predict, args.max_batch_size, args.max_wait_ms)
+        modes = {'single': lambda image: classifier.predict([image])[0], 'batched': batcher}
+        for mode, call in modes.items():
+            latencies, seconds = drive(call, images, concurrency, args.requests)
+            print(f"{concurrency:7d} {mode:<9} {statistics.median(latencies):8.2f} "
+                  f"{percentile(latencies, 99):8.2f} {len(latencies) / seconds:9.1f}")
+        formed = ', '.join(f"{size}x{stats['batches']}" for size, stats in batcher.stats().items())
+        print(f"{'':7} batches formed (size x count): {formed}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Throughput benchmark for color naming.
+
+Compares the original per-color Python loop with the vectorized ColorNamer
+in RGB and CIELAB space, with and without the quantized lookup table.
+
+Usage:
+    python -m benchmarks.bench_color_names [--colors N]
+"""
+import argparse
+import time
+import numpy as np
+from modules.color_names import COLOR_NAMES, ColorNamer
+
+def loop_closest_color(rgb_tuple):
+    """The original pure-Python implementation, kept as the baseline"""
+    r, g, b = rgb_tuple
+    min_distance = float('inf')
+    closest_color = "Unknown"
+    for (cr, cg, cb), color_name in COLOR_NAMES.items():
+        distance = ((r - cr) ** 2 + (g - cg) ** 2 + (b - cb) ** 2) ** 0.5
+        if distance < min_distance:
+            min_distance = distance
+            closest_color = color_name
+    return closest_color
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--colors', type=int, default=100000, help='Number of random colors to name')
+    args = parser.parse_args()
+
+    queries = np.random.default_rng(42).integers(0, 256, size=(args.colors, 3))
+    reference = ColorNamer().nearest_indices(queries)
+
+    sample = [tuple(int(v) for v in q) for q in queries[:5000]]
+    start = time.perf_counter()
+    for q in sample:
+        loop_closest_color(q)
+    loop_rate = len(sample) / (time.perf_counter() - start) / 1000
+
+    print(f"{'namer':<10} {'colors/ms':>12} {'agreement with rgb':>20}")
+    print(f"{'loop':<10} {loop_rate:12.1f} {'1.000':>20}")
+    for namer in (ColorNamer(), ColorNamer(use_lut=True), ColorNamer(space='lab'), ColorNamer(space='lab', use_lut=True)):
+        namer.nearest_indices(queries[:1])  # Build the lookup table outside the timing
+        start = time.perf_counter()
+        indices = namer.nearest_indices(queries)
+        rate = len(queries) / (time.perf_counter() - start) / 1000
+        print(f"{namer.signature:<10} {rate:12.1f} {(indices == reference).mean():20.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Concurrency benchmark of mixed upload and outfit generation traffic.
+
+Runs writer threads doing the database work of an upload (insert the item,
+queue its analysis job, store the analysis result: three commits) while
+reader threads call GET /generate-outfits and GET /api/wardrobe through the
+test client. Each database configuration runs in a fresh process on a
+scratch SQLite file:
+
+- rollback-journal: SQLite defaults (journal_mode=DELETE, synchronous=FULL)
+- wal: the configured engine (WAL, synchronous=NORMAL, busy timeout, mmap)
+
+With --database-url only that database is measured (e.g. PostgreSQL; its
+tables are created, and the rows written are left in place).
+
+Usage:
+    python -m benchmarks.bench_db_concurrency [--seconds 10] [--writers 4] [--readers 8]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.synthetic import synthetic_wardrobe
+from benchmarks.bench_tenants import percentile
+
+CONFIGURATIONS = {
+    'rollback-journal': {
+        'FLASK_SQLITE_JOURNAL_MODE': 'DELETE',
+        'FLASK_SQLITE_SYNCHRONOUS': 'FULL',
+        'FLASK_SQLITE_MMAP_SIZE': 'null',
+    },
+    'wal': {},
+}
+
+FEATURES = {'colors': [{'rgb': [40, 60, 120], 'percentage': 70.0}, {'rgb': [230, 230, 230], 'percentage': 30.0}],
+            'primary_color': 'Navy'}
+
+def run_load(args):
+    """Drive the load in this process and return the measurements"""
+    from sqlalchemy import insert
+    from app import create_app
+    from modules.database import db
+    from modules.models import WardrobeItem, AnalysisJob
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        columns = ('name', 'category', 'color', 'season', 'image_path', 'features', 'status')
+        rows = synthetic_wardrobe(args.items)
+        db.session.execute(insert(WardrobeItem), [{name: row[name] for name in columns} for row in rows])
+        db.session.commit()
+        engine = db.engine
+        settings = {'dialect': engine.dialect.name, 'pool': type(engine.pool).__name__}
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as connection:
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                    settings[pragma] = connection.exec_driver_sql(f'PRAGMA {pragma}').scalar()
+
+    stop = threading.Event()
+    results = {'upload': [], 'generate': [], 'wardrobe': []}
+    errors = {name: 0 for name in results}
+    lock = threading.Lock()
+
+    def record(kind, start, ok):
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            if ok:
+                results[kind].append(elapsed)
+            else:
+                errors[kind] += 1
+
+    def writer(n):
+        sequence = 0
+        while not stop.is_set():
+            sequence += 1
+            start = time.perf_counter()
+            try:
+                with app.app_context():
+                    item = WardrobeItem(f'upload {n}-{sequence}', 'tops', 'Navy', 'all',
+                                        f'uploads/bench-{n}-{sequence}.jpg', status='pending')
+                    db.session.add(item)
+                    db.session.commit()
+                    job = AnalysisJob(item_id=item.id, status='queued')
+                    db.session.add(job)
+                    db.session.commit()
+                    item.set_features(FEATURES)
+                    item.status = 'ready'
+                    job.status = 'done'
+                    db.session.commit()
+                record('upload', start, True)
+            except Exception as e:
+                print(f"Error in upload: {e}", file=sys.stderr)
+                record('upload', start, False)
+
+    def reader(n):
+        client = app.test_client()
+        rng = random.Random(n)
+        while not stop.is_set():
+            kind = rng.choice(('generate', 'wardrobe'))
+            url = '/generate-outfits?mode=top' if kind == 'generate' else '/api/wardrobe?category=tops'
+            start = time.perf_counter()
+            try:
+                ok = client.get(url).status_code == 200
+            except Exception as e:
+                print(f"Error in {url}: {e}", file=sys.stderr)
+                ok = False
+            record(kind, start, ok)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    summary = {}
+    for kind, latencies in results.items():
+        summary[kind] = {
+            'requests': len(latencies),
+            'errors': errors[kind],
+            'per_second': len(latencies) / args.seconds,
+            'p50_ms': statistics.median(latencies) if latencies else None,
+            'p99_ms': percentile(latencies, 99) if latencies else None
+        }
+    return {'settings': settings, 'results': summary}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+    parser.add_argument('--writers', type=int, default=4, help='Upload threads')
+    parser.add_argument('--readers', type=int, default=8, help='Outfit generation / listing threads')
+    parser.add_argument('--items', type=int, default=500, help='Items in the wardrobe before the run')
+    parser.add_argument('--database-url', help='Measure this database instead of the SQLite configurations')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_load(args)))
+        return
+
+    configurations = {'database-url': {'DATABASE_URL': args.database_url}} if args.database_url else CONFIGURATIONS
+    print(f"{args.writers} upload threads, {args.readers} reader threads, {args.seconds:g} s per run")
+    print(f"{'configuration':<17} {'traffic':<9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, overrides in configurations.items():
+        scratch = tempfile.mkdtemp(prefix='bench-db-')
+        env = dict(os.environ, FLASK_ANALYSIS_CACHE_FILE='null', FLASK_ANALYSIS_WORKERS='0', **overrides)
+        if not args.database_url:
+            env.pop('DATABASE_URL', None)
+            env['FLASK_SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+        command = [sys.executable, '-m', 'benchmarks.bench_db_concurrency', '--child', name,
+                   '--seconds', str(args.seconds), '--writers', str(args.writers),
+                   '--readers', str(args.readers), '--items', str(args.items)]
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+
+        for kind, result in run['results'].items():
+            p50 = f"{result['p50_ms']:8.2f}" if result['p50_ms'] is not None else f"{'-':>8}"
+            p99 = f"{result['p99_ms']:8.2f}" if result['p99_ms'] is not None else f"{'-':>8}"
+            print(f"{name:<17} {kind:<9} {result['per_second']:8.1f} {p50} {p99} {result['errors']:7d}")
+        print(f"{'':<17} {', '.join(f'{key}={value}' for key, value in run['settings'].items())}")
+
+if __name__ == '__main__':
+    main()
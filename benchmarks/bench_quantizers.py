@@ -0,0 +1,93 @@
+"""
+Accuracy-vs-speed benchmark for the dominant color backends.
+
+Runs every quantizer over the images in static/uploads and compares its
+palette against the sklearn reference.
+
+Usage:
+    python -m benchmarks.bench_quantizers [--limit N] [--methods minibatch median_cut]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from modules.color_quantizer import QUANTIZERS, quantize
+from modules.garment_analyzer import load_pixels
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'uploads')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+def find_images(directory=UPLOAD_DIR, limit=None):
+    """List the uploaded garment images, skipping generated visualizations"""
+    images = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+              if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith(('color_analysis_', 'temp_'))]
+    return images[:limit] if limit else images
+
+def palette_distance(reference, candidate):
+    """
+    Weighted symmetric nearest-color distance between two palettes.
+
+    Each color is matched to the closest color of the other palette and the
+    RGB distances are averaged by pixel share, in both directions.
+
+    Args:
+        reference: Tuple of (centers, counts) from the reference backend
+        candidate: Tuple of (centers, counts) to compare
+
+    Returns:
+        Distance in RGB units (0 means identical palettes)
+    """
+    ref_centers, ref_counts = (np.asarray(a, dtype=np.float64) for a in reference)
+    cand_centers, cand_counts = (np.asarray(a, dtype=np.float64) for a in candidate)
+    distances = np.linalg.norm(ref_centers[:, None, :] - cand_centers[None, :, :], axis=2)
+    forward = (distances.min(axis=1) * ref_counts).sum() / ref_counts.sum()
+    backward = (distances.min(axis=0) * cand_counts).sum() / cand_counts.sum()
+    return (forward + backward) / 2
+
+def run(images, methods, reference='sklearn', n_colors=5):
+    """
+    Time every backend on every image.
+
+    Returns:
+        Dictionary of method name to {'times': [...], 'distances': [...]}
+    """
+    results = {method: {'times': [], 'distances': []} for method in methods}
+
+    for path in images:
+        pixels = load_pixels(path)
+        reference_palette = None
+        for method in [reference] + [m for m in methods if m != reference]:
+            start = time.perf_counter()
+            palette = quantize(pixels, n_colors=n_colors, method=method)
+            elapsed = time.perf_counter() - start
+
+            if method == reference:
+                reference_palette = palette
+            if method in results:
+                results[method]['times'].append(elapsed)
+                results[method]['distances'].append(palette_distance(reference_palette, palette))
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--limit', type=int, default=None, help='Only use the first N images')
+    parser.add_argument('--methods', nargs='+', default=sorted(QUANTIZERS), choices=sorted(QUANTIZERS))
+    parser.add_argument('--colors', type=int, default=5, help='Palette size')
+    args = parser.parse_args()
+
+    images = find_images(limit=args.limit)
+    print(f"Benchmarking {len(args.methods)} backends on {len(images)} images\n")
+    results = run(images, args.methods, n_colors=args.colors)
+
+    print(f"{'backend':<12} {'mean ms':>9} {'p95 ms':>9} {'speedup':>8} {'mean dist':>10} {'max dist':>9}")
+    reference_time = np.mean(results['sklearn']['times']) if 'sklearn' in results else None
+    for method, data in results.items():
+        times = np.array(data['times']) * 1000
+        distances = np.array(data['distances'])
+        speedup = f"{reference_time * 1000 / times.mean():.1f}x" if reference_time else '-'
+        print(f"{method:<12} {times.mean():9.2f} {np.percentile(times, 95):9.2f} {speedup:>8} "
+              f"{distances.mean():10.2f} {distances.max():9.2f}")
+
+if __name__ == '__main__':
+    main()
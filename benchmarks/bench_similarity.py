@@ -0,0 +1,84 @@
+"""
+Recall and latency benchmark for the palette similarity search.
+
+Builds synthetic palettes (shades of the analyzer's named colors with
+random weights, no database) and compares exact search with the LSH index
+at several wardrobe sizes. Recall is recall@k against the exact results.
+
+Usage:
+    python -m benchmarks.bench_similarity [--sizes 1000 10000 100000] [--k K] [--queries Q]
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from modules.color_names import COLOR_NAMES, rgb_to_lab
+from modules.palettes import PALETTE_COLORS, PALETTE_FIELDS, RGB, LAB, WEIGHT
+from modules.similarity import ExactIndex, LSHIndex, palette_embeddings
+
+def synthetic_palettes(n_items, seed=42):
+    """Palettes shaped like FeatureMatrix.palettes: a few related shades per garment"""
+    rng = np.random.default_rng(seed)
+    base = np.array(list(COLOR_NAMES.keys()), dtype=np.float64)
+    palettes = np.zeros((n_items, PALETTE_COLORS, PALETTE_FIELDS), dtype=np.float32)
+
+    # Main color plus darker/lighter shades of it and some unrelated accents
+    main = base[rng.integers(len(base), size=n_items)]
+    rgb = main[:, None, :] * rng.uniform(0.5, 1.1, size=(n_items, PALETTE_COLORS, 1))
+    accents = rng.random((n_items, PALETTE_COLORS)) < 0.3
+    rgb[accents] = base[rng.integers(len(base), size=accents.sum())]
+    rgb = np.clip(rgb + rng.normal(0, 12, size=rgb.shape), 0, 255)
+
+    palettes[:, :, RGB] = rgb
+    palettes[:, :, LAB] = rgb_to_lab(rgb.reshape(-1, 3)).reshape(n_items, PALETTE_COLORS, 3)
+    weights = np.sort(rng.dirichlet(np.ones(PALETTE_COLORS) * 0.8, size=n_items), axis=1)[:, ::-1]
+    palettes[:, :, WEIGHT] = weights
+    return palettes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Wardrobe sizes')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per size')
+    args = parser.parse_args()
+
+    print(f"k={args.k}, {args.queries} queries per size")
+    print(f"{'items':>7} {'embed ms':>9} {'lsh build ms':>13} {'exact p50':>10} {'exact p99':>10} "
+          f"{'lsh p50':>8} {'lsh p99':>8} {'candidates':>11} {'recall':>7}")
+    for size in args.sizes:
+        palettes = synthetic_palettes(size)
+
+        start = time.perf_counter()
+        embeddings = palette_embeddings(palettes)
+        embed_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        lsh = LSHIndex(embeddings)
+        build_ms = (time.perf_counter() - start) * 1000
+        exact = ExactIndex(embeddings)
+
+        rng = np.random.default_rng(7)
+        exact_ms, lsh_ms, recalls, candidates = [], [], [], []
+        for row in rng.choice(size, size=min(args.queries, size), replace=False):
+            query = embeddings[row]
+
+            start = time.perf_counter()
+            truth, _ = exact.search(query, args.k, exclude=row)
+            exact_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            found, _ = lsh.search(query, args.k, exclude=row)
+            lsh_ms.append((time.perf_counter() - start) * 1000)
+
+            recalls.append(len(set(truth.tolist()) & set(found.tolist())) / max(len(truth), 1))
+            candidates.append(len(lsh.candidates(query)))
+
+        def p99(values):
+            return float(np.percentile(values, 99))
+
+        print(f"{size:7d} {embed_ms:9.1f} {build_ms:13.1f} {statistics.median(exact_ms):10.3f} {p99(exact_ms):10.3f} "
+              f"{statistics.median(lsh_ms):8.3f} {p99(lsh_ms):8.3f} {statistics.median(candidates):11.0f} "
+              f"{statistics.mean(recalls):7.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Startup-time check for the web application.
+
+Imports app.py and calls create_app() in fresh interpreters with
+`python -X importtime`, reports the median startup time and the slowest
+imports, and fails (exit status 1) when startup regresses:
+
+- the median startup time exceeds --max-ms
+- a deferred module (analysis stack, torch, Alembic) is imported at startup
+- creating the app touches the database (creates the scratch database file)
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--max-ms 750] [--top 15]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Imported on first use (analysis request, thumbnail, 'flask db' or warmup), never at startup
+DEFERRED_MODULES = ('cv2', 'sklearn', 'torch', 'torchvision', 'PIL.Image', 'alembic',
+                    'modules.garment_analyzer', 'modules.image_pipeline')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Run in the child interpreter: import the app, create it and print the elapsed milliseconds
+STARTUP_SCRIPT = ('import time; start = time.perf_counter(); import app; app.create_app(); '
+                  'print((time.perf_counter() - start) * 1000)')
+
+def import_app(database_path):
+    """
+    Start the app in a fresh interpreter.
+
+    Returns:
+        Tuple of (startup milliseconds, {module: (self us, cumulative us, depth)})
+    """
+    env = dict(os.environ, FLASK_SQLALCHEMY_DATABASE_URI='sqlite:///' + database_path,
+               FLASK_ANALYSIS_CACHE_FILE='null')
+    env.pop('DATABASE_URL', None)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+                            env=env, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time')
+    parser.add_argument('--max-ms', type=float, default=750, help='Largest acceptable median startup time')
+    parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='bench-startup-')
+    database_path = os.path.join(scratch, 'startup.db')
+
+    # The first run also compiles any stale bytecode, so it is not timed
+    runs = [import_app(database_path) for _ in range(args.runs + 1)][1:]
+    totals = [elapsed for elapsed, _ in runs]
+    runs = [modules for _, modules in runs]
+    median_ms = statistics.median(totals)
+
+    # Direct imports of app.py, by median cumulative time
+    last = runs[-1]
+    direct = [name for name, (_, _, depth) in last.items() if depth == 1]
+    cumulative = {name: statistics.median(run[name][1] for run in runs if name in run) / 1000 for name in direct}
+
+    print(f"import app + create_app(): median {median_ms:.0f} ms over {args.runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+    print(f"\n{'cumulative ms':>14}  module (imported by app.py)")
+    for name, ms in sorted(cumulative.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{ms:14.1f}  {name}")
+
+    failures = []
+    if median_ms > args.max_ms:
+        failures.append(f"startup time {median_ms:.0f} ms is over the {args.max_ms:.0f} ms threshold")
+    eager = [name for name in DEFERRED_MODULES if name in last]
+    if eager:
+        failures.append(f"deferred modules imported at startup: {', '.join(eager)}")
+    if os.path.exists(database_path):
+        failures.append("creating the app created the database (schema work on boot)")
+
+    print()
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print("OK: startup within budget, no deferred imports, no database access")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
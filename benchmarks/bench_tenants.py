@@ -0,0 +1,88 @@
+"""
+Multi-tenant load test for outfit generation.
+
+Fills a scratch SQLite database with a growing number of tenants, each with
+the same synthetic wardrobe, and times GET /generate-outfits and
+GET /api/wardrobe for randomly chosen tenants through the test client
+(the owner is sent in the X-Owner-Id header). Latency should stay flat as
+tenants are added: every query and in-memory partition covers one owner.
+
+Usage:
+    python -m benchmarks.bench_tenants [--tenants 1 10 100] [--items 200] [--requests 300]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from benchmarks.synthetic import synthetic_wardrobe
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tenants', type=int, nargs='+', default=[1, 10, 100], help='Numbers of tenants to test')
+    parser.add_argument('--items', type=int, default=200, help='Wardrobe items per tenant')
+    parser.add_argument('--requests', type=int, default=300, help='Timed requests per endpoint and tenant count')
+    args = parser.parse_args()
+
+    # Point the app at a scratch database before it is imported
+    scratch = tempfile.mkdtemp(prefix='bench-tenants-')
+    os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+    os.environ['FLASK_ANALYSIS_CACHE_FILE'] = 'null'
+    os.environ['FLASK_ANALYSIS_WORKERS'] = '0'
+    os.environ['FLASK_TENANT_HEADER'] = 'X-Owner-Id'
+
+    from sqlalchemy import insert
+    from app import create_app
+    from modules.database import db
+    from modules.models import WardrobeItem
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+    client = app.test_client()
+    columns = ('name', 'category', 'color', 'season', 'image_path', 'features', 'status', 'owner_id')
+    urls = {
+        'generate-outfits': '/generate-outfits?mode=top&season=summer',
+        'api/wardrobe': '/api/wardrobe?category=tops'
+    }
+    rng = random.Random(7)
+
+    print(f"{args.items} items per tenant, {args.requests} requests per endpoint")
+    print(f"{'tenants':>8} {'items':>8} {'endpoint':<18} {'cold p50':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    seeded = 0
+    for tenants in sorted(args.tenants):
+        with app.app_context():
+            for owner_id in range(seeded + 1, tenants + 1):
+                rows = synthetic_wardrobe(args.items, seed=owner_id, owner_id=owner_id)
+                db.session.execute(insert(WardrobeItem), [{name: row[name] for name in columns} for row in rows])
+            db.session.commit()
+        seeded = tenants
+
+        for endpoint, url in urls.items():
+            # Cold: first request of each tenant after the wardrobe changed (loads its partition)
+            cold = []
+            for owner_id in rng.sample(range(1, tenants + 1), min(tenants, 20)):
+                start = time.perf_counter()
+                response = client.get(url, headers={'X-Owner-Id': str(owner_id)})
+                cold.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, f"{url} returned {response.status_code}"
+
+            warm = []
+            for _ in range(args.requests):
+                owner_id = rng.randint(1, tenants)
+                start = time.perf_counter()
+                response = client.get(url, headers={'X-Owner-Id': str(owner_id)})
+                warm.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, f"{url} returned {response.status_code}"
+
+            print(f"{tenants:8d} {tenants * args.items:8d} {endpoint:<18} {statistics.median(cold):9.2f} "
+                  f"{percentile(warm, 50):8.2f} {percentile(warm, 99):8.2f}")
+
+if __name__ == '__main__':
+    main()
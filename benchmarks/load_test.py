@@ -0,0 +1,431 @@
+"""
+Load test of the web application with a realistic traffic mix.
+
+Closed-loop clients (threads) send a weighted mix of requests for a fixed
+time at each concurrency level:
+
+- analyze: POST /analyze-image with an image
+- upload: POST /upload with an image (analyzed in the background)
+- generate: GET /generate-outfits for a random season
+- save: POST /save-outfit with an outfit generate returned
+- pages: GET /, /wardrobe, /outfits, /saved-outfits or /upload
+
+The images in static/uploads are the payloads (synthetic garment photos if
+there are none). For every level it reports, per endpoint, throughput,
+p50/p95/p99 latency and errors, plus the CPU use of the web process and
+each of its child processes (analysis pool workers, or the workers of a
+server started with --server-pid); the level at which an endpoint's
+throughput stops growing is its saturation point. --isolate runs each
+endpoint of the mix on its own to find each one's saturation point.
+
+Targets:
+- default: the WSGI app in this process, through the Flask test client
+  (the load generator shares the process, and its CPU)
+- --serve: the app behind a local threaded HTTP server started here
+- --url: a server started separately, e.g. gunicorn -w 4 'app:create_app()' (give
+  --server-pid for its CPU; set TENANT_HEADER there for --owner to apply)
+
+The first two use a scratch SQLite database seeded with a synthetic
+wardrobe; uploads go to a dedicated owner whose upload shard is removed
+afterwards.
+
+Usage:
+    python -m benchmarks.load_test [--mix analyze=1,upload=1,generate=6,save=1,pages=3]
+        [--concurrency 1 4 16] [--seconds 10] [--serve | --url URL [--server-pid PID]]
+        [--isolate] [--output results.json]
+"""
+import argparse
+import glob
+import http.client
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from benchmarks.bench_tenants import percentile
+from benchmarks.synthetic import IMAGE_RESOLUTIONS, synthetic_wardrobe, synthetic_garment_image, encode_jpeg
+
+ENDPOINTS = ('analyze', 'upload', 'generate', 'save', 'pages')
+DEFAULT_MIX = 'analyze=1,upload=1,generate=6,save=1,pages=3'
+PAGES = ('/', '/wardrobe', '/outfits', '/saved-outfits', '/upload')
+SEASONS = ('Any', 'Summer', 'Winter', 'Spring', 'Fall')
+
+# Owner of the load test's wardrobe and uploads
+LOAD_OWNER_ID = 999998
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def parse_mix(text):
+    """Parse 'name=weight,...' into a dictionary of endpoint weights"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}' (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def load_payloads(directory, limit):
+    """Uploaded images to send, as (filename, bytes); generated ones are skipped"""
+    paths = sorted(path for path in glob.glob(os.path.join(directory, '*'))
+                   if path.lower().endswith(IMAGE_EXTENSIONS)
+                   and not os.path.basename(path).startswith(('color_analysis_', 'temp_')))
+    payloads = []
+    for path in paths[:limit]:
+        with open(path, 'rb') as f:
+            payloads.append((os.path.basename(path), f.read()))
+    if not payloads:
+        width, height = IMAGE_RESOLUTIONS['medium']
+        payloads = [(f'synthetic-{seed}.jpg', encode_jpeg(synthetic_garment_image(width, height, seed)))
+                    for seed in range(8)]
+    return payloads
+
+def encode_multipart(fields, file_field, filename, data):
+    """Body and content type of a multipart/form-data request"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+               f'Content-Type: application/octet-stream\r\n\r\n'.encode())
+    body.write(data)
+    body.write(f'\r\n--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+class WsgiClient:
+    """Requests to the app in this process through the Flask test client"""
+
+    def __init__(self, app, headers):
+        self.client = app.test_client()
+        self.headers = headers
+
+    def send(self, method, path, fields=None, file=None, json_body=None):
+        data = dict(fields or {})
+        if file is not None:
+            data['file'] = (io.BytesIO(file[1]), file[0])
+        response = self.client.open(path, method=method, headers=self.headers, json=json_body,
+                                    data=data if (fields or file) else None)
+        return response.status_code, response.get_data(), response.headers.get('Location', '')
+
+class HttpClient:
+    """Requests to a server over HTTP (one connection per request)"""
+
+    def __init__(self, url, headers):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip('/')
+        self.headers = headers
+
+    def send(self, method, path, fields=None, file=None, json_body=None):
+        headers = dict(self.headers)
+        body = None
+        if file is not None:
+            body, headers['Content-Type'] = encode_multipart(fields or {}, 'file', file[0], file[1])
+        elif json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read(), response.getheader('Location', '')
+        finally:
+            connection.close()
+
+class Traffic:
+    """The requests of each endpoint, and whether their responses count as successes"""
+
+    def __init__(self, payloads, seed):
+        self.payloads = payloads
+        self.rng = random.Random(seed)
+        self.outfits = []
+        self.lock = threading.Lock()
+
+    def _payload(self):
+        with self.lock:
+            return self.rng.choice(self.payloads)
+
+    def analyze(self, client):
+        status, body, _ = client.send('POST', '/analyze-image', file=self._payload())
+        if status != 200:
+            return f'HTTP {status}'
+        return json.loads(body).get('error')
+
+    def upload(self, client):
+        fields = {'name': 'Load test item', 'category': 'tops', 'color': 'Black', 'season': 'all'}
+        status, _, location = client.send('POST', '/upload', fields=fields, file=self._payload())
+        # Success redirects to the wardrobe; errors redirect back to the form
+        if status != 302:
+            return f'HTTP {status}'
+        return None if location.endswith('/wardrobe') else 'upload rejected'
+
+    def generate(self, client):
+        with self.lock:
+            season = self.rng.choice(SEASONS)
+        status, body, _ = client.send('GET', f'/generate-outfits?season={season}')
+        if status != 200:
+            return f'HTTP {status}'
+        result = json.loads(body)
+        if 'error' in result:
+            return result['error']
+        with self.lock:
+            self.outfits = (self.outfits + result['outfits'])[-100:]
+        return None
+
+    def save(self, client):
+        with self.lock:
+            outfit = self.rng.choice(self.outfits) if self.outfits else None
+        if outfit is None:
+            return 'no generated outfit to save yet'
+        outfit = {category: {'id': item['id']} for category, item in outfit.items()}
+        status, body, _ = client.send('POST', '/save-outfit', json_body=dict(outfit, name='Load test outfit'))
+        if status != 200:
+            return f'HTTP {status}'
+        result = json.loads(body)
+        return None if result.get('success') else result.get('error', 'not saved')
+
+    def pages(self, client):
+        with self.lock:
+            page = self.rng.choice(PAGES)
+        status, _, _ = client.send('GET', page)
+        return None if status == 200 else f'HTTP {status} on {page}'
+
+def _proc_stat(pid):
+    """(ppid, CPU seconds) of a process from /proc"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def cpu_snapshot(root_pid):
+    """
+    CPU seconds used so far by a process and all its descendants.
+
+    Returns:
+        Dictionary of pid -> CPU seconds, or None where /proc is not available
+    """
+    if root_pid is None or not os.path.exists('/proc/self/stat'):
+        return None
+    stats = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                stats[int(entry)] = _proc_stat(entry)
+            except (OSError, ValueError, IndexError):
+                continue  # Exited while scanning
+    tree = {root_pid}
+    changed = True
+    while changed:
+        children = {pid for pid, (ppid, _) in stats.items() if ppid in tree} - tree
+        tree |= children
+        changed = bool(children)
+    return {pid: stats[pid][1] for pid in tree if pid in stats}
+
+def cpu_usage(before, after, seconds, root_pid):
+    """Percent of one core used by each process between two snapshots, the root process first"""
+    if before is None or after is None:
+        return []
+    usage = []
+    for pid in sorted(after, key=lambda pid: (pid != root_pid, pid)):
+        percent = (after[pid] - before.get(pid, 0.0)) / seconds * 100
+        usage.append({'pid': pid, 'role': 'web' if pid == root_pid else 'worker', 'cpu_percent': round(percent, 1)})
+    return usage
+
+def run_level(make_client, traffic, mix, concurrency, seconds, root_pid):
+    """Drive the traffic with concurrency clients for seconds; return the measurements"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: {} for name in names}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client_loop(n):
+        client = make_client()
+        rng = random.Random(n)
+        while not stop.is_set():
+            name = rng.choices(names, weights=weights)[0]
+            start = time.perf_counter()
+            try:
+                error = getattr(traffic, name)(client)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if error is None:
+                    latencies[name].append(elapsed)
+                else:
+                    errors[name][error] = errors[name].get(error, 0) + 1
+
+    threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(concurrency)]
+    cpu_before = cpu_snapshot(root_pid)
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cpu_after = cpu_snapshot(root_pid)
+
+    endpoints = {}
+    for name in names:
+        values = latencies[name]
+        failed = sum(errors[name].values())
+        endpoints[name] = {
+            'requests': len(values) + failed,
+            'per_second': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 50), 2) if values else None,
+            'p95_ms': round(percentile(values, 95), 2) if values else None,
+            'p99_ms': round(percentile(values, 99), 2) if values else None,
+            'errors': failed,
+            'error_rate': round(failed / (len(values) + failed), 4) if values or failed else 0.0,
+            'error_messages': errors[name]
+        }
+    return {'concurrency': concurrency, 'seconds': round(elapsed, 2), 'endpoints': endpoints,
+            'cpu': cpu_usage(cpu_before, cpu_after, elapsed, root_pid)}
+
+def print_level(level):
+    for name, result in level['endpoints'].items():
+        p = [f"{result[key]:8.1f}" if result[key] is not None else f"{'-':>8}" for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{level['concurrency']:7d} {name:<9} {result['requests']:8d} {result['per_second']:8.2f} "
+              f"{' '.join(p)} {result['error_rate'] * 100:6.1f}%")
+    total = sum(result['per_second'] for result in level['endpoints'].values())
+    cpu = ', '.join(f"{usage['role']} {usage['pid']} {usage['cpu_percent']:.0f}%" for usage in level['cpu'])
+    print(f"{'':7} {'total':<9} {'':8} {total:8.2f}   cpu: {cpu or 'not measured'}", flush=True)
+
+def saturation(levels, name, growth=0.1):
+    """Concurrency after which an endpoint's throughput grows by less than growth (None if it keeps growing)"""
+    for previous, level in zip(levels, levels[1:]):
+        before = previous['endpoints'][name]['per_second']
+        if before and level['endpoints'][name]['per_second'] < before * (1 + growth):
+            return previous['concurrency']
+    return None
+
+def sweep(make_client, traffic, mix, args, root_pid):
+    """Warm up every endpoint, then run each concurrency level; return the levels"""
+    client = make_client()
+    for name in ('generate',) + tuple(mix):
+        getattr(traffic, name)(client)  # Loads the analysis stack, the index partition, ...
+
+    print(f"\n{'clients':>7} {'endpoint':<9} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    levels = []
+    for concurrency in args.concurrency:
+        level = run_level(make_client, traffic, mix, concurrency, args.seconds, root_pid)
+        print_level(level)
+        levels.append(level)
+
+    print()
+    for name in mix:
+        point = saturation(levels, name)
+        if len(levels) < 2:
+            found = "needs two or more concurrency levels to find its saturation point"
+        elif point is not None:
+            found = f"saturates at {point} clients"
+        else:
+            found = "still scaling at the highest level"
+        print(f"{name:<9} {found}")
+        for message, count in sorted(levels[-1]['endpoints'][name]['error_messages'].items(), key=lambda e: -e[1])[:3]:
+            print(f"{'':9} {count} x {message}")
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help='Endpoint weights')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Concurrent clients per level')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each level')
+    parser.add_argument('--serve', action='store_true', help='Serve the app over HTTP in this process')
+    parser.add_argument('--url', help='Load a separately started server instead')
+    parser.add_argument('--server-pid', type=int, help='PID of that server, for its CPU use')
+    parser.add_argument('--owner', type=int, default=LOAD_OWNER_ID, help='Owner sent in the X-Owner-Id header')
+    parser.add_argument('--items', type=int, default=500, help='Wardrobe items seeded in the scratch database')
+    parser.add_argument('--images', default=os.path.join('static', 'uploads'), help='Folder of payload images')
+    parser.add_argument('--max-images', type=int, default=50, help='Payload images loaded into memory')
+    parser.add_argument('--analysis-workers', type=int, help='ANALYSIS_WORKERS of the app in this process')
+    parser.add_argument('--isolate', action='store_true', help='Also run each endpoint of the mix on its own')
+    parser.add_argument('--output', help='Save the measurements as JSON')
+    args = parser.parse_args()
+
+    headers = {'X-Owner-Id': str(args.owner)}
+    payloads = load_payloads(args.images, args.max_images)
+    print(f"{len(payloads)} payload images, mix {', '.join(f'{name}={weight:g}' for name, weight in args.mix.items())}, "
+          f"{args.seconds:g} s per level")
+
+    server = app = shard = None
+    if args.url:
+        root_pid = args.server_pid
+        make_client = lambda: HttpClient(args.url, headers)
+    else:
+        # Point the app at a scratch database before it is imported
+        scratch = tempfile.mkdtemp(prefix='load-test-')
+        os.environ.pop('DATABASE_URL', None)
+        os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'load.db')
+        os.environ['FLASK_ANALYSIS_CACHE_FILE'] = 'null'
+        os.environ['FLASK_TENANT_HEADER'] = 'X-Owner-Id'
+        if args.analysis_workers is not None:
+            os.environ['FLASK_ANALYSIS_WORKERS'] = str(args.analysis_workers)
+
+        from sqlalchemy import insert
+        from app import create_app
+        from modules.database import db
+        from modules.models import WardrobeItem
+        from modules.tenancy import owner_shard
+        app = create_app()
+
+        with app.app_context():
+            db.create_all()
+            columns = ('name', 'category', 'color', 'season', 'image_path', 'features', 'status', 'owner_id')
+            rows = synthetic_wardrobe(args.items, owner_id=args.owner)
+            db.session.execute(insert(WardrobeItem), [{name: row[name] for name in columns} for row in rows])
+            db.session.commit()
+        upload_folder = os.path.join(app.static_folder, app.config['UPLOAD_FOLDER'])
+        shard = os.path.join(upload_folder, owner_shard(args.owner))
+        # /analyze-image leaves color visualizations in the upload folder
+        existing = set(glob.glob(os.path.join(upload_folder, 'color_analysis_*')))
+        root_pid = os.getpid()
+
+        if args.serve:
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No line per request
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+            url = f'http://127.0.0.1:{server.server_port}'
+            print(f"serving on {url}")
+            make_client = lambda: HttpClient(url, headers)
+        else:
+            make_client = lambda: WsgiClient(app, headers)
+
+    traffic = Traffic(payloads, seed=1)
+    try:
+        results = {'mix': args.mix, 'levels': sweep(make_client, traffic, args.mix, args, root_pid)}
+        if args.isolate:
+            results['isolated'] = {}
+            for name in args.mix:
+                print(f"\n== {name} only")
+                results['isolated'][name] = sweep(make_client, traffic, {name: 1.0}, args, root_pid)
+    finally:
+        if server is not None:
+            server.shutdown()
+        if app is not None:
+            # Let running analyses finish before their images are removed
+            app.extensions['analysis_worker'].shutdown(wait=True)
+        if shard is not None:
+            shutil.rmtree(shard, ignore_errors=True)
+            for path in set(glob.glob(os.path.join(upload_folder, 'color_analysis_*'))) - existing:
+                os.remove(path)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Reproducible benchmark suite with JSON results and a baseline comparison.
+
+'run' generates synthetic wardrobes (10, 1,000 and 100,000 items by default)
+and garment photos at several resolutions from fixed seeds, then times:
+
+- extract_dominant_colors on a photo of each resolution
+- find_closest_color on 1,000 random colors
+- OutfitGenerator.generate_multiple_outfits on each wardrobe (in-memory index)
+- GET /wardrobe and GET /saved-outfits on each wardrobe (scratch SQLite
+  database, one saved outfit per ten items)
+- POST /upload end to end (blob storage, database, inline analysis) with a
+  photo of each resolution
+
+and writes the median, p95, min and max of every benchmark to a JSON file.
+'compare' prints the change of each median between two result files and
+fails (exit status 1) when one got slower by more than --threshold percent.
+
+Usage:
+    python -m benchmarks.suite run [--sizes 10 1000 100000] [--repeat 20] [--output results.json]
+    python -m benchmarks.suite compare BASELINE CURRENT [--threshold 10]
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.bench_tenants import percentile
+from benchmarks.synthetic import IMAGE_RESOLUTIONS, synthetic_wardrobe, synthetic_garment_image, encode_jpeg
+
+# Owner of the benchmark uploads; its shard of the upload folder is removed afterwards
+BENCHMARK_OWNER_ID = 999999
+
+def measure(func, repeat, warmup=1):
+    """
+    Time a function.
+
+    Args:
+        func: Function called without arguments
+        repeat: Timed calls
+        warmup: Untimed calls first (the first one is reported as 'first_ms')
+
+    Returns:
+        Dictionary with median_ms, p95_ms, min_ms, max_ms, first_ms and runs
+    """
+    first = None
+    for _ in range(warmup):
+        start = time.perf_counter()
+        func()
+        first = first if first is not None else (time.perf_counter() - start) * 1000
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(percentile(samples, 95), 4),
+        'min_ms': round(min(samples), 4),
+        'max_ms': round(max(samples), 4),
+        'first_ms': round(first, 4) if first is not None else None,
+        'runs': repeat
+    }
+
+def environment():
+    """Where the results come from, so baselines are compared like for like"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except Exception:
+        commit = None
+    import numpy
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': numpy.__version__
+    }
+
+def run_suite(args):
+    results = {}
+
+    def report(name, result):
+        results[name] = result
+        print(f"{name:<40} {result['median_ms']:10.3f} {result['p95_ms']:10.3f} {result['first_ms']:10.3f}", flush=True)
+
+    # Point the app at a scratch database before it is imported
+    scratch = tempfile.mkdtemp(prefix='bench-suite-')
+    os.environ.pop('DATABASE_URL', None)
+    os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'suite.db')
+    os.environ['FLASK_ANALYSIS_CACHE_FILE'] = 'null'
+    os.environ['FLASK_ANALYSIS_WORKERS'] = '0'
+    os.environ['FLASK_TENANT_HEADER'] = 'X-Owner-Id'
+
+    from sqlalchemy import insert
+    from modules.garment_analyzer import extract_dominant_colors, find_closest_color
+    from modules.outfit_generator import OutfitGenerator, SavedOutfit
+    from modules.wardrobe_index import WardrobeIndex
+
+    print(f"{'benchmark':<40} {'median ms':>10} {'p95 ms':>10} {'first ms':>10}")
+
+    # Photos of each resolution, written once
+    photos = {}
+    for resolution, (width, height) in IMAGE_RESOLUTIONS.items():
+        photos[resolution] = synthetic_garment_image(width, height, seed=1)
+        path = os.path.join(scratch, f'{resolution}.jpg')
+        with open(path, 'wb') as f:
+            f.write(encode_jpeg(photos[resolution]))
+        report(f'extract_dominant_colors/{resolution}', measure(lambda: extract_dominant_colors(path), args.repeat))
+
+    rng = random.Random(3)
+    colors = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(1000)]
+    report('find_closest_color/1000', measure(lambda: [find_closest_color(color) for color in colors], args.repeat))
+
+    from app import create_app
+    from modules.database import db
+    from modules.models import WardrobeItem
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    headers = {'X-Owner-Id': '1'}
+    columns = ('id', 'name', 'category', 'color', 'season', 'image_path', 'features', 'status', 'owner_id')
+
+    seeded = saved = 0
+    for size in sorted(args.sizes):
+        rows = synthetic_wardrobe(size)
+        with app.app_context():
+            db.session.execute(insert(WardrobeItem), [{name: row[name] for name in columns} for row in rows[seeded:]])
+            ids = {}
+            for row in rows:
+                ids.setdefault(row['category'], []).append(row['id'])
+            outfit_rng = random.Random(size)
+            outfits = [{'name': f'outfit {n}', 'owner_id': 1,
+                        'top_id': outfit_rng.choice(ids['tops']), 'bottom_id': outfit_rng.choice(ids['bottoms'])}
+                       for n in range(saved, max(1, size // 10))]
+            if outfits:
+                db.session.execute(insert(SavedOutfit), outfits)
+            db.session.commit()
+        seeded, saved = size, max(saved, size // 10)
+
+        index = WardrobeIndex(ttl=None).for_owner(1)
+        index.load(rows)
+        generator = OutfitGenerator(season='Winter', index=index)
+        report(f'generate_multiple_outfits/{size}',
+               measure(lambda: generator.generate_multiple_outfits(count=3, mode='sample', seed=7), args.repeat))
+
+        for name, url in (('wardrobe', '/wardrobe'), ('saved-outfits', '/saved-outfits')):
+            def render():
+                response = client.get(url, headers=headers)
+                assert response.status_code == 200, f"{url} returned {response.status_code}"
+            report(f'render/{name}/{size}', measure(render, args.repeat))
+
+    # Every upload is a different image, so nothing is deduplicated
+    from modules.tenancy import owner_shard
+    upload_headers = {'X-Owner-Id': str(BENCHMARK_OWNER_ID)}
+    shard = os.path.join(app.static_folder, app.config['UPLOAD_FOLDER'], owner_shard(BENCHMARK_OWNER_ID))
+    try:
+        for resolution, image in photos.items():
+            variants = []
+            for n in range(args.upload_repeat + 1):
+                variant = image.copy()
+                variant[:8, :8] = n
+                variants.append(encode_jpeg(variant))
+            pending = iter(variants)
+
+            def upload():
+                data = {'file': (io.BytesIO(next(pending)), 'garment.jpg'), 'name': 'Benchmark item',
+                        'category': 'tops', 'color': 'Black', 'season': 'all'}
+                response = client.post('/upload', data=data, headers=upload_headers, content_type='multipart/form-data')
+                assert response.status_code == 302, f"/upload returned {response.status_code}"
+            report(f'upload/{resolution}', measure(upload, args.upload_repeat))
+    finally:
+        shutil.rmtree(shard, ignore_errors=True)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output = {'environment': environment(), 'settings': {'sizes': sorted(args.sizes), 'repeat': args.repeat,
+                                                        'upload_repeat': args.upload_repeat},
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    for label, run in (('baseline', baseline), ('current', current)):
+        env = run.get('environment', {})
+        print(f"{label:<9} {env.get('created')} commit {env.get('commit')} ({env.get('platform')}, {env.get('cpus')} CPUs)")
+    print(f"\n{'benchmark':<40} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+
+    slower = []
+    names = list(baseline['results']) + [name for name in current['results'] if name not in baseline['results']]
+    for name in names:
+        before = baseline['results'].get(name)
+        after = current['results'].get(name)
+        if before is None or after is None:
+            only = 'only in current' if before is None else 'only in baseline'
+            print(f"{name:<40} {only:>34}")
+            continue
+        change = (after['median_ms'] / before['median_ms'] - 1) * 100 if before['median_ms'] else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  slower'
+            slower.append(name)
+        elif change < -args.threshold:
+            flag = '  faster'
+        print(f"{name:<40} {before['median_ms']:12.3f} {after['median_ms']:12.3f} {change:+7.1f}%{flag}")
+
+    if slower:
+        print(f"\n{len(slower)} benchmark(s) slower by more than {args.threshold:g}%: {', '.join(slower)}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\nNo benchmark slower by more than {args.threshold:g}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the suite and save the results')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000], help='Wardrobe sizes')
+    run_parser.add_argument('--repeat', type=int, default=20, help='Timed runs per benchmark')
+    run_parser.add_argument('--upload-repeat', type=int, default=5, help='Timed uploads per resolution')
+    run_parser.add_argument('--output', default='benchmark-results.json', help='Results file')
+
+    compare_parser = commands.add_parser('compare', help='Compare two results files')
+    compare_parser.add_argument('baseline', help='Results to compare against')
+    compare_parser.add_argument('current', help='New results')
+    compare_parser.add_argument('--threshold', type=float, default=10, help='Percent slowdown counted as a regression')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run_suite(args)
+    else:
+        compare(args)
+
+if __name__ == '__main__':
+    main()
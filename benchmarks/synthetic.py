@@ -0,0 +1,140 @@
+"""
+Synthetic benchmark data: wardrobes and garment photos.
+
+Everything is generated from a seed, so runs on different machines or
+commits measure exactly the same inputs. synthetic_wardrobe(n)[:m] is
+synthetic_wardrobe(m), so a wardrobe can be grown without changing the
+items already there.
+"""
+import json
+import random
+import cv2
+import numpy as np
+from modules.color_names import COLOR_NAMES
+
+CATEGORY_WEIGHTS = {'tops': 35, 'bottoms': 25, 'outerwear': 10, 'footwear': 15, 'accessories': 15}
+
+# Most clothes are worn all year; the rest lean towards summer and winter
+SEASON_WEIGHTS = {'all': 40, 'summer': 18, 'winter': 18, 'spring': 12, 'fall': 12}
+
+# Wardrobes are dominated by neutrals; these are picked four times as often
+NEUTRAL_COLORS = {'Black', 'White', 'Gray', 'Dark Gray', 'Light Gray', 'Navy', 'Beige', 'Brown', 'Khaki'}
+
+# Free-text colors as users type them, on top of the analyzer's names
+FREE_TEXT_COLORS = ['black', 'white', 'grey', 'Navy Blue', 'Light blue', 'sky blue', 'olive',
+                    'black and white', 'blue denim', 'sage green', 'marron and black', 'Coffee Brown']
+
+# Share of items whose color was typed in rather than set by the analyzer
+FREE_TEXT_SHARE = 0.15
+
+# (width, height) of the synthetic photos: a small web upload, a photo
+# resized by a phone's share sheet and a full 12 MP phone photo
+IMAGE_RESOLUTIONS = {
+    'small': (400, 533),
+    'medium': (1200, 1600),
+    'large': (3024, 4032)
+}
+
+# Garment silhouette (a shirt with sleeves), in fractions of the image size
+_SILHOUETTE = np.array([(0.30, 0.12), (0.70, 0.12), (0.92, 0.34), (0.80, 0.42), (0.72, 0.34), (0.72, 0.90),
+                        (0.28, 0.90), (0.28, 0.34), (0.20, 0.42), (0.08, 0.34)])
+
+def _palette_features(rng, rgb, name):
+    """Features like the analyzer stores them: the main color plus two smaller ones"""
+    shares = sorted((rng.uniform(5, 20), rng.uniform(5, 20)), reverse=True)
+    colors = [{'rgb': list(rgb), 'percentage': round(100 - sum(shares), 2)}]
+    for share in shares:
+        other = rng.choice(list(COLOR_NAMES))
+        colors.append({'rgb': list(other), 'percentage': round(share, 2)})
+    return json.dumps({'colors': colors, 'primary_color': name})
+
+def synthetic_wardrobe(n_items, seed=42, owner_id=1, first_id=1):
+    """
+    Wardrobe items with a realistic mix of categories, seasons and colors.
+
+    Args:
+        n_items: Number of items
+        seed: Random seed; the same seed always gives the same wardrobe
+        owner_id: Owner of every item
+        first_id: ID of the first item (the others follow)
+
+    Returns:
+        List of dictionaries shaped like WardrobeItem.to_dict(), with the
+        features the analyzer would store for analyzer-named colors
+    """
+    rng = random.Random(seed)
+    named = list(COLOR_NAMES.items())
+    color_weights = [4 if name in NEUTRAL_COLORS else 1 for _, name in named]
+    categories = list(CATEGORY_WEIGHTS)
+    category_weights = list(CATEGORY_WEIGHTS.values())
+    seasons = list(SEASON_WEIGHTS)
+    season_weights = list(SEASON_WEIGHTS.values())
+
+    rows = []
+    for item_id in range(first_id, first_id + n_items):
+        # The first items cover every category in every season, so even the
+        # smallest wardrobe can make outfits
+        starter = item_id - first_id < len(categories)
+        if starter:
+            category = categories[item_id - first_id]
+        else:
+            category = rng.choices(categories, weights=category_weights)[0]
+        if rng.random() < FREE_TEXT_SHARE:
+            color, features = rng.choice(FREE_TEXT_COLORS), '{}'
+        else:
+            rgb, color = rng.choices(named, weights=color_weights)[0]
+            features = _palette_features(rng, rgb, color)
+        rows.append({
+            'id': item_id,
+            'name': f'{category} {item_id}',
+            'category': category,
+            'color': color,
+            'season': 'all' if starter else rng.choices(seasons, weights=season_weights)[0],
+            'image_path': f'uploads/{item_id}.jpg',
+            'features': features,
+            'status': 'ready',
+            'date_added': None,
+            'owner_id': owner_id
+        })
+    return rows
+
+def synthetic_garment_image(width, height, seed=0):
+    """
+    A product-style garment photo: a garment silhouette in a main color with
+    stripes of a second one, on a light background, with a lighting
+    gradient and sensor noise so that no two pixels quantize alike.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        seed: Random seed for the colors and noise
+
+    Returns:
+        RGB uint8 array of shape (height, width, 3)
+    """
+    rng = np.random.default_rng(seed)
+    colors = list(COLOR_NAMES)
+    main, accent = (colors[i] for i in rng.choice(len(colors), 2, replace=False))
+
+    image = np.empty((height, width, 3), dtype=np.int16)
+    image[:] = rng.integers(215, 250, 3)
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.fillPoly(mask, [(_SILHOUETTE * [width, height]).astype(np.int32)], 1)
+    garment = mask.astype(bool)
+    stripes = (np.arange(height) // max(1, height // 24)) % 3 == 0
+    image[garment] = main
+    image[garment & stripes[:, None]] = accent
+
+    # Light from the top left, then noise
+    gradient = np.linspace(12, -12, height, dtype=np.float32)[:, None] + np.linspace(6, -6, width, dtype=np.float32)
+    image += gradient.astype(np.int16)[:, :, None]
+    image += rng.integers(-8, 9, image.shape, dtype=np.int16)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def encode_jpeg(image, quality=90):
+    """Encode an RGB array as JPEG bytes"""
+    success, encoded = cv2.imencode('.jpg', cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise Exception("Could not encode synthetic image")
+    return encoded.tobytes()
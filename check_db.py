@@ -1,7 +1,9 @@
-from app import app, db
+from app import create_app, db
 import sqlite3
 import os
 
+app = create_app()
+
 try:
     with app.app_context():
         # Print app config for debugging
@@ -1,6 +1,8 @@
-from app import app, db
+from app import create_app, db
 import sqlite3
 
+app = create_app()
+
 with app.app_context():
     # Get the database path from your app config
     db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
@@ -1,5 +1,7 @@
 # ensure_models.py
-from app import app, db
+from app import create_app, db
 from modules.outfit_generator import SavedOutfit
 
+app = create_app()
+
 # This file just ensures all models are imported
\ No newline at end of file
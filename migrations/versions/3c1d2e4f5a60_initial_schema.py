@@ -0,0 +1,58 @@
+"""initial schema
+
+Revision ID: 3c1d2e4f5a60
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d2e4f5a60'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing databases were created by db.create_all() (or by hand), so
+    # only create the tables that are missing
+    existing = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'wardrobe_items' not in existing:
+        op.create_table('wardrobe_items',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=False),
+            sa.Column('color', sa.String(length=50), nullable=False),
+            sa.Column('season', sa.String(length=50), nullable=True),
+            sa.Column('image_path', sa.String(length=200), nullable=False),
+            sa.Column('features', sa.Text(), nullable=True),
+            sa.Column('date_added', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'saved_outfits' not in existing:
+        op.create_table('saved_outfits',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('top_id', sa.Integer(), nullable=True),
+            sa.Column('bottom_id', sa.Integer(), nullable=True),
+            sa.Column('outerwear_id', sa.Integer(), nullable=True),
+            sa.Column('footwear_id', sa.Integer(), nullable=True),
+            sa.Column('accessory_id', sa.Integer(), nullable=True),
+            sa.Column('date_created', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['top_id'], ['wardrobe_items.id']),
+            sa.ForeignKeyConstraint(['bottom_id'], ['wardrobe_items.id']),
+            sa.ForeignKeyConstraint(['outerwear_id'], ['wardrobe_items.id']),
+            sa.ForeignKeyConstraint(['footwear_id'], ['wardrobe_items.id']),
+            sa.ForeignKeyConstraint(['accessory_id'], ['wardrobe_items.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('saved_outfits')
+    op.drop_table('wardrobe_items')
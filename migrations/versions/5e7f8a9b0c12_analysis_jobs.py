@@ -0,0 +1,48 @@
+"""background analysis jobs
+
+Revision ID: 5e7f8a9b0c12
+Revises: 3c1d2e4f5a60
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7f8a9b0c12'
+down_revision = '3c1d2e4f5a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have created the new table on boot
+    inspector = sa.inspect(op.get_bind())
+    columns = [column['name'] for column in inspector.get_columns('wardrobe_items')]
+
+    if 'status' not in columns:
+        with op.batch_alter_table('wardrobe_items') as batch_op:
+            batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='ready'))
+
+    if 'analysis_jobs' not in inspector.get_table_names():
+        op.create_table('analysis_jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('item_id', sa.Integer(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['item_id'], ['wardrobe_items.id'], ondelete='SET NULL'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_analysis_jobs_status', 'analysis_jobs', ['status'])
+        op.create_index('ix_analysis_jobs_item_id', 'analysis_jobs', ['item_id'])
+
+
+def downgrade():
+    op.drop_index('ix_analysis_jobs_item_id', table_name='analysis_jobs')
+    op.drop_index('ix_analysis_jobs_status', table_name='analysis_jobs')
+    op.drop_table('analysis_jobs')
+    with op.batch_alter_table('wardrobe_items') as batch_op:
+        batch_op.drop_column('status')
@@ -0,0 +1,29 @@
+"""saved outfits keyset index
+
+Revision ID: 7a1b2c3d4e5f
+Revises: 5e7f8a9b0c12
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a1b2c3d4e5f'
+down_revision = '5e7f8a9b0c12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() creates the index on a fresh database, but not on an existing table
+    inspector = sa.inspect(op.get_bind())
+    indexes = [index['name'] for index in inspector.get_indexes('saved_outfits')]
+
+    if 'ix_saved_outfits_date_created_id' not in indexes:
+        op.create_index('ix_saved_outfits_date_created_id', 'saved_outfits', ['date_created', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_saved_outfits_date_created_id', table_name='saved_outfits')
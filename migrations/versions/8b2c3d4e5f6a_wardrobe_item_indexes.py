@@ -0,0 +1,38 @@
+"""wardrobe item indexes
+
+Revision ID: 8b2c3d4e5f6a
+Revises: 7a1b2c3d4e5f
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2c3d4e5f6a'
+down_revision = '7a1b2c3d4e5f'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_wardrobe_items_date_added_id': ['date_added', 'id'],
+    'ix_wardrobe_items_category_date_added_id': ['category', 'date_added', 'id'],
+    'ix_wardrobe_items_color_date_added_id': ['color', 'date_added', 'id'],
+    'ix_wardrobe_items_season_category': ['season', 'category'],
+}
+
+
+def upgrade():
+    # db.create_all() creates the indexes on a fresh database, but not on an existing table
+    inspector = sa.inspect(op.get_bind())
+    existing = [index['name'] for index in inspector.get_indexes('wardrobe_items')]
+
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'wardrobe_items', columns)
+
+
+def downgrade():
+    for name in reversed(list(INDEXES)):
+        op.drop_index(name, table_name='wardrobe_items')
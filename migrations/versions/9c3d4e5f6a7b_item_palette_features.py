@@ -0,0 +1,103 @@
+"""binary palette features
+
+Revision ID: 9c3d4e5f6a7b
+Revises: 8b2c3d4e5f6a
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+import json
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d4e5f6a7b'
+down_revision = '8b2c3d4e5f6a'
+branch_labels = None
+depends_on = None
+
+# The packing below is a frozen copy of modules.palettes (and the color
+# names and Lab conversion of modules.color_names) as of this revision, so
+# the migration keeps producing the same bytes whatever the app code becomes.
+
+# float32 rows of R, G, B (0-255), L*, a*, b*, weight (0-1), 5 colors per item
+PALETTE_COLORS = 5
+PALETTE_FIELDS = 7
+
+# primary_color_id is the position of the analyzer's color name in this list
+COLOR_NAMES = [
+    'Black', 'White', 'Gray', 'Dark Gray', 'Light Gray', 'Red', 'Dark Red', 'Crimson', 'Tomato', 'Coral',
+    'Pink', 'Hot Pink', 'Pale Violet Red', 'Orange', 'Dark Orange', 'Red-Orange', 'Yellow', 'Gold', 'Khaki',
+    'Green', 'Forest Green', 'Lime', 'Lime Green', 'Pale Green', 'Spring Green', 'Sea Green', 'Medium Sea Green',
+    'Light Sea Green', 'Teal', 'Blue', 'Dark Blue', 'Medium Blue', 'Royal Blue', 'Cornflower Blue', 'Sky Blue',
+    'Light Blue', 'Powder Blue', 'Cadet Blue', 'Steel Blue', 'Dodger Blue', 'Deep Sky Blue', 'Purple',
+    'Dark Violet', 'Dark Orchid', 'Blue Violet', 'Medium Purple', 'Medium Orchid', 'Orchid', 'Plum', 'Violet',
+    'Magenta', 'Deep Pink', 'Brown', 'Saddle Brown', 'Sienna', 'Chocolate', 'Peru', 'Burlywood', 'Beige',
+    'Antique White', 'Bisque', 'Navajo White', 'Wheat', 'Tan'
+]
+COLOR_NAME_IDS = {name: i for i, name in enumerate(COLOR_NAMES)}
+
+
+def rgb_to_lab(rgb):
+    """sRGB (N x 3, 0-255) to CIELAB with a D65 white point"""
+    srgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(srgb > 0.04045, ((srgb + 0.055) / 1.055) ** 2.4, srgb / 12.92)
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041]
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    epsilon = 216 / 24389
+    kappa = 24389 / 27
+    f = np.where(xyz > epsilon, np.cbrt(xyz), (kappa * xyz + 16) / 116)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def palette_columns(features):
+    """palette and primary_color_id values for an item's features JSON"""
+    features = json.loads(features or '{}') or {}
+    colors = sorted(features.get('colors') or [], key=lambda c: c['percentage'], reverse=True)[:PALETTE_COLORS]
+    palette = None
+    if colors:
+        packed = np.zeros((PALETTE_COLORS, PALETTE_FIELDS), dtype=np.float32)
+        rgb = np.array([c['rgb'] for c in colors], dtype=np.float64)
+        packed[:len(colors), 0:3] = rgb
+        packed[:len(colors), 3:6] = rgb_to_lab(rgb)
+        packed[:len(colors), 6] = [c['percentage'] / 100.0 for c in colors]
+        palette = packed.tobytes()
+    return {'palette': palette, 'primary_color_id': COLOR_NAME_IDS.get(features.get('primary_color'))}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = [column['name'] for column in inspector.get_columns('wardrobe_items')]
+
+    with op.batch_alter_table('wardrobe_items') as batch_op:
+        if 'palette' not in columns:
+            batch_op.add_column(sa.Column('palette', sa.LargeBinary(), nullable=True))
+        if 'primary_color_id' not in columns:
+            batch_op.add_column(sa.Column('primary_color_id', sa.Integer(), nullable=True))
+
+    # Pack the palettes already stored as JSON
+    bind = op.get_bind()
+    items = sa.table('wardrobe_items',
+                     sa.column('id', sa.Integer), sa.column('features', sa.Text),
+                     sa.column('palette', sa.LargeBinary), sa.column('primary_color_id', sa.Integer))
+    rows = bind.execute(sa.select(items.c.id, items.c.features).where(items.c.palette.is_(None))).all()
+    updates = []
+    for item_id, features in rows:
+        try:
+            updates.append({'item_id': item_id, **palette_columns(features)})
+        except ValueError:
+            continue  # Malformed JSON; the item keeps no palette until re-analyzed
+    if updates:
+        bind.execute(items.update().where(items.c.id == sa.bindparam('item_id')).values(
+            palette=sa.bindparam('palette'), primary_color_id=sa.bindparam('primary_color_id')), updates)
+
+
+def downgrade():
+    with op.batch_alter_table('wardrobe_items') as batch_op:
+        batch_op.drop_column('primary_color_id')
+        batch_op.drop_column('palette')
@@ -0,0 +1,71 @@
+"""wardrobe owners
+
+Revision ID: a4d5e6f7a8b9
+Revises: 9c3d4e5f6a7b
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d5e6f7a8b9'
+down_revision = '9c3d4e5f6a7b'
+branch_labels = None
+depends_on = None
+
+# Indexes replaced by owner-leading ones, per table
+OLD_INDEXES = {
+    'wardrobe_items': {
+        'ix_wardrobe_items_date_added_id': ['date_added', 'id'],
+        'ix_wardrobe_items_category_date_added_id': ['category', 'date_added', 'id'],
+        'ix_wardrobe_items_color_date_added_id': ['color', 'date_added', 'id'],
+        'ix_wardrobe_items_season_category': ['season', 'category'],
+    },
+    'saved_outfits': {
+        'ix_saved_outfits_date_created_id': ['date_created', 'id'],
+    },
+}
+
+NEW_INDEXES = {
+    'wardrobe_items': {
+        'ix_wardrobe_items_owner_date_added_id': ['owner_id', 'date_added', 'id'],
+        'ix_wardrobe_items_owner_category_date_added_id': ['owner_id', 'category', 'date_added', 'id'],
+        'ix_wardrobe_items_owner_color_date_added_id': ['owner_id', 'color', 'date_added', 'id'],
+        'ix_wardrobe_items_owner_season_category': ['owner_id', 'season', 'category'],
+    },
+    'saved_outfits': {
+        'ix_saved_outfits_owner_date_created_id': ['owner_id', 'date_created', 'id'],
+    },
+}
+
+
+def upgrade():
+    # Existing rows belong to the default owner (1), the single user so far
+    inspector = sa.inspect(op.get_bind())
+
+    for table in NEW_INDEXES:
+        columns = [column['name'] for column in inspector.get_columns(table)]
+        if 'owner_id' not in columns:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('owner_id', sa.Integer(), nullable=False, server_default='1'))
+
+        # db.create_all() creates the new indexes on a fresh database, but not on an existing table
+        existing = [index['name'] for index in inspector.get_indexes(table)]
+        for name in OLD_INDEXES[table]:
+            if name in existing:
+                op.drop_index(name, table_name=table)
+        for name, index_columns in NEW_INDEXES[table].items():
+            if name not in existing:
+                op.create_index(name, table, index_columns)
+
+
+def downgrade():
+    for table in NEW_INDEXES:
+        for name in NEW_INDEXES[table]:
+            op.drop_index(name, table_name=table)
+        for name, columns in OLD_INDEXES[table].items():
+            op.create_index(name, table, columns)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('owner_id')
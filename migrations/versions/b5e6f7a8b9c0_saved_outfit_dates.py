@@ -0,0 +1,35 @@
+"""saved outfit dates
+
+Revision ID: b5e6f7a8b9c0
+Revises: a4d5e6f7a8b9
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e6f7a8b9c0'
+down_revision = 'a4d5e6f7a8b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite stores DateTime as text. Rows dated by CURRENT_TIMESTAMP read
+    # 'YYYY-MM-DD HH:MM:SS', while SQLAlchemy writes and compares
+    # 'YYYY-MM-DD HH:MM:SS.ffffff', so the keyset pagination of saved
+    # outfits saw those rows as older than themselves. Other databases
+    # store real timestamps and need no change.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(sa.text(
+        "UPDATE saved_outfits SET date_created = date_created || '.000000' "
+        "WHERE date_created IS NOT NULL AND length(date_created) = 19"
+    ))
+
+
+def downgrade():
+    # The padded values are read back as the same datetimes
+    pass
@@ -0,0 +1,36 @@
+"""analysis job claims
+
+Revision ID: c6f7a8b9c0d1
+Revises: b5e6f7a8b9c0
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f7a8b9c0d1'
+down_revision = 'b5e6f7a8b9c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have created the columns on boot
+    inspector = sa.inspect(op.get_bind())
+    columns = [column['name'] for column in inspector.get_columns('analysis_jobs')]
+
+    with op.batch_alter_table('analysis_jobs') as batch_op:
+        if 'worker' not in columns:
+            batch_op.add_column(sa.Column('worker', sa.String(length=100), nullable=True))
+        if 'started_at' not in columns:
+            batch_op.add_column(sa.Column('started_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Jobs claimed but not finished go back to the queue
+    op.execute(sa.text("UPDATE analysis_jobs SET status = 'queued' WHERE status = 'running'"))
+    with op.batch_alter_table('analysis_jobs') as batch_op:
+        batch_op.drop_column('started_at')
+        batch_op.drop_column('worker')
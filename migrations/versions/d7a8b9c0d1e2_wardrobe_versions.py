@@ -0,0 +1,30 @@
+"""wardrobe versions
+
+Revision ID: d7a8b9c0d1e2
+Revises: c6f7a8b9c0d1
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a8b9c0d1e2'
+down_revision = 'c6f7a8b9c0d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # No rows are needed: an owner without one is at version 0
+    if 'wardrobe_versions' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('wardrobe_versions',
+            sa.Column('owner_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('owner_id')
+        )
+
+
+def downgrade():
+    op.drop_table('wardrobe_versions')
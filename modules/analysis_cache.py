@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, has_app_context
+
+# Bump this whenever the analysis output changes shape or meaning so that
+# stale entries are never served after an upgrade
+ANALYSIS_VERSION = 2
+
+def content_digest(data):
+    """
+    Compute the content hash used to address images.
+
+    Args:
+        data: Raw bytes of the file
+
+    Returns:
+        Hex SHA-256 digest string
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    Compute the content hash of a file on disk without loading it all at once.
+
+    Args:
+        path: Path to the file
+        chunk_size: Number of bytes read per iteration
+
+    Returns:
+        Hex SHA-256 digest string
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AnalysisCache:
+    """
+    Persistent, size-bounded LRU cache for image analysis results.
+
+    Hits only refresh an entry's last_used time once it is older than
+    touch_interval seconds, so repeated hits on a hot entry stay read-only
+    and the eviction order is approximate to within that interval.
+    """
+
+    def __init__(self, path, max_entries=2000, touch_interval=60):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: Path to the SQLite file backing the cache
+            max_entries: Maximum number of entries kept before LRU eviction
+            touch_interval: Seconds before a hit refreshes an entry's last_used time
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_last_used '
+                         'ON cache_entries (last_used)')
+
+    def _connect(self):
+        # A short-lived connection per operation keeps the cache safe to use
+        # from any thread or forked worker
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get_bytes(self, key):
+        """
+        Look up a raw value, marking it as recently used if its last_used
+        time is older than the touch interval.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The stored bytes, or None on a miss
+        """
+        with self._connect() as conn:
+            row = conn.execute('SELECT value, last_used FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            now = time.time()
+            if row is not None and now - row[1] > self.touch_interval:
+                # Conditional, so concurrent hits on the same entry write it once
+                conn.execute('UPDATE cache_entries SET last_used = ? WHERE key = ? AND last_used < ?',
+                             (now, key, now - self.touch_interval))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return bytes(row[0])
+
+    def set_bytes(self, key, value):
+        """
+        Store a raw value, evicting the least recently used entries if needed.
+
+        Args:
+            key: Cache key
+            value: Bytes to store
+        """
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, last_used) VALUES (?, ?, ?)',
+                         (key, sqlite3.Binary(value), time.time()))
+            count = conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute('''
+                    DELETE FROM cache_entries WHERE key IN (
+                        SELECT key FROM cache_entries ORDER BY last_used ASC LIMIT ?
+                    )
+                ''', (overflow,))
+                with self._lock:
+                    self.evictions += overflow
+
+    def get_json(self, key):
+        """Look up a JSON value, returning None on a miss"""
+        value = self.get_bytes(key)
+        if value is None:
+            return None
+        return json.loads(value.decode('utf-8'))
+
+    def set_json(self, key, value):
+        """Store a JSON-serializable value"""
+        self.set_bytes(key, json.dumps(value).encode('utf-8'))
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries')
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Report cache effectiveness.
+
+        Returns:
+            Dictionary with hit/miss/eviction counts, hit ratio and size
+        """
+        with self._connect() as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'entries': entries,
+                'max_entries': self.max_entries
+            }
+
+# Cache of an analysis pool worker process, set up by configure_cache()
+_cache = None
+
+def configure_cache(path, max_entries=2000, touch_interval=60):
+    """
+    Set up the analysis cache of a process without an application (a pool worker).
+
+    Args:
+        path: Path to the SQLite file backing the cache, or None to disable caching
+        max_entries: Maximum number of entries kept before LRU eviction
+        touch_interval: Seconds before a hit refreshes an entry's last_used time
+
+    Returns:
+        The configured AnalysisCache, or None when disabled
+    """
+    global _cache
+    _cache = AnalysisCache(path, max_entries, touch_interval) if path else None
+    return _cache
+
+def get_cache():
+    """
+    Return the analysis cache in use: the current app's
+    (app.extensions['analysis_cache']), or else the one configure_cache()
+    set up for this process. None if caching is disabled.
+    """
+    if has_app_context():
+        return current_app.extensions.get('analysis_cache')
+    return _cache
@@ -0,0 +1,398 @@
+import atexit
+import datetime
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import and_, or_
+from modules.database import db
+from modules.models import WardrobeItem, AnalysisJob
+from modules.analysis_cache import configure_cache
+from modules.color_quantizer import set_default_method
+from modules.color_names import configure_namer
+from modules.garment_classifier import DEFAULT_CATEGORIES, configure_classifier
+from modules.instrumentation import collect_spans, record_spans
+
+def analysis_settings(app):
+    """
+    Collect the analyzer configuration a worker process needs.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        Dictionary of picklable settings passed to every worker
+    """
+    cache_file = app.config.get('ANALYSIS_CACHE_FILE')
+    return {
+        'cache_path': os.path.join(app.instance_path, cache_file) if cache_file else None,
+        'cache_max_entries': app.config.get('ANALYSIS_CACHE_MAX_ENTRIES', 2000),
+        'cache_touch_interval': app.config.get('ANALYSIS_CACHE_TOUCH_INTERVAL', 60),
+        'quantizer': app.config.get('COLOR_QUANTIZER', 'minibatch'),
+        'naming_space': app.config.get('COLOR_NAMING_SPACE', 'rgb'),
+        'naming_lut': app.config.get('COLOR_NAMING_LUT', False),
+        'budget_ms': app.config.get('ANALYSIS_LATENCY_BUDGET_MS'),
+        'classifier': classifier_settings(app)
+    }
+
+def classifier_settings(app):
+    """
+    Keyword arguments of configure_classifier for the app configuration.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        Dictionary of picklable settings
+    """
+    model = app.config.get('CLASSIFIER_MODEL')
+    return {
+        'model_path': os.path.join(app.instance_path, model) if model else None,
+        'categories': tuple(app.config.get('CLASSIFIER_CATEGORIES', DEFAULT_CATEGORIES)),
+        'input_size': app.config.get('CLASSIFIER_INPUT_SIZE', 224),
+        'threads': app.config.get('CLASSIFIER_THREADS'),
+        'max_batch_size': app.config.get('CLASSIFIER_BATCH_SIZE', 8),
+        'max_wait_ms': app.config.get('CLASSIFIER_MAX_WAIT_MS', 5),
+        'warm': app.config.get('CLASSIFIER_WARMUP', True)
+    }
+
+def configure_analyzer(settings, worker=True):
+    """
+    Import the analysis stack (OpenCV, the quantizers, the classifier) and
+    apply analysis settings to the current process.
+
+    Args:
+        settings: Dictionary from analysis_settings()
+        worker: True for a pool worker (this is the pool initializer), False
+            for the web process, which keeps its own cache and batches
+            classifier calls across requests
+
+    Returns:
+        The garment_analyzer module
+    """
+    from modules import garment_analyzer
+
+    classifier = settings['classifier']
+    if worker:
+        configure_cache(settings['cache_path'], settings['cache_max_entries'], settings['cache_touch_interval'])
+        # A worker analyzes one image at a time, so there is nothing to batch;
+        # one torch thread per worker keeps the pool from oversubscribing the CPU
+        classifier = dict(classifier, max_batch_size=1, threads=classifier['threads'] or 1)
+    set_default_method(settings['quantizer'])
+    configure_namer(settings['naming_space'], settings['naming_lut'])
+    garment_analyzer.set_latency_budget(settings['budget_ms'])
+    configure_classifier(**classifier)
+    return garment_analyzer
+
+def run_analysis(image_path):
+    """
+    Analyze one image. Runs inside a worker process.
+
+    Args:
+        image_path: Absolute path of the image to analyze
+
+    Returns:
+        The analyze_garment result
+    """
+    from modules import garment_analyzer
+    return garment_analyzer.analyze_garment(image_path)
+
+def run_analysis_timed(image_path):
+    """
+    Analyze one image on a pool worker, keeping its stage timings.
+
+    Args:
+        image_path: Absolute path of the image to analyze
+
+    Returns:
+        Tuple of (analyze_garment result, spans), the spans to be recorded
+        in the web process (the worker's own metrics are never scraped)
+    """
+    with collect_spans() as spans:
+        result = run_analysis(image_path)
+    return result, spans
+
+def _record_timed(timed):
+    """Future of the result of a run_analysis_timed future, recording its spans when it finishes"""
+    future = Future()
+
+    def done(f):
+        if f.cancelled():
+            future.cancel()
+        elif f.exception() is not None:
+            future.set_exception(f.exception())
+        else:
+            result, spans = f.result()
+            record_spans(spans)
+            future.set_result(result)
+
+    timed.add_done_callback(done)
+    return future
+
+class AnalysisWorker:
+    """Run garment analysis on a local process pool, tracked by AnalysisJob rows"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._next_resume = 0
+        self._analyzer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Attach the worker to a Flask application.
+
+        ANALYSIS_WORKERS sets the pool size: None gives this process its
+        share of the cores (cores / WEB_WORKERS, as every web process starts
+        its own pool) and 0 runs analysis inline in the request (useful for
+        debugging).
+        """
+        self.app = app
+        workers = app.config.get('ANALYSIS_WORKERS')
+        if workers is None:
+            web_workers = max(1, app.config.get('WEB_WORKERS') or 1)
+            workers = max(1, (os.cpu_count() or 1) // web_workers)
+        self.max_workers = workers
+        self.lease = app.config.get('ANALYSIS_JOB_LEASE', 600)
+        app.extensions['analysis_worker'] = self
+
+        # Pick up jobs left unfinished by a previous run on the first request,
+        # then once per lease for jobs whose worker died since
+        @app.before_request
+        def resume_unfinished_jobs():
+            now = time.monotonic()
+            if now >= self._next_resume:
+                self._next_resume = now + self.lease if self.lease else float('inf')
+                self.resume_pending()
+
+    @property
+    def worker_id(self):
+        """Identifies this process in AnalysisJob.worker (read per call, as servers fork after create_app)"""
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def load_analyzer(self):
+        """
+        Set up the analysis stack in this process on first use.
+
+        Starting the app does not import OpenCV, scikit-learn or torch; they
+        are loaded by the first analysis run in the web process (inline
+        uploads, /analyze-image) or by warmup().
+
+        Returns:
+            The garment_analyzer module
+        """
+        if self._analyzer is None:
+            with self._lock:
+                if self._analyzer is None:
+                    self._analyzer = configure_analyzer(analysis_settings(self.app), worker=False)
+        return self._analyzer
+
+    @property
+    def executor(self):
+        """The process pool, started on first use so CLI commands don't spawn workers"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # 'spawn' keeps workers free of the parent's threads and DB connections
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=configure_analyzer,
+                        initargs=(analysis_settings(self.app),)
+                    )
+                    atexit.register(self.shutdown)
+        return self._executor
+
+    def shutdown(self, wait=False):
+        """
+        Stop the pool; queued analyses are cancelled (they resume on restart).
+
+        Args:
+            wait: Wait for the analyses already running to finish and be saved
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _image_path(self, item):
+        return os.path.join(self.app.static_folder, *item.image_path.replace('\\', '/').split('/'))
+
+    def submit(self, item):
+        """
+        Queue analysis for a saved WardrobeItem and mark it pending.
+
+        Args:
+            item: A committed WardrobeItem
+
+        Returns:
+            The AnalysisJob tracking the work, already claimed by this process
+        """
+        job = AnalysisJob(item_id=item.id, status='running', worker=self.worker_id,
+                          started_at=datetime.datetime.utcnow())
+        item.status = 'pending'
+        db.session.add(job)
+        db.session.commit()
+
+        self._dispatch(job.id, item.id, self._image_path(item))
+        return job
+
+    def analyze_async(self, image_path):
+        """
+        Analyze an image on the pool without creating a job.
+
+        Args:
+            image_path: Absolute path of the image to analyze
+
+        Returns:
+            A Future resolving to the analyze_garment result (already
+            resolved when running inline)
+        """
+        if self.max_workers == 0:
+            self.load_analyzer()
+            future = Future()
+            try:
+                future.set_result(run_analysis(image_path))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        try:
+            timed = self.executor.submit(run_analysis_timed, image_path)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool and retry once
+            self._reset_executor()
+            timed = self.executor.submit(run_analysis_timed, image_path)
+        return _record_timed(timed)
+
+    def _dispatch(self, job_id, item_id, image_path):
+        future = self.analyze_async(image_path)
+        future.add_done_callback(lambda f: self._on_done(job_id, item_id, f))
+
+    def _on_done(self, job_id, item_id, future):
+        # Runs on the pool's management thread in this process
+        if future.cancelled():
+            # Shutting down; the job goes back to the queue and is resumed on restart
+            self._release(job_id)
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._reset_executor()
+        if error is not None:
+            self._finish(job_id, item_id, error=str(error))
+        else:
+            self._finish(job_id, item_id, result=future.result())
+
+    def _finish(self, job_id, item_id, result=None, error=None):
+        """Store the outcome of a job and fill in the item's features"""
+        with self.app.app_context():
+            try:
+                job = db.session.get(AnalysisJob, job_id)
+                item = db.session.get(WardrobeItem, item_id) if item_id else None
+
+                if error is None and result and result.get('analysis_mode') == 'fallback':
+                    error = 'Could not analyze image'
+
+                if error is None:
+                    if item is not None:
+                        item.set_features(result.get('features', {}))
+                        item.status = 'ready'
+                    if job is not None:
+                        job.status = 'done'
+                else:
+                    self.app.logger.error("Error analyzing item %s: %s", item_id, error)
+                    if item is not None:
+                        item.status = 'failed'
+                    if job is not None:
+                        job.status = 'failed'
+                        job.error = error
+
+                if job is not None:
+                    job.finished_at = datetime.datetime.utcnow()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Error saving analysis result for job %s", job_id)
+
+    def _release(self, job_id):
+        """Put a job this process claimed but did not run back in the queue"""
+        with self.app.app_context():
+            try:
+                AnalysisJob.query.filter_by(id=job_id, status='running', worker=self.worker_id).update(
+                    {'status': 'queued', 'worker': None, 'started_at': None}, synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                # The lease hands the job to another worker later anyway
+                db.session.rollback()
+                self.app.logger.exception("Could not release analysis job %s", job_id)
+
+    def _claimable(self):
+        """Filter for jobs this process may take: queued, or running under an expired lease"""
+        claimable = AnalysisJob.status == 'queued'
+        if self.lease:
+            expired = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.lease)
+            claimable = or_(claimable, and_(AnalysisJob.status == 'running', AnalysisJob.started_at < expired))
+        return claimable
+
+    def claim(self, job_id):
+        """
+        Atomically take a job for this process.
+
+        The claim is a single conditional UPDATE, so when several web
+        processes resume jobs at once exactly one of them gets each job.
+
+        Args:
+            job_id: ID of an AnalysisJob
+
+        Returns:
+            True if this process now owns the job
+        """
+        claimed = AnalysisJob.query.filter(AnalysisJob.id == job_id, self._claimable()).update(
+            {'status': 'running', 'worker': self.worker_id, 'started_at': datetime.datetime.utcnow()},
+            synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def resume_pending(self):
+        """
+        Re-dispatch jobs that were still queued when the server stopped, and
+        jobs claimed by a worker that died (running for longer than
+        ANALYSIS_JOB_LEASE seconds).
+
+        Returns:
+            Number of jobs dispatched by this process
+        """
+        try:
+            job_ids = [job_id for job_id, in db.session.query(AnalysisJob.id).filter(self._claimable())]
+        except Exception as e:
+            # The jobs table may not exist yet (before 'flask db upgrade')
+            db.session.rollback()
+            self.app.logger.warning("Could not resume analysis jobs: %s", e)
+            return 0
+
+        resumed = 0
+        for job_id in job_ids:
+            if not self.claim(job_id):
+                continue  # Another process took it
+            job = db.session.get(AnalysisJob, job_id)
+            item = db.session.get(WardrobeItem, job.item_id) if job.item_id else None
+            if item is None:
+                job.status = 'failed'
+                job.error = 'Item no longer exists'
+                job.finished_at = datetime.datetime.utcnow()
+                db.session.commit()
+                continue
+            self._dispatch(job.id, item.id, self._image_path(item))
+            resumed += 1
+        return resumed
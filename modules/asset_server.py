@@ -0,0 +1,174 @@
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+from flask import request, send_file, abort, current_app
+from modules.analysis_cache import file_digest
+from modules.blob_store import GENERATED_PREFIXES, DERIVATIVES_FOLDER
+from modules.tenancy import current_owner_id, shard_owner_id
+
+# One year, the longest lifetime caches honour
+IMMUTABLE_MAX_AGE = 31536000
+
+# Files whose name is derived from their content: '<sha256>.<ext>' blobs and
+# '<sha256>-<width>.<format>' thumbnails
+HASHED_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}(-\d+)?\.[a-z0-9]+$')
+
+class AssetServer:
+    """
+    Serve uploads and generated images with strong ETags and long-lived caching.
+
+    Files in an owner shard (uploads/u<id>/...) are only served to that
+    owner; other owners get 404. Content-addressed files (blobs and their
+    thumbnails) are served with 'max-age=31536000, immutable' and an ETag
+    taken from the hash in their name. Other files get an ETag from a hash
+    of their content and must be revalidated. Owner files are 'private' so
+    shared caches never store them. If-None-Match is answered with 304
+    before any file is opened.
+
+    ASSET_SENDFILE hands the transfer to the front-end server so no Python
+    worker is tied up streaming bytes:
+
+    - 'x-sendfile': X-Sendfile header with the absolute path (Apache
+      mod_xsendfile, lighttpd)
+    - 'x-accel-redirect': X-Accel-Redirect header with ASSET_ACCEL_PREFIX
+      plus the path inside the static folder (nginx), e.g.
+
+          location /protected-static/ {
+              internal;
+              alias /srv/fashion-advisor/static/;
+          }
+    """
+
+    def __init__(self, app=None):
+        self._digests = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Attach to a Flask application.
+
+        Registers /static/<UPLOAD_FOLDER>/<path>, which takes precedence over
+        the default static route, so existing url_for('static', ...) links to
+        uploads are served here without changes.
+        """
+        self.sendfile = app.config.get('ASSET_SENDFILE')
+        self.accel_prefix = app.config.get('ASSET_ACCEL_PREFIX', '/protected-static/')
+        self.static_folder = app.static_folder
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        if self.sendfile not in (None, 'x-sendfile', 'x-accel-redirect'):
+            raise ValueError(f"Unknown ASSET_SENDFILE mode: {self.sendfile}")
+        app.extensions['asset_server'] = self
+
+        static_url = app.static_url_path.rstrip('/')
+        app.add_url_rule(f"{static_url}/{self.upload_folder}/<path:filename>", 'upload_file', self.serve_upload)
+
+    def serve_upload(self, filename):
+        """View function for files in the upload folder"""
+        return self.send(posixpath.join(self.upload_folder, filename))
+
+    def send(self, relative_path, mimetype=None):
+        """
+        Respond with a file from the upload folder (uploads and thumbnails).
+
+        Args:
+            relative_path: Path relative to the static folder, with '/' separators
+            mimetype: Content type, guessed from the name if omitted
+
+        Returns:
+            Flask response (304 when the client copy is current)
+        """
+        relative_path = posixpath.normpath(relative_path)
+        if not relative_path.startswith(self.upload_folder + '/'):
+            abort(404)
+        self.authorize(relative_path)
+        path = os.path.join(self.static_folder, *relative_path.split('/'))
+        if not os.path.isfile(path):
+            abort(404)
+
+        name = posixpath.basename(relative_path)
+        immutable = self.is_immutable(relative_path)
+        etag = self.etag(path, name if immutable else None)
+
+        # Answer revalidations without touching the file contents
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        elif self.sendfile == 'x-accel-redirect':
+            response = current_app.response_class(mimetype=mimetype or _guess_type(name))
+            response.headers['X-Accel-Redirect'] = self.accel_prefix.rstrip('/') + '/' + relative_path
+        elif self.sendfile == 'x-sendfile':
+            response = current_app.response_class(mimetype=mimetype or _guess_type(name))
+            response.headers['X-Sendfile'] = path
+        else:
+            response = send_file(path, mimetype=mimetype, etag=False, conditional=True, max_age=None)
+
+        response.set_etag(etag)
+        visibility = 'public' if self.owner_id(relative_path) is None else 'private'
+        if immutable:
+            response.headers['Cache-Control'] = f"{visibility}, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response.headers['Cache-Control'] = f"{visibility}, no-cache"
+        return response
+
+    def owner_id(self, relative_path):
+        """Owner of a file in an owner shard of the upload folder, or None for shared files"""
+        parts = posixpath.normpath(relative_path).split('/')
+        if len(parts) > 2 and parts[0] == self.upload_folder:
+            return shard_owner_id(parts[1])
+        return None
+
+    def authorize(self, relative_path):
+        """
+        Abort with 404 unless the current owner may read a file.
+
+        Args:
+            relative_path: Path relative to the static folder, with '/' separators
+        """
+        owner_id = self.owner_id(relative_path)
+        if owner_id is not None and owner_id != current_owner_id():
+            abort(404)
+
+    def is_immutable(self, relative_path):
+        """Whether a file can never change under its name"""
+        name = posixpath.basename(relative_path)
+        if name.startswith(GENERATED_PREFIXES):
+            return False  # Regenerated in place, e.g. color analysis images
+        folder = posixpath.dirname(relative_path)
+        if posixpath.basename(folder) == DERIVATIVES_FOLDER:
+            return HASHED_NAME_PATTERN.match(name) is not None
+        # Uploads, directly in the upload folder or in a per-owner shard, are
+        # never modified: new content gets a new (hash or UUID) name
+        return folder == self.upload_folder or posixpath.dirname(folder) == self.upload_folder
+
+    def etag(self, path, name=None):
+        """
+        Strong ETag for a file.
+
+        Args:
+            path: Absolute path of the file
+            name: File name to take the hash from for content-addressed
+                files, or None to hash the contents
+
+        Returns:
+            ETag value (without quotes)
+        """
+        if name and HASHED_NAME_PATTERN.match(name):
+            return name.replace('.', '-')
+
+        # Content hash, remembered until the file changes
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            with self._lock:
+                if len(self._digests) > 10000:
+                    self._digests.clear()
+                self._digests[key] = digest
+        return digest
+
+def _guess_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
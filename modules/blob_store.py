@@ -0,0 +1,232 @@
+import glob
+import os
+import posixpath
+import re
+import tempfile
+import threading
+from modules.analysis_cache import content_digest, file_digest
+
+# Blob filenames are the SHA-256 of the content plus the original extension
+BLOB_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+# Files in the upload folder that are generated rather than uploaded
+GENERATED_PREFIXES = ('temp_', 'color_analysis_')
+
+# Prefix of a blob moved aside while release() checks it is still unused
+RELEASING_PREFIX = 'temp_releasing_'
+
+# Folder inside the upload folder holding derived images (thumbnails)
+DERIVATIVES_FOLDER = 'thumbs'
+DERIVATIVE_SUFFIX_PATTERN = re.compile(r'^\d+\.[a-z0-9]+$')
+
+class BlobStore:
+    """Content-addressed store for uploaded images, keeping identical files once"""
+
+    def __init__(self, static_dir, upload_folder):
+        """
+        Args:
+            static_dir: Absolute path of the Flask static folder
+            upload_folder: Folder inside static_dir holding the blobs (e.g. 'uploads')
+        """
+        self.static_dir = static_dir
+        self.upload_folder = upload_folder
+        self.directory = os.path.join(static_dir, upload_folder)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def blob_name(self, digest, filename):
+        """Build the blob filename for a content digest and original filename"""
+        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+        return f"{digest}.{ext}"
+
+    def relative_path(self, name):
+        """Path relative to the static folder, as stored in WardrobeItem.image_path"""
+        return self.upload_folder + '/' + name
+
+    def absolute_path(self, image_path):
+        """Absolute filesystem path for a path relative to the static folder"""
+        return os.path.join(self.static_dir, *image_path.replace('\\', '/').split('/'))
+
+    def derivative_path(self, image_path, suffix):
+        """
+        Path of a file derived from a blob, relative to the static folder.
+
+        Args:
+            image_path: Path of the blob relative to the static folder
+            suffix: Distinguishes derivatives of one blob, e.g. '400.webp'
+
+        Returns:
+            Path like 'uploads/thumbs/<blob name without extension>-<suffix>',
+            in the thumbs folder next to the blob (so sharded blobs keep
+            their derivatives in their shard)
+        """
+        folder, name = posixpath.split(image_path.replace('\\', '/'))
+        stem = os.path.splitext(name)[0]
+        return f"{folder or self.upload_folder}/{DERIVATIVES_FOLDER}/{stem}-{suffix}"
+
+    def put(self, data, filename, shard=None):
+        """
+        Store bytes, reusing the existing blob if the same content is already stored.
+
+        Once the row referencing the blob is committed, call ensure() in
+        case a concurrent release() removed the blob in between.
+
+        Args:
+            data: Raw file bytes
+            filename: Original (secured) filename, used for its extension
+            shard: Optional subfolder of the upload folder to store the blob
+                in (e.g. one per owner); deduplication is per shard
+
+        Returns:
+            Path of the blob relative to the static folder
+        """
+        name = self.blob_name(content_digest(data), filename)
+        if shard:
+            name = shard + '/' + name
+        path = os.path.join(self.directory, *name.split('/'))
+
+        if not os.path.exists(path):
+            self._write(path, data)
+
+        return self.relative_path(name)
+
+    def ensure(self, image_path, read_bytes):
+        """
+        Restore a blob removed by a release() that raced with its upload.
+
+        Args:
+            image_path: Path returned by put(), whose row is now committed
+            read_bytes: Function returning the blob's bytes, only called if
+                the blob has to be written again
+
+        Returns:
+            True if the blob had to be written again
+        """
+        path = self.absolute_path(image_path)
+        if os.path.exists(path):
+            return False
+        self._write(path, read_bytes())
+        return True
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='temp_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def release(self, image_path, count_references):
+        """
+        Remove a blob once nothing references it any more.
+
+        An upload of the same content may reuse the blob (see put()) while
+        it is being released, in this or another process. So the blob is
+        moved aside, the references are counted again, and the blob is put
+        back if one appeared; an upload that committed after the second
+        count finds the blob gone in ensure() and writes it again.
+
+        Args:
+            image_path: Path of the blob relative to the static folder
+            count_references: Function returning the number of committed
+                references to the blob; it must see commits made by other
+                connections (i.e. end its transaction)
+
+        Returns:
+            True if the file was removed
+        """
+        if count_references() > 0:
+            return False
+
+        path = self.absolute_path(image_path)
+        directory, name = os.path.split(path)
+        aside = os.path.join(directory, f"{RELEASING_PREFIX}{os.getpid()}_{threading.get_ident()}_{name}")
+        try:
+            os.replace(path, aside)
+        except FileNotFoundError:
+            return False  # Already released
+
+        if count_references() > 0:
+            os.replace(aside, path)
+            return False
+        os.remove(aside)
+
+        # Derivatives are regenerated on demand, so they go with the blob
+        prefix = self.absolute_path(self.derivative_path(image_path, ''))
+        for derivative in glob.glob(glob.escape(prefix) + '*'):
+            if DERIVATIVE_SUFFIX_PATTERN.match(derivative[len(prefix):]):
+                os.remove(derivative)
+        return True
+
+    def compact(self, shards=None, dry_run=False):
+        """
+        Deduplicate the upload folder, copying every upload to its blob name.
+
+        Uploads that predate the store (and blobs compacted before uploads
+        were sharded) sit at the top of the upload folder. Each one is
+        copied to a blob in the shard of every owner using it, or to the
+        top of the folder when nobody does. The originals are left in place:
+        remove them with remove_files() once the database points at the
+        blobs, so a failed commit loses no image.
+
+        Args:
+            shards: Mapping of filename at the top of the upload folder to
+                the shards (e.g. 'u42') of the items using it
+            dry_run: Only report what would change
+
+        Returns:
+            Tuple of (mapping of (filename, shard or None) to new relative
+            path, stats dictionary, list of original paths to remove)
+        """
+        shards = shards or {}
+        mapping = {}
+        originals = []
+        written = set()
+        stats = {'files': 0, 'duplicates': 0, 'bytes_freed': 0}
+
+        for filename in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, filename)
+            if not os.path.isfile(path) or filename.startswith('.'):
+                continue
+            if filename.startswith(GENERATED_PREFIXES):
+                continue
+            if BLOB_NAME_PATTERN.match(filename) and not shards.get(filename):
+                continue
+
+            stats['files'] += 1
+            name = self.blob_name(file_digest(path), filename)
+            copies = 0
+            for shard in sorted(shards.get(filename, ())) or [None]:
+                blob = shard + '/' + name if shard else name
+                target = os.path.join(self.directory, *blob.split('/'))
+                mapping[(filename, shard)] = self.relative_path(blob)
+                if target in written or os.path.exists(target):
+                    stats['duplicates'] += 1
+                    continue
+                written.add(target)
+                copies += 1
+                if not dry_run:
+                    with open(path, 'rb') as f:
+                        self._write(target, f.read())
+
+            # Negative when several owners get their own copy
+            stats['bytes_freed'] += os.path.getsize(path) * (1 - copies)
+            originals.append(path)
+
+        return mapping, stats, originals
+
+    def remove_files(self, paths):
+        """
+        Remove files left behind by compact().
+
+        Args:
+            paths: Absolute paths returned by compact()
+        """
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
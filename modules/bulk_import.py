@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from sqlalchemy import insert
+from werkzeug.utils import secure_filename
+from modules.database import db
+from modules.models import WardrobeItem, DEFAULT_OWNER_ID, convert_numpy_types
+from modules.palettes import palette_columns
+from modules.tenancy import owner_shard
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+def _reader(path):
+    def read_bytes():
+        with open(path, 'rb') as f:
+            return f.read()
+    return read_bytes
+
+def _storage_reader(storage):
+    def read_bytes():
+        storage.stream.seek(0)
+        return storage.read()
+    return read_bytes
+
+def iter_directory(directory):
+    """
+    Yield (filename, read_bytes) pairs for every file under a directory.
+
+    Files are only read when read_bytes() is called (possibly more than
+    once), so a large directory is never held in memory at once.
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            yield name, _reader(os.path.join(root, name))
+
+def iter_uploads(file_storages):
+    """
+    Yield (filename, read_bytes) pairs for uploaded files, expanding zip archives.
+
+    Args:
+        file_storages: Iterable of Werkzeug FileStorage objects
+    """
+    for storage in file_storages:
+        if storage.filename.lower().endswith('.zip'):
+            # Uploaded files are spooled, so the archive can be read member by member
+            archive = zipfile.ZipFile(storage.stream)
+            for info in archive.infolist():
+                if info.is_dir() or os.path.basename(info.filename).startswith('.'):
+                    continue
+                yield os.path.basename(info.filename), (lambda info=info: archive.read(info))
+        else:
+            yield storage.filename, _storage_reader(storage)
+
+class BulkImporter:
+    """Import many garment images at once: store, analyze in parallel, insert in batches"""
+
+    def __init__(self, blob_store, analysis_worker, batch_size=50):
+        """
+        Args:
+            blob_store: BlobStore that receives the images
+            analysis_worker: AnalysisWorker whose pool runs the analysis
+            batch_size: Number of rows inserted per transaction
+        """
+        self.blob_store = blob_store
+        self.analysis_worker = analysis_worker
+        self.batch_size = batch_size
+
+    def import_files(self, files, season='all', category=None, owner_id=DEFAULT_OWNER_ID):
+        """
+        Import a stream of image files into the wardrobe.
+
+        Args:
+            files: Iterable of (filename, read_bytes) pairs
+            season: Season stored on every imported item
+            category: Category stored on every item, or None to use the analysis
+            owner_id: Owner of the imported items
+
+        Returns:
+            List of per-file result dictionaries (see iter_import)
+        """
+        return list(self.iter_import(files, season=season, category=category, owner_id=owner_id))
+
+    def iter_import(self, files, season='all', category=None, owner_id=DEFAULT_OWNER_ID):
+        """
+        Import a stream of image files, yielding a result as each file finishes.
+
+        Images are stored as they are read, analyzed on the process pool, and
+        inserted in batches of batch_size rows with a single executemany each.
+
+        Args:
+            files: Iterable of (filename, read_bytes) pairs
+            season: Season stored on every imported item
+            category: Category stored on every item, or None to use the analysis
+            owner_id: Owner of the imported items; images go to their upload shard
+
+        Yields:
+            Dictionaries with 'filename', 'status' ('imported' or 'error') and
+            either 'image_path' or 'error'
+        """
+        rows = []
+        in_flight = {}
+        max_in_flight = max(1, self.analysis_worker.max_workers) * 4
+
+        def pending_paths():
+            # Blobs that files still being analyzed or awaiting their batch will use
+            return [row['image_path'] for _, _, row in rows] + [path for _, path, _ in in_flight.values()]
+
+        def collect(done):
+            failures = []
+            for future in done:
+                filename, image_path, read_bytes = in_flight.pop(future)
+                try:
+                    analysis = future.result()
+                    if analysis.get('analysis_mode') == 'fallback':
+                        raise Exception('Could not analyze image')
+                except Exception as e:
+                    failures.append({'filename': filename, 'status': 'error', 'error': str(e)})
+                    self._discard(image_path, pending_paths())
+                    continue
+
+                features = convert_numpy_types(analysis.get('features', {}))
+                rows.append((filename, read_bytes, {
+                    'name': analysis['name'],
+                    'category': category or analysis['category'],
+                    'color': analysis['color'],
+                    'season': season,
+                    'image_path': image_path,
+                    'features': json.dumps(features),
+                    'status': 'ready',
+                    'owner_id': owner_id,
+                    **palette_columns(features)
+                }))
+            return failures
+
+        def flush():
+            # Files are only reported as imported once their batch is committed
+            batch = list(rows)
+            rows.clear()
+            try:
+                self._insert([row for _, _, row in batch])
+            except Exception as e:
+                # Nothing of the batch was saved, so its blobs go unless something else uses them
+                for image_path in sorted({row['image_path'] for _, _, row in batch}):
+                    self._discard(image_path, pending_paths())
+                return [{'filename': filename, 'status': 'error', 'error': f"Database error: {e}"}
+                        for filename, _, _ in batch]
+
+            # An item deleted meanwhile may have taken a shared blob with it
+            for _, read_bytes, row in batch:
+                self.blob_store.ensure(row['image_path'], read_bytes)
+            return [{'filename': filename, 'status': 'imported', 'image_path': row['image_path']}
+                    for filename, _, row in batch]
+
+        for filename, read_bytes in files:
+            filename = secure_filename(filename)
+            if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in IMAGE_EXTENSIONS:
+                yield {'filename': filename, 'status': 'error', 'error': 'Invalid file type'}
+                continue
+
+            try:
+                image_path = self.blob_store.put(read_bytes(), filename, shard=owner_shard(owner_id))
+                future = self.analysis_worker.analyze_async(self.blob_store.absolute_path(image_path))
+            except Exception as e:
+                yield {'filename': filename, 'status': 'error', 'error': str(e)}
+                continue
+            in_flight[future] = (filename, image_path, read_bytes)
+
+            # Keep a bounded number of analyses queued so memory stays flat
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                yield from collect(done)
+                if len(rows) >= self.batch_size:
+                    yield from flush()
+
+        while in_flight:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            yield from collect(done)
+            if len(rows) >= self.batch_size:
+                yield from flush()
+        yield from flush()
+
+    def _discard(self, image_path, pending_paths):
+        """
+        Remove the blob of a failed file unless an item (saved or pending) uses it.
+
+        Args:
+            image_path: Blob of the failed file
+            pending_paths: Blobs of the files of this import not yet saved
+        """
+        def count_references():
+            return pending_paths.count(image_path) + WardrobeItem.count_image_references(image_path)
+
+        try:
+            self.blob_store.release(image_path, count_references)
+        except OSError:
+            logger.exception("Error deleting file %s", image_path)
+
+    def _insert(self, rows):
+        """Insert the accumulated rows in one executemany transaction"""
+        if not rows:
+            return
+        try:
+            db.session.execute(insert(WardrobeItem), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import numpy as np
+from flask import current_app, has_app_context
+
+# Rules shipped with the app; COLOR_COMPATIBILITY_FILE in config.py can point elsewhere
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'data', 'color_compatibility.json')
+
+def load_rules(path=None):
+    """
+    Read color compatibility rules from a JSON file.
+
+    The file has a "compatible" object mapping each color to the colors it
+    goes with.
+
+    Args:
+        path: Path to the rules file, defaults to DEFAULT_RULES_FILE
+
+    Returns:
+        Dictionary of color -> list of compatible colors
+    """
+    with open(path or DEFAULT_RULES_FILE, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    return rules.get('compatible', {})
+
+class CompatibilityMatrix:
+    """
+    Color compatibility compiled into a symmetric boolean matrix.
+
+    Color names are interned to small integer IDs, matched exactly as the
+    rules and items spell them. Colors not covered by the rules get their
+    own ID on first sight and are only compatible with themselves.
+    """
+
+    def __init__(self, compatible):
+        """
+        Args:
+            compatible: Dictionary of color -> list of compatible colors
+        """
+        # The rules as loaded, for code that reads them directly
+        self.rules = compatible
+        self._ids = {}
+        self.names = []
+        self._lock = threading.Lock()
+
+        for color, others in compatible.items():
+            self._intern(color)
+            for other in others:
+                self._intern(other)
+
+        size = len(self.names)
+        matrix = np.eye(size, dtype=bool)
+        for color, others in compatible.items():
+            i = self._ids[color]
+            for other in others:
+                j = self._ids[other]
+                matrix[i, j] = matrix[j, i] = True
+        self.matrix = matrix
+
+    @classmethod
+    def from_file(cls, path=None):
+        """Compile the rules stored in a JSON file (see load_rules)"""
+        return cls(load_rules(path))
+
+    def _intern(self, name):
+        color_id = self._ids.get(name)
+        if color_id is None:
+            color_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return color_id
+
+    def color_id(self, name):
+        """
+        Integer ID of a color name, assigning a new one to unknown colors.
+
+        Args:
+            name: Color name as stored on an item
+
+        Returns:
+            Integer index into the matrix
+        """
+        color_id = self._ids.get(name)
+        if color_id is not None:
+            return color_id
+
+        with self._lock:
+            color_id = self._ids.get(name)
+            if color_id is None:
+                color_id = self._intern(name)
+                # Grow the matrix; readers holding the old array keep a valid view
+                size = len(self.names)
+                matrix = np.eye(size, dtype=bool)
+                matrix[:size - 1, :size - 1] = self.matrix
+                self.matrix = matrix
+        return color_id
+
+    def color_ids(self, names):
+        """Vector of IDs for a sequence of color names"""
+        return np.fromiter((self.color_id(name) for name in names), dtype=np.int32, count=len(names))
+
+    def compatible(self, color1, color2):
+        """
+        Check if two colors are compatible.
+
+        Args:
+            color1: First color name
+            color2: Second color name
+
+        Returns:
+            Boolean indicating if colors are compatible
+        """
+        i, j = self.color_id(color1), self.color_id(color2)
+        return bool(self.matrix[i, j])
+
+    def mask(self, anchor_ids, candidate_ids):
+        """
+        Which candidates go with at least one of the anchor colors.
+
+        Args:
+            anchor_ids: Sequence of color IDs already in the outfit
+            candidate_ids: Array of color IDs of the candidate items
+
+        Returns:
+            Boolean array, one entry per candidate
+        """
+        matrix = self.matrix
+        return matrix[np.asarray(anchor_ids, dtype=np.int32)][:, candidate_ids].any(axis=0)
+
+# Matrix used outside an application (scripts, benchmarks), set up by configure_compatibility()
+_matrix = None
+
+def init_app(app):
+    """
+    Compile the rules in the app's COLOR_COMPATIBILITY_FILE (relative to the
+    app folder; the shipped rules when unset) for that app only.
+
+    Returns:
+        The compiled CompatibilityMatrix, also in app.extensions['color_compatibility']
+    """
+    rules_file = app.config.get('COLOR_COMPATIBILITY_FILE')
+    matrix = CompatibilityMatrix.from_file(os.path.join(app.root_path, rules_file) if rules_file else None)
+    app.extensions['color_compatibility'] = matrix
+    return matrix
+
+def configure_compatibility(path=None):
+    """
+    Load the compatibility matrix used outside an application from a rules file.
+
+    Args:
+        path: Path to the rules file, defaults to DEFAULT_RULES_FILE
+
+    Returns:
+        The compiled CompatibilityMatrix
+    """
+    global _matrix
+    _matrix = CompatibilityMatrix.from_file(path)
+    return _matrix
+
+def get_compatibility():
+    """
+    Return the compatibility matrix in use: the current app's (see init_app),
+    or else the process-wide one, loading the default rules if needed
+    """
+    if has_app_context():
+        matrix = current_app.extensions.get('color_compatibility')
+        if matrix is not None:
+            return matrix
+    if _matrix is None:
+        configure_compatibility()
+    return _matrix
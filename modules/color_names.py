@@ -0,0 +1,238 @@
+import threading
+import numpy as np
+
+# Color name mapping - RGB values to color names
+COLOR_NAMES = {
+    # Black, white, gray
+    (0, 0, 0): 'Black',
+    (255, 255, 255): 'White',
+    (128, 128, 128): 'Gray',
+    (169, 169, 169): 'Dark Gray',
+    (211, 211, 211): 'Light Gray',
+    
+    # Red shades
+    (255, 0, 0): 'Red',
+    (178, 34, 34): 'Dark Red',
+    (220, 20, 60): 'Crimson',
+    (255, 99, 71): 'Tomato',
+    (255, 127, 80): 'Coral',
+    
+    # Pink shades
+    (255, 192, 203): 'Pink',
+    (255, 105, 180): 'Hot Pink',
+    (219, 112, 147): 'Pale Violet Red',
+    
+    # Orange shades
+    (255, 165, 0): 'Orange',
+    (255, 140, 0): 'Dark Orange',
+    (255, 69, 0): 'Red-Orange',
+    
+    # Yellow shades
+    (255, 255, 0): 'Yellow',
+    (255, 215, 0): 'Gold',
+    (240, 230, 140): 'Khaki',
+    
+    # Green shades
+    (0, 128, 0): 'Green',
+    (34, 139, 34): 'Forest Green',
+    (0, 255, 0): 'Lime',
+    (50, 205, 50): 'Lime Green',
+    (152, 251, 152): 'Pale Green',
+    (0, 255, 127): 'Spring Green',
+    (46, 139, 87): 'Sea Green',
+    (60, 179, 113): 'Medium Sea Green',
+    (32, 178, 170): 'Light Sea Green',
+    (0, 128, 128): 'Teal',
+    
+    # Blue shades
+    (0, 0, 255): 'Blue',
+    (0, 0, 139): 'Dark Blue',
+    (0, 0, 205): 'Medium Blue',
+    (65, 105, 225): 'Royal Blue',
+    (100, 149, 237): 'Cornflower Blue',
+    (135, 206, 235): 'Sky Blue',
+    (173, 216, 230): 'Light Blue',
+    (176, 224, 230): 'Powder Blue',
+    (95, 158, 160): 'Cadet Blue',
+    (70, 130, 180): 'Steel Blue',
+    (30, 144, 255): 'Dodger Blue',
+    (0, 191, 255): 'Deep Sky Blue',
+    
+    # Purple shades
+    (128, 0, 128): 'Purple',
+    (148, 0, 211): 'Dark Violet',
+    (153, 50, 204): 'Dark Orchid',
+    (138, 43, 226): 'Blue Violet',
+    (147, 112, 219): 'Medium Purple',
+    (186, 85, 211): 'Medium Orchid',
+    (218, 112, 214): 'Orchid',
+    (221, 160, 221): 'Plum',
+    (238, 130, 238): 'Violet',
+    (255, 0, 255): 'Magenta',
+    (255, 20, 147): 'Deep Pink',
+    
+    # Brown shades
+    (165, 42, 42): 'Brown',
+    (139, 69, 19): 'Saddle Brown',
+    (160, 82, 45): 'Sienna',
+    (210, 105, 30): 'Chocolate',
+    (205, 133, 63): 'Peru',
+    (222, 184, 135): 'Burlywood',
+    (245, 245, 220): 'Beige',
+    (250, 235, 215): 'Antique White',
+    (255, 228, 196): 'Bisque',
+    (255, 222, 173): 'Navajo White',
+    (245, 222, 179): 'Wheat',
+    (210, 180, 140): 'Tan'
+}
+
+# Number of levels per channel in the quantized lookup table
+LUT_LEVELS = 32
+
+def rgb_to_lab(rgb):
+    """
+    Convert sRGB colors to CIELAB (D65 white point).
+
+    Args:
+        rgb: Array of shape (N, 3) with values in 0-255
+
+    Returns:
+        Float array of shape (N, 3) with L*, a*, b* values
+    """
+    srgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(srgb > 0.04045, ((srgb + 0.055) / 1.055) ** 2.4, srgb / 12.92)
+
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041]
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+
+    epsilon = 216 / 24389
+    kappa = 24389 / 27
+    f = np.where(xyz > epsilon, np.cbrt(xyz), (kappa * xyz + 16) / 116)
+
+    return np.stack([
+        116 * f[:, 1] - 16,
+        500 * (f[:, 0] - f[:, 1]),
+        200 * (f[:, 1] - f[:, 2])
+    ], axis=1)
+
+class ColorNamer:
+    """Map RGB colors to the nearest named color with vectorized lookups"""
+
+    def __init__(self, palette=None, space='rgb', use_lut=False):
+        """
+        Precompute the palette matrix.
+
+        Args:
+            palette: Mapping of (R, G, B) tuples to names, defaults to COLOR_NAMES
+            space: 'rgb' for plain Euclidean distance (the original behaviour)
+                or 'lab' for perceptual CIELAB distance
+            use_lut: Answer queries from a precomputed 32x32x32 table instead
+                of computing distances (approximate to within one table cell)
+        """
+        if space not in ('rgb', 'lab'):
+            raise ValueError(f"Unknown color space '{space}', expected 'rgb' or 'lab'")
+
+        palette = palette if palette is not None else COLOR_NAMES
+        self.space = space
+        self.use_lut = use_lut
+        self.names = list(palette.values())
+        self.rgb = np.array(list(palette.keys()), dtype=np.float64)
+        self.points = self._convert(self.rgb)
+        self._point_norms = (self.points * self.points).sum(axis=1)
+        self._lut = None
+        self._lut_lock = threading.Lock()
+
+    def _convert(self, rgb):
+        """Project RGB values into the space distances are measured in"""
+        return rgb_to_lab(rgb) if self.space == 'lab' else np.asarray(rgb, dtype=np.float64)
+
+    @property
+    def signature(self):
+        """Short string identifying the naming configuration (used in cache keys)"""
+        return self.space + ('-lut' if self.use_lut else '')
+
+    def nearest_indices(self, rgb):
+        """
+        Index into the palette of the nearest named color for each query.
+
+        Args:
+            rgb: Array-like of shape (N, 3) with RGB values
+
+        Returns:
+            Int array of shape (N,)
+        """
+        rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+        if self.use_lut:
+            return self.lookup_table()[self._lut_cells(rgb)]
+        return self._exact_indices(rgb)
+
+    def _exact_indices(self, rgb):
+        points = self._convert(rgb)
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2; |p|^2 does not change the argmin
+        distances = self._point_norms[None, :] - 2.0 * points @ self.points.T
+        return distances.argmin(axis=1)
+
+    def _lut_cells(self, rgb):
+        step = 256 // LUT_LEVELS
+        cells = np.clip(rgb, 0, 255).astype(np.int64) // step
+        return (cells[:, 0] * LUT_LEVELS + cells[:, 1]) * LUT_LEVELS + cells[:, 2]
+
+    def lookup_table(self):
+        """
+        Build (once) the quantized table giving the palette index of every cell.
+
+        Returns:
+            Uint8 array of LUT_LEVELS**3 palette indices
+        """
+        if self._lut is None:
+            with self._lut_lock:
+                if self._lut is None:
+                    step = 256 // LUT_LEVELS
+                    centers = np.arange(LUT_LEVELS) * step + step // 2
+                    grid = np.stack(np.meshgrid(centers, centers, centers, indexing='ij'), axis=-1).reshape(-1, 3)
+                    self._lut = self._exact_indices(grid).astype(np.uint8)
+        return self._lut
+
+    def name_many(self, rgb):
+        """
+        Name a batch of colors.
+
+        Args:
+            rgb: Array-like of shape (N, 3) with RGB values
+
+        Returns:
+            List of N color names
+        """
+        return [self.names[i] for i in self.nearest_indices(rgb)]
+
+    def name(self, rgb):
+        """Name a single (R, G, B) color"""
+        return self.names[self.nearest_indices(rgb)[0]]
+
+# Process-wide namer, set up by configure_namer()
+_namer = None
+
+def configure_namer(space='rgb', use_lut=False):
+    """
+    Set up the process-wide color namer.
+
+    Args:
+        space: 'rgb' or 'lab'
+        use_lut: Whether to answer queries from the quantized lookup table
+
+    Returns:
+        The configured ColorNamer
+    """
+    global _namer
+    _namer = ColorNamer(space=space, use_lut=use_lut)
+    return _namer
+
+def get_namer():
+    """Return the process-wide color namer, creating the default one if needed"""
+    if _namer is None:
+        return configure_namer()
+    return _namer
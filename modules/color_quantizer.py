@@ -0,0 +1,189 @@
+import numpy as np
+
+# Registered quantization backends, by name
+QUANTIZERS = {}
+
+# Backend used when a caller does not ask for a specific one
+DEFAULT_METHOD = 'minibatch'
+
+def register_quantizer(name):
+    """Decorator registering a function as a color quantization backend"""
+    def decorator(func):
+        QUANTIZERS[name] = func
+        return func
+    return decorator
+
+def set_default_method(name):
+    """
+    Change the backend used by quantize() when no method is given.
+
+    Args:
+        name: Name of a registered backend
+    """
+    global DEFAULT_METHOD
+    if name not in QUANTIZERS:
+        raise ValueError(f"Unknown color quantizer '{name}'. Available: {', '.join(sorted(QUANTIZERS))}")
+    DEFAULT_METHOD = name
+
+def get_default_method():
+    """Return the name of the backend used when no method is given"""
+    return DEFAULT_METHOD
+
+def quantize(pixels, n_colors=5, method=None):
+    """
+    Reduce a list of pixels to a small palette.
+
+    Every backend returns the same shape, so callers can switch freely.
+
+    Args:
+        pixels: Array of shape (N, 3) with RGB values
+        n_colors: Number of palette colors to extract
+        method: Name of the backend, defaults to DEFAULT_METHOD
+
+    Returns:
+        Tuple of (centers, counts): float array (K, 3) of palette colors and
+        int array (K,) with the number of pixels assigned to each color
+    """
+    method = method or DEFAULT_METHOD
+    if method not in QUANTIZERS:
+        raise ValueError(f"Unknown color quantizer '{method}'. Available: {', '.join(sorted(QUANTIZERS))}")
+    return QUANTIZERS[method](np.asarray(pixels, dtype=np.float32), n_colors)
+
+def _squared_distances(pixels, centers):
+    """Squared Euclidean distance from every pixel to every center, shape (N, K)"""
+    distances = (pixels * pixels).sum(axis=1)[:, None] \
+        - 2.0 * pixels @ centers.T \
+        + (centers * centers).sum(axis=1)[None, :]
+    return np.maximum(distances, 0.0)
+
+def _sum_by_label(pixels, labels, n_labels):
+    """Per-label channel sums, shape (n_labels, 3)"""
+    return np.stack([np.bincount(labels, weights=pixels[:, c], minlength=n_labels) for c in range(3)], axis=1)
+
+def _kmeans_plus_plus(pixels, n_colors, rng):
+    """Pick initial centers with the k-means++ seeding strategy"""
+    centers = np.empty((n_colors, 3), dtype=np.float32)
+    centers[0] = pixels[rng.integers(len(pixels))]
+    closest = _squared_distances(pixels, centers[:1])[:, 0]
+
+    for i in range(1, n_colors):
+        total = closest.sum()
+        if total <= 0:
+            # Fewer distinct colors than clusters; duplicate the last center
+            centers[i:] = centers[i - 1]
+            break
+        centers[i] = pixels[rng.choice(len(pixels), p=closest / total)]
+        closest = np.minimum(closest, _squared_distances(pixels, centers[i:i + 1])[:, 0])
+
+    return centers
+
+@register_quantizer('minibatch')
+def minibatch_kmeans(pixels, n_colors, seed=42, batch_size=2048, max_iter=50, tol=0.5):
+    """
+    Vectorized mini-batch k-means with a single k-means++ initialization.
+
+    Args:
+        pixels: Float array of shape (N, 3)
+        n_colors: Number of clusters
+        seed: Seed for the random generator, so results are deterministic
+        batch_size: Number of pixels sampled per iteration
+        max_iter: Maximum number of mini-batch iterations
+        tol: Stop once no center moves further than this (in RGB units)
+
+    Returns:
+        Tuple of (centers, counts)
+    """
+    rng = np.random.default_rng(seed)
+    sample = pixels if len(pixels) <= batch_size * 4 else pixels[rng.choice(len(pixels), batch_size * 4, replace=False)]
+    centers = _kmeans_plus_plus(sample, n_colors, rng)
+    seen = np.zeros(n_colors, dtype=np.float64)
+
+    for _ in range(max_iter):
+        batch = pixels if len(pixels) <= batch_size else pixels[rng.integers(len(pixels), size=batch_size)]
+        labels = _squared_distances(batch, centers).argmin(axis=1)
+
+        # Per-center learning rate 1 / (points seen so far), as in Sculley (2010)
+        batch_counts = np.bincount(labels, minlength=n_colors)
+        sums = _sum_by_label(batch, labels, n_colors)
+        seen += batch_counts
+        updated = batch_counts > 0
+        rate = (batch_counts[updated] / seen[updated])[:, None]
+        new_centers = centers.copy()
+        new_centers[updated] = (1 - rate) * centers[updated] + rate * (sums[updated] / batch_counts[updated][:, None])
+
+        shift = np.abs(new_centers - centers).max()
+        centers = new_centers
+        if shift < tol:
+            break
+
+    labels = _squared_distances(pixels, centers).argmin(axis=1)
+    counts = np.bincount(labels, minlength=n_colors)
+    return centers, counts
+
+@register_quantizer('median_cut')
+def median_cut(pixels, n_colors, bits=5):
+    """
+    Median-cut quantization over a 3-D color histogram.
+
+    Pixels are first binned into a (2**bits)^3 histogram, so the cost of the
+    splitting step is independent of the image size.
+
+    Args:
+        pixels: Float array of shape (N, 3)
+        n_colors: Number of palette colors
+        bits: Bits kept per channel when building the histogram
+
+    Returns:
+        Tuple of (centers, counts)
+    """
+    shift = 8 - bits
+    levels = 1 << bits
+    binned = np.clip(pixels, 0, 255).astype(np.int32) >> shift
+    flat = (binned[:, 0] * levels + binned[:, 1]) * levels + binned[:, 2]
+    histogram = np.bincount(flat, minlength=levels ** 3)
+
+    # Work on the occupied bins only, each represented by its mean color
+    occupied = np.nonzero(histogram)[0]
+    weights = histogram[occupied].astype(np.float64)
+    sums = _sum_by_label(pixels, flat, levels ** 3)
+    colors = sums[occupied] / weights[:, None]
+
+    boxes = [np.arange(len(occupied))]
+    while len(boxes) < n_colors:
+        # Split the box with the largest weighted spread along its widest channel
+        best, best_score, best_axis = None, 0.0, 0
+        for i, box in enumerate(boxes):
+            if len(box) < 2:
+                continue
+            ranges = colors[box].max(axis=0) - colors[box].min(axis=0)
+            axis = int(ranges.argmax())
+            score = ranges[axis] * weights[box].sum()
+            if score > best_score:
+                best, best_score, best_axis = i, score, axis
+        if best is None:
+            break
+
+        box = boxes.pop(best)
+        order = box[np.argsort(colors[box, best_axis], kind='stable')]
+        cumulative = np.cumsum(weights[order])
+        split = int(np.searchsorted(cumulative, cumulative[-1] / 2.0))
+        split = min(max(split, 1), len(order) - 1)
+        boxes.extend([order[:split], order[split:]])
+
+    centers = np.array([np.average(colors[box], axis=0, weights=weights[box]) for box in boxes], dtype=np.float32)
+    counts = np.array([int(weights[box].sum()) for box in boxes], dtype=np.int64)
+    return centers, counts
+
+@register_quantizer('sklearn')
+def sklearn_kmeans(pixels, n_colors):
+    """
+    Reference backend: scikit-learn KMeans with 10 initializations.
+
+    This is the original implementation, kept to measure the faster backends against.
+    """
+    from sklearn.cluster import KMeans
+
+    kmeans = KMeans(n_clusters=n_colors, n_init=10, random_state=42)
+    kmeans.fit(pixels.astype(np.float64))
+    counts = np.bincount(kmeans.labels_, minlength=n_colors)
+    return kmeans.cluster_centers_, counts
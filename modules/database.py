@@ -1,14 +1,71 @@
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
-import os
+from sqlalchemy import event
+import click
+from modules.db_engine import configure_engine, install_sqlite_pragmas
 
 # Create the SQLAlchemy extension
 db = SQLAlchemy()
 
 def init_app(app):
     """Initialize the Flask application with the SQLAlchemy extension"""
+    # Database URI (DATABASE_URL wins) and connection pool sizing
+    configure_engine(app)
+    
     # Initialize the app with the extension
     db.init_app(app)
     
-    # Create tables if they don't exist
+    # WAL, synchronous and busy timeout for every SQLite connection. The
+    # schema is managed by the migrations ('flask db upgrade'), so nothing
+    # touches the database until the first request.
     with app.app_context():
-        db.create_all()
\ No newline at end of file
+        install_sqlite_pragmas(db.engine, app.config)
+
+def init_migrations(app):
+    """
+    Attach Flask-Migrate when the 'flask db' commands can be used.
+    
+    Flask-Migrate imports Alembic, a large share of startup time that only
+    the flask command needs. The flask command loads the app from inside a
+    click context, so the extension (and the 'db' command group) is only
+    registered there; WSGI servers and scripts skip the import.
+    
+    Returns:
+        The Migrate extension, or None when not running under the flask command
+    """
+    if click.get_current_context(silent=True) is None:
+        return None
+    from flask_migrate import Migrate
+    return Migrate(app, db)
+
+class QueryCounter:
+    """Collects the SQL statements executed while it is active (see count_queries)"""
+    
+    def __init__(self):
+        self.statements = []
+    
+    @property
+    def count(self):
+        return len(self.statements)
+    
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Count the SQL statements executed inside a with block.
+    
+    Args:
+        engine: Engine to watch, defaults to db.engine (needs an app context)
+        
+    Yields:
+        QueryCounter whose count and statements fill in as queries run
+    """
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
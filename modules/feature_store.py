@@ -0,0 +1,308 @@
+import threading
+import time
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from modules.database import db
+from modules.models import WardrobeItem, DEFAULT_OWNER_ID
+from modules.palettes import PALETTE_BYTES, PALETTE_COLORS, PALETTE_FIELDS, LAB, WEIGHT
+from modules.wardrobe_index import committed_versions, stored_version, version_check_due
+
+class FeatureMatrix:
+    """
+    Palettes of one owner's wardrobe as NumPy arrays, one row per item.
+
+    Read-only; the store replaces it as a whole on every change.
+    """
+
+    def __init__(self, ids, palettes, primary_color_ids):
+        """
+        Args:
+            ids: Int64 array of item IDs, shape (N,)
+            palettes: Float32 array of shape (N, PALETTE_COLORS, PALETTE_FIELDS),
+                all zeros for items without a palette
+            primary_color_ids: Int32 array of shape (N,), -1 when unknown
+        """
+        self.ids = ids
+        self.palettes = palettes
+        self.primary_color_ids = primary_color_ids
+        self.rows = {item_id: row for row, item_id in enumerate(ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def has_palette(self):
+        """Boolean mask of the rows with an analyzed palette"""
+        return self.palettes[:, :, WEIGHT].sum(axis=1) > 0
+
+    @property
+    def lab(self):
+        """CIELAB colors, shape (N, PALETTE_COLORS, 3)"""
+        return self.palettes[:, :, LAB]
+
+    @property
+    def weights(self):
+        """Share of each palette color in its item (0-1), shape (N, PALETTE_COLORS)"""
+        return self.palettes[:, :, WEIGHT]
+
+    def row_indices(self, item_ids):
+        """Rows of the given item IDs (-1 for unknown items)"""
+        return np.array([self.rows.get(item_id, -1) for item_id in item_ids], dtype=np.int64)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a matrix from (id, palette blob, primary color ID) tuples.
+
+        Blobs are joined and reinterpreted in one step; missing or malformed
+        palettes become zero rows.
+        """
+        rows = list(rows)
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        empty = bytes(PALETTE_BYTES)
+        blobs = b''.join(row[1] if row[1] and len(row[1]) == PALETTE_BYTES else empty for row in rows)
+        palettes = np.frombuffer(blobs, dtype=np.float32).reshape(len(rows), PALETTE_COLORS, PALETTE_FIELDS)
+        primary = np.array([-1 if row[2] is None else row[2] for row in rows], dtype=np.int32)
+        return cls(ids, palettes, primary)
+
+class OwnerFeatures:
+    """One owner's partition of a FeatureStore, with its own matrix"""
+
+    def __init__(self, parent, owner_id):
+        """
+        Args:
+            parent: FeatureStore the partition belongs to
+            owner_id: Owner whose items the partition holds
+        """
+        self.parent = parent
+        self.owner_id = owner_id
+        self._matrix = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def matrix(self):
+        """
+        Return the current FeatureMatrix, loading it from the database if needed.
+
+        Like the wardrobe index, a matrix is reloaded when the owner's
+        wardrobe version in the database has moved on (checked at most once
+        per request); the TTL still applies as a fallback.
+        """
+        matrix = self._matrix
+        ttl = self.parent.ttl
+        if matrix is None or (ttl is not None and time.monotonic() - self._loaded_at > ttl):
+            return self.reload()
+
+        version = self._version
+        if version is not None and version_check_due(self):
+            current = stored_version(self.owner_id)
+            if current != version:
+                matrix = self.reload(current)
+        return matrix
+
+    def reload(self, version=None):
+        """
+        Rebuild the matrix from the database (one query on the owner-leading index).
+
+        Args:
+            version: Wardrobe version just read from the database, if any
+        """
+        if version is None:
+            version = stored_version(self.owner_id)
+        query = db.session.query(WardrobeItem.id, WardrobeItem.palette, WardrobeItem.primary_color_id) \
+            .filter(WardrobeItem.owner_id == self.owner_id)
+        return self.load(query.order_by(WardrobeItem.id).all(), version)
+
+    def load(self, rows, version=None):
+        """
+        Replace the matrix contents.
+
+        Args:
+            rows: Iterable of (id, palette blob, primary color ID) tuples
+            version: Wardrobe version the rows were read at, or None for rows
+                that do not come from the database (never checked against it)
+
+        Returns:
+            The new FeatureMatrix
+        """
+        with self._lock:
+            self._matrix = FeatureMatrix.from_rows(rows)
+            self._version = version
+            self._loaded_at = time.monotonic()
+            return self._matrix
+
+    def invalidate(self):
+        """Drop the matrix; it is reloaded on next use"""
+        with self._lock:
+            self._matrix = None
+
+    def apply(self, updated=(), deleted=(), versions=None):
+        """
+        Apply item changes to the loaded matrix without touching the database.
+
+        Args:
+            updated: (id, palette blob, primary color ID) tuples for new or
+                re-analyzed items
+            deleted: IDs of removed items
+            versions: (first, last) wardrobe versions the committed
+                transaction bumped the owner to, if known
+        """
+        with self._lock:
+            matrix = self._matrix
+            if matrix is None:
+                return  # Nothing loaded yet; the next use reads the fresh data
+            if versions is not None and self._version is not None:
+                first, last = versions
+                if self._version != first - 1:
+                    # Another process changed the wardrobe too; read it all again
+                    self._matrix = None
+                    return
+                self._version = last
+
+            updated = list(updated)
+            changed = FeatureMatrix.from_rows(updated)
+            drop = set(deleted) | {row[0] for row in updated}
+            keep = np.array([item_id not in drop for item_id in matrix.ids.tolist()], dtype=bool) \
+                if drop else np.ones(len(matrix), dtype=bool)
+
+            self._matrix = FeatureMatrix(
+                np.concatenate([matrix.ids[keep], changed.ids]),
+                np.concatenate([matrix.palettes[keep], changed.palettes]),
+                np.concatenate([matrix.primary_color_ids[keep], changed.primary_color_ids])
+            )
+
+class FeatureStore:
+    """
+    In-memory feature matrices of the wardrobe, one per owner, kept current
+    by session events.
+
+    for_owner() returns an owner's partition. Its matrix is loaded from the
+    binary palette columns with a single query, then updated incrementally
+    as that owner's items are added, re-analyzed or deleted through the ORM,
+    so a write by one tenant never rebuilds another's. Bulk statements on
+    the wardrobe table trigger a reload. Changes made by other processes are
+    seen on the next request through the wardrobe_versions table (bumped by
+    the wardrobe index, see modules/wardrobe_index.py), or after `ttl`
+    seconds on databases where versions are not kept.
+    """
+
+    def __init__(self, app=None, ttl=60):
+        """
+        Args:
+            app: Optional Flask application to attach to
+            ttl: Seconds before a matrix is reloaded from the database
+                whatever its version, or None to rely on versions only
+        """
+        self.ttl = ttl
+        self._owners = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Attach the store to a Flask application and listen for wardrobe changes"""
+        self.ttl = app.config.get('WARDROBE_INDEX_TTL', self.ttl)
+        app.extensions['feature_store'] = self
+
+        # The session is shared by every app, so listen once however many
+        # apps are created; each event goes to the store of the app in use
+        if not event.contains(db.session, 'after_commit', _after_commit):
+            event.listen(db.session, 'after_flush', _after_flush)
+            event.listen(db.session, 'do_orm_execute', _on_orm_execute)
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_soft_rollback', _after_rollback)
+
+    def for_owner(self, owner_id=DEFAULT_OWNER_ID):
+        """Return the partition of one owner, creating it on first use"""
+        partition = self._owners.get(owner_id)
+        if partition is None:
+            with self._lock:
+                partition = self._owners.setdefault(owner_id, OwnerFeatures(self, owner_id))
+        return partition
+
+    def invalidate(self):
+        """Drop every partition's matrix; each is reloaded on next use"""
+        for partition in list(self._owners.values()):
+            partition.invalidate()
+
+    def apply(self, updated=(), deleted=(), versions=None):
+        """
+        Apply item changes to the loaded partitions.
+
+        Args:
+            updated: (id, palette blob, primary color ID, owner ID) tuples for
+                new or re-analyzed items
+            deleted: (id, owner ID) tuples of removed items
+            versions: Dictionary of owner ID -> (first, last) wardrobe
+                versions bumped by the transaction
+        """
+        versions = versions or {}
+        changes = {}
+        for item_id, palette, primary_color_id, owner_id in updated:
+            changes.setdefault(owner_id, ([], []))[0].append((item_id, palette, primary_color_id))
+        for item_id, owner_id in deleted:
+            changes.setdefault(owner_id, ([], []))[1].append(item_id)
+        for owner_id in set(changes) | set(versions):
+            partition = self._owners.get(owner_id)
+            if partition is not None:
+                owner_updated, owner_deleted = changes.get(owner_id, ((), ()))
+                partition.apply(owner_updated, owner_deleted, versions.get(owner_id))
+
+    # Session event handlers. Changes are collected per session and only
+    # applied once the transaction commits, so rollbacks never leak in.
+
+    def _after_flush(self, session, flush_context):
+        changes = session.info.setdefault('feature_store_changes', {'updated': {}, 'deleted': {}})
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, WardrobeItem) and obj.id is not None:
+                previous_owners = inspect(obj).attrs.owner_id.history.deleted
+                for owner_id in previous_owners:
+                    # Moved to another owner: gone from the previous owner's matrix
+                    changes['deleted'][(obj.id, owner_id)] = (obj.id, owner_id)
+                changes['updated'][obj.id] = (obj.id, obj.palette, obj.primary_color_id, obj.owner_id)
+                changes['deleted'].pop((obj.id, obj.owner_id), None)
+        for obj in session.deleted:
+            if isinstance(obj, WardrobeItem):
+                changes['updated'].pop(obj.id, None)
+                changes['deleted'][(obj.id, obj.owner_id)] = (obj.id, obj.owner_id)
+
+    def _on_orm_execute(self, orm_execute_state):
+        # Bulk INSERT/UPDATE/DELETE statements bypass the unit of work
+        if orm_execute_state.is_select:
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is WardrobeItem:
+            orm_execute_state.session.info['feature_store_stale'] = True
+
+    def _after_commit(self, session):
+        changes = session.info.pop('feature_store_changes', None)
+        versions = committed_versions(session)
+        if session.info.pop('feature_store_stale', False):
+            self.invalidate()
+        elif changes or versions:
+            changes = changes or {'updated': {}, 'deleted': {}}
+            self.apply(changes['updated'].values(), changes['deleted'].values(), versions)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop('feature_store_changes', None)
+            session.info.pop('feature_store_stale', None)
+
+def get_feature_store():
+    """Return the feature store of the current application (see FeatureStore.init_app)"""
+    return current_app.extensions['feature_store']
+
+def _session_handler(name):
+    """Session event listener calling the named handler of the current app's store"""
+    def handler(*args):
+        store = current_app.extensions.get('feature_store') if has_app_context() else None
+        if store is not None:
+            getattr(store, name)(*args)
+    return handler
+
+_after_flush = _session_handler('_after_flush')
+_on_orm_execute = _session_handler('_on_orm_execute')
+_after_commit = _session_handler('_after_commit')
+_after_rollback = _session_handler('_after_rollback')
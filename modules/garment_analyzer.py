@@ -1,111 +1,142 @@
 import cv2
 import numpy as np
-from sklearn.cluster import KMeans
 import time
 import os
 import json
+import logging
+import threading
+from modules.analysis_cache import ANALYSIS_VERSION, content_digest, get_cache
+from modules.models import convert_numpy_types
+from modules.color_quantizer import quantize, get_default_method
+from modules.color_names import get_namer
+from modules.image_pipeline import ImagePipeline
+from modules.garment_classifier import classify_garment, get_classifier
+from modules.instrumentation import span
 
-# Color name mapping - RGB values to color names
-COLOR_NAMES = {
-    # Black, white, gray
-    (0, 0, 0): 'Black',
-    (255, 255, 255): 'White',
-    (128, 128, 128): 'Gray',
-    (169, 169, 169): 'Dark Gray',
-    (211, 211, 211): 'Light Gray',
-    
-    # Red shades
-    (255, 0, 0): 'Red',
-    (178, 34, 34): 'Dark Red',
-    (220, 20, 60): 'Crimson',
-    (255, 99, 71): 'Tomato',
-    (255, 127, 80): 'Coral',
-    
-    # Pink shades
-    (255, 192, 203): 'Pink',
-    (255, 105, 180): 'Hot Pink',
-    (219, 112, 147): 'Pale Violet Red',
-    
-    # Orange shades
-    (255, 165, 0): 'Orange',
-    (255, 140, 0): 'Dark Orange',
-    (255, 69, 0): 'Red-Orange',
-    
-    # Yellow shades
-    (255, 255, 0): 'Yellow',
-    (255, 215, 0): 'Gold',
-    (240, 230, 140): 'Khaki',
-    
-    # Green shades
-    (0, 128, 0): 'Green',
-    (34, 139, 34): 'Forest Green',
-    (0, 255, 0): 'Lime',
-    (50, 205, 50): 'Lime Green',
-    (152, 251, 152): 'Pale Green',
-    (0, 255, 127): 'Spring Green',
-    (46, 139, 87): 'Sea Green',
-    (60, 179, 113): 'Medium Sea Green',
-    (32, 178, 170): 'Light Sea Green',
-    (0, 128, 128): 'Teal',
-    
-    # Blue shades
-    (0, 0, 255): 'Blue',
-    (0, 0, 139): 'Dark Blue',
-    (0, 0, 205): 'Medium Blue',
-    (65, 105, 225): 'Royal Blue',
-    (100, 149, 237): 'Cornflower Blue',
-    (135, 206, 235): 'Sky Blue',
-    (173, 216, 230): 'Light Blue',
-    (176, 224, 230): 'Powder Blue',
-    (95, 158, 160): 'Cadet Blue',
-    (70, 130, 180): 'Steel Blue',
-    (30, 144, 255): 'Dodger Blue',
-    (0, 191, 255): 'Deep Sky Blue',
+logger = logging.getLogger(__name__)
+
+# Analysis modes from best to cheapest. When a latency budget is set, the
+# first mode expected to fit in the remaining budget is used.
+ANALYSIS_MODES = [
+    {'name': 'full', 'method': None, 'max_size': 300},  # Configured quantizer
+    {'name': 'fast', 'method': 'median_cut', 'max_size': 300},
+    {'name': 'reduced', 'method': 'median_cut', 'max_size': 150}
+]
+
+# Rough seconds-per-pixel cost of each quantizer, refined as analyses run
+_quantizer_costs = {'minibatch': 1.2e-7, 'median_cut': 4e-8, 'sklearn': 5e-6}
+_cost_lock = threading.Lock()
+
+# Default per-request latency budget in milliseconds (None means unlimited)
+_latency_budget_ms = None
+
+def set_latency_budget(budget_ms):
+    """
+    Set the default latency budget for analyze_garment.
     
-    # Purple shades
-    (128, 0, 128): 'Purple',
-    (148, 0, 211): 'Dark Violet',
-    (153, 50, 204): 'Dark Orchid',
-    (138, 43, 226): 'Blue Violet',
-    (147, 112, 219): 'Medium Purple',
-    (186, 85, 211): 'Medium Orchid',
-    (218, 112, 214): 'Orchid',
-    (221, 160, 221): 'Plum',
-    (238, 130, 238): 'Violet',
-    (255, 0, 255): 'Magenta',
-    (255, 20, 147): 'Deep Pink',
+    Args:
+        budget_ms: Budget in milliseconds, or None to always use the full mode
+    """
+    global _latency_budget_ms
+    _latency_budget_ms = budget_ms
+
+def _record_quantizer_cost(method, n_pixels, seconds):
+    """Update the per-pixel cost estimate of a quantizer (exponential moving average)"""
+    if n_pixels == 0:
+        return
+    with _cost_lock:
+        previous = _quantizer_costs.get(method)
+        observed = seconds / n_pixels
+        _quantizer_costs[method] = observed if previous is None else 0.8 * previous + 0.2 * observed
+
+def _downsampled_pixel_count(shape, max_size):
+    h, w = shape[:2]
+    scale = min(1.0, max_size / max(h, w))
+    return int(h * scale) * int(w * scale)
+
+def choose_analysis_mode(image_shape, remaining_ms):
+    """
+    Pick the best analysis mode expected to finish within the remaining budget.
     
-    # Brown shades
-    (165, 42, 42): 'Brown',
-    (139, 69, 19): 'Saddle Brown',
-    (160, 82, 45): 'Sienna',
-    (210, 105, 30): 'Chocolate',
-    (205, 133, 63): 'Peru',
-    (222, 184, 135): 'Burlywood',
-    (245, 245, 220): 'Beige',
-    (250, 235, 215): 'Antique White',
-    (255, 228, 196): 'Bisque',
-    (255, 222, 173): 'Navajo White',
-    (245, 222, 179): 'Wheat',
-    (210, 180, 140): 'Tan'
-}
+    Args:
+        image_shape: Shape of the decoded image
+        remaining_ms: Milliseconds left in the budget, or None for no budget
+        
+    Returns:
+        One of ANALYSIS_MODES (the cheapest one if none fits)
+    """
+    if remaining_ms is None:
+        return ANALYSIS_MODES[0]
+    
+    for mode in ANALYSIS_MODES:
+        method = mode['method'] or get_default_method()
+        cost = _quantizer_costs.get(method, _quantizer_costs['minibatch'])
+        estimate_ms = cost * _downsampled_pixel_count(image_shape, mode['max_size']) * 1000
+        if estimate_ms <= remaining_ms:
+            return mode
+    return ANALYSIS_MODES[-1]
+
+def _mode_signature(mode):
+    return f"{mode['method'] or get_default_method()}-{mode['max_size']}"
+
+def _as_pipeline(source):
+    """Accept either an image path or an ImagePipeline"""
+    if isinstance(source, ImagePipeline):
+        return source
+    return ImagePipeline.from_file(source)
 
-def analyze_garment(image_path):
+@span('analysis')
+def analyze_garment(source, budget_ms=None):
     """
     Analyze a garment image to identify colors and basic attributes.
     
     Args:
-        image_path: Path to the image file
+        source: Path to the image file, or an ImagePipeline already holding it
+        budget_ms: Latency budget in milliseconds; analysis degrades to a
+            cheaper mode when the full one would exceed it. Defaults to the
+            budget set with set_latency_budget()
         
     Returns:
-        Dictionary with name, category, and color information
+        Dictionary with name, category, and color information, plus the
+        analysis_mode that produced it
     """
-    # Simulate some processing time to show the AI is "thinking"
-    time.sleep(0.5)
-    
+    start = time.perf_counter()
+    if budget_ms is None:
+        budget_ms = _latency_budget_ms
+    
+    # Identical images always produce identical results, so look the
+    # content hash up before doing any work. Under a budget, a result from
+    # any mode is acceptable, best mode first.
+    cache = get_cache()
+    cache_prefix = None
     try:
+        pipeline = _as_pipeline(source)
+        
+        if cache is not None:
+            signature = get_namer().signature
+            if get_classifier() is not None:
+                # Results depend on the model too; without one the keys stay as before
+                signature += '+' + get_classifier().signature
+            cache_prefix = f"analysis:v{ANALYSIS_VERSION}:{signature}:{pipeline.digest}"
+            candidates = ANALYSIS_MODES if budget_ms is not None else ANALYSIS_MODES[:1]
+            for mode in candidates:
+                cached = cache.get_json(f"{cache_prefix}:{_mode_signature(mode)}")
+                if cached is not None:
+                    return cached
+        
+        with span('analysis.decode'):
+            image = pipeline.image
+        
+        # Decide how much work we can afford with what is left of the budget
+        remaining_ms = None
+        if budget_ms is not None:
+            remaining_ms = budget_ms - (time.perf_counter() - start) * 1000
+        mode = choose_analysis_mode(image.shape, remaining_ms)
+        
         # Extract dominant colors
-        colors = extract_dominant_colors(image_path)
+        with span('analysis.resize'):
+            pixels = pipeline.pixels(mode['max_size'])
+        colors = palette_from_pixels(pixels, method=mode['method'])
         
         if not colors:
             raise Exception("Could not extract colors from image")
@@ -113,9 +144,9 @@ def analyze_garment(image_path):
         # Get the primary color (most dominant)
         primary_color = colors[0]['name']
         
-        # For now, we'll use placeholder values for category
-        # In Phase 4, we'll implement actual classification
-        category = "tops"  # Default category
+        # Predict the category with the CNN when one is configured ('tops' otherwise)
+        with span('analysis.classify'):
+            category, category_confidence = classify_garment(image)
         
         # Generate a name based on color and category
         name = f"{primary_color} {category.rstrip('s').capitalize()}"
@@ -125,81 +156,88 @@ def analyze_garment(image_path):
         features = {
             'colors': [{'rgb': c['rgb'], 'percentage': c['percentage']} for c in colors],
             'primary_color': primary_color,
-            # More features will be added in Phase 4
         }
+        if category_confidence is not None:
+            features['category_confidence'] = category_confidence
         
-        return {
+        result = convert_numpy_types({
             "name": name,
             "category": category,
             "color": primary_color,
             "features": features,
-            "color_analysis": colors  # Include detailed color analysis
-        }
-    except Exception as e:
-        print(f"Error analyzing image: {e}")
+            "color_analysis": colors,  # Include detailed color analysis
+            "analysis_mode": mode['name']
+        })
+        
+        # Only successful analyses are cached; failures are retried next time
+        if cache_prefix is not None:
+            cache.set_json(f"{cache_prefix}:{_mode_signature(mode)}", result)
+        
+        return result
+    except Exception:
+        logger.exception("Error analyzing image")
         # Fallback to default values if analysis fails
         return {
             "name": "Unknown Item",
             "category": "tops",  # Default category
             "color": "Blue",     # Default color
             "features": {},
-            "color_analysis": []
+            "color_analysis": [],
+            "analysis_mode": "fallback"
         }
 
-def extract_dominant_colors(image_path, n_colors=5):
+def extract_dominant_colors(image_path, n_colors=5, method=None):
     """
-    Extract the dominant colors from an image using K-means clustering.
+    Extract the dominant colors from an image by color quantization.
     
     Args:
         image_path: Path to the image file
         n_colors: Number of dominant colors to extract
+        method: Quantization backend (see modules.color_quantizer), defaults
+            to the configured one
         
     Returns:
         List of dictionaries with color information
     """
-    # Load image
-    image = cv2.imread(image_path)
-    if image is None:
-        raise Exception(f"Could not read image at {image_path}")
-    
-    # Convert to RGB (OpenCV uses BGR)
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    
-    # Resize image to speed up processing
-    # Resizing to a smaller size still gives good color results
-    # and dramatically speeds up processing
-    max_size = 300  # Max width or height
-    h, w = image.shape[:2]
-    if max(h, w) > max_size:
-        if h > w:
-            new_h, new_w = max_size, int(w * max_size / h)
-        else:
-            new_h, new_w = int(h * max_size / w), max_size
-        image = cv2.resize(image, (new_w, new_h))
-    
-    # Reshape the image to be a list of pixels
-    pixels = image.reshape(-1, 3)
+    return palette_from_pixels(load_pixels(image_path), n_colors=n_colors, method=method)
+
+def palette_from_pixels(pixels, n_colors=5, method=None):
+    """
+    Quantize pixels into a named, sorted color palette.
     
-    # Apply K-means clustering
-    kmeans = KMeans(n_clusters=n_colors, n_init=10, random_state=42)
-    kmeans.fit(pixels)
+    Args:
+        pixels: Array of shape (N, 3) with RGB values
+        n_colors: Number of dominant colors to extract
+        method: Quantization backend, defaults to the configured one
+        
+    Returns:
+        List of dictionaries with color information
+    """
+    method = method or get_default_method()
     
-    # Get the colors
-    colors = kmeans.cluster_centers_
+    # Cluster the pixels into a small palette
+    start = time.perf_counter()
+    with span('analysis.cluster'):
+        colors, counts = quantize(pixels, n_colors=n_colors, method=method)
+    _record_quantizer_cost(method, len(pixels), time.perf_counter() - start)
     
     # Convert to integer RGB values
     colors = colors.astype(int)
     
     # Get percentage of each color
-    labels = kmeans.labels_
-    counts = np.bincount(labels)
-    percentages = counts / len(labels)
+    percentages = counts / counts.sum()
+    
+    # Name all clusters in one vectorized lookup
+    with span('analysis.naming'):
+        color_names = get_namer().name_many(colors)
     
     # Sort colors by percentage
     color_info = []
     for i in range(len(colors)):
+        if counts[i] == 0:
+            continue  # Skip clusters that ended up empty
         rgb = tuple(colors[i])
-        color_name = find_closest_color(rgb)
+        color_name = color_names[i]
         percentage = percentages[i] * 100  # Convert to percentage
         
         color_info.append({
@@ -213,6 +251,19 @@ def extract_dominant_colors(image_path, n_colors=5):
     
     return color_info
 
+def load_pixels(image_path, max_size=300):
+    """
+    Load an image as a downsampled list of RGB pixels.
+    
+    Args:
+        image_path: Path to the image file
+        max_size: Max width or height after resizing
+        
+    Returns:
+        Array of shape (N, 3) with RGB values
+    """
+    return ImagePipeline.from_file(image_path).pixels(max_size)
+
 def find_closest_color(rgb_tuple):
     """
     Find the closest named color to an RGB value.
@@ -223,47 +274,39 @@ def find_closest_color(rgb_tuple):
     Returns:
         String name of the closest color
     """
-    r, g, b = rgb_tuple
-    min_distance = float('inf')
-    closest_color = "Unknown"
-    
-    for color_rgb, color_name in COLOR_NAMES.items():
-        cr, cg, cb = color_rgb
-        # Calculate Euclidean distance in RGB space
-        distance = ((r - cr) ** 2 + (g - cg) ** 2 + (b - cb) ** 2) ** 0.5
-        if distance < min_distance:
-            min_distance = distance
-            closest_color = color_name
-    
-    return closest_color
+    return get_namer().name(rgb_tuple)
 
-def save_color_analysis_image(image_path, colors, output_path):
+@span('analysis.visualization')
+def save_color_analysis_image(source, colors, output_path):
     """
     Create a visualization of the color analysis and save it.
     
     Args:
-        image_path: Path to the original image
+        source: Path to the original image, or an ImagePipeline already holding it
         colors: List of color dictionaries from extract_dominant_colors
         output_path: Path to save the visualization
         
     Returns:
         Path to the saved visualization
     """
-    # Load original image
-    image = cv2.imread(image_path)
-    if image is None:
-        raise Exception(f"Could not read image at {image_path}")
-    
-    # Convert to RGB
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    
-    # Resize image if it's too large
-    max_width = 400
+    pipeline = _as_pipeline(source)
+    
+    # The visualization depends on both the image and the palette drawn on it
+    cache = get_cache()
+    cache_key = None
+    if cache is not None:
+        palette_key = content_digest(json.dumps(convert_numpy_types(colors), sort_keys=True).encode('utf-8'))
+        ext = os.path.splitext(output_path)[1].lower() or '.png'
+        cache_key = f"visualization:v{ANALYSIS_VERSION}:{pipeline.digest}:{palette_key}{ext}"
+        cached = cache.get_bytes(cache_key)
+        if cached is not None:
+            with open(output_path, 'wb') as f:
+                f.write(cached)
+            return output_path
+    
+    # Reuse the decoded image, resized if it's too large
+    image = pipeline.fit_width(400)
     h, w = image.shape[:2]
-    if w > max_width:
-        h = int(h * max_width / w)
-        w = max_width
-        image = cv2.resize(image, (w, h))
     
     # Create a blank image for the color palette
     palette_height = 50
@@ -310,6 +353,15 @@ def save_color_analysis_image(image_path, colors, output_path):
         x_start += 130  # Space between color labels
     
     # Save the visualization
-    cv2.imwrite(output_path, combined)
+    if cache_key is not None:
+        success, encoded = cv2.imencode(ext, combined)
+        if not success:
+            raise Exception(f"Could not encode visualization for {output_path}")
+        encoded = encoded.tobytes()
+        cache.set_bytes(cache_key, encoded)
+        with open(output_path, 'wb') as f:
+            f.write(encoded)
+    else:
+        cv2.imwrite(output_path, combined)
     
     return output_path
\ No newline at end of file
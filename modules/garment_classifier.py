@@ -0,0 +1,289 @@
+import importlib.util
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from modules.analysis_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+# Categories a model predicts, in the order of its output logits
+DEFAULT_CATEGORIES = ('tops', 'bottoms', 'dresses', 'outerwear', 'footwear', 'accessories')
+
+# Category used when no model is configured or classification fails
+FALLBACK_CATEGORY = 'tops'
+
+# ImageNet normalization, as expected by torchvision backbones
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+def preprocess(image, input_size=224):
+    """
+    Prepare an image for the classifier.
+
+    The short side is resized to input_size and the center square cropped,
+    as in torchvision's evaluation transforms.
+
+    Args:
+        image: RGB uint8 array of shape (H, W, 3)
+        input_size: Side of the square model input
+
+    Returns:
+        Float32 array of shape (3, input_size, input_size), normalized
+    """
+    import cv2
+    h, w = image.shape[:2]
+    scale = input_size / min(h, w)
+    resized = cv2.resize(image, (max(input_size, round(w * scale)), max(input_size, round(h * scale))),
+                         interpolation=cv2.INTER_AREA)
+    top = (resized.shape[0] - input_size) // 2
+    left = (resized.shape[1] - input_size) // 2
+    crop = resized[top:top + input_size, left:left + input_size]
+    return ((crop.astype(np.float32) / 255.0 - MEAN) / STD).transpose(2, 0, 1)
+
+class GarmentClassifier:
+    """
+    Garment category classifier around a TorchScript model on the CPU.
+
+    The model (e.g. a small CNN, optionally int8-quantized) takes a float
+    batch of shape (N, 3, input_size, input_size) normalized with the
+    ImageNet statistics and returns one logit per category. torch is only
+    imported when the model is first loaded, and the model stays loaded for
+    the life of the process.
+    """
+
+    def __init__(self, model_path, categories=DEFAULT_CATEGORIES, input_size=224, threads=None):
+        """
+        Args:
+            model_path: Path of the TorchScript model file
+            categories: Category of each output logit, in order
+            input_size: Side of the square model input
+            threads: torch intra-op threads, or None for torch's default
+        """
+        self.model_path = model_path
+        self.categories = tuple(categories)
+        self.input_size = input_size
+        self.threads = threads
+        self._model = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    @property
+    def signature(self):
+        """Identifies the model file, so cached analyses change with the model"""
+        if self._signature is None:
+            self._signature = f"clf-{file_digest(self.model_path)[:16]}"
+        return self._signature
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        """Load the model once (thread-safe) and run one warm-up batch"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import torch
+                    if self.threads:
+                        torch.set_num_threads(self.threads)
+                    model = torch.jit.load(self.model_path, map_location='cpu')
+                    model.eval()
+                    # The first call of a TorchScript model runs its optimization passes
+                    with torch.inference_mode():
+                        model(torch.zeros(1, 3, self.input_size, self.input_size))
+                    self._model = model
+        return self._model
+
+    def predict(self, images):
+        """
+        Classify a batch of images in one forward pass.
+
+        Args:
+            images: List of RGB uint8 arrays
+
+        Returns:
+            List of (category, confidence) tuples, confidence in 0-1
+        """
+        import torch
+        model = self.load()
+        batch = torch.from_numpy(np.stack([preprocess(image, self.input_size) for image in images]))
+        with torch.inference_mode():
+            probabilities = torch.softmax(model(batch), dim=1).numpy()
+        best = probabilities.argmax(axis=1)
+        return [(self.categories[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+class MicroBatcher:
+    """
+    Group concurrent calls into batches for a batch function.
+
+    Callers block until their result is ready. A background thread takes
+    the first waiting item, collects more for at most max_wait_ms (or until
+    max_batch_size items are waiting) and runs them as one batch. Requests
+    arriving while a batch runs form the next one.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5):
+        """
+        Args:
+            batch_fn: Function taking a list of items and returning a list
+                of results in the same order
+            max_batch_size: Largest batch passed to batch_fn
+            max_wait_ms: Longest time the first item of a batch waits for more
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def submit(self, item):
+        """Queue an item and return a Future for its result"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                    self._thread.start()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item):
+        """Process one item as part of a batch, waiting for the result"""
+        return self.submit(item).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            self._record(len(batch), finished - start, sum(finished - queued for _, _, queued in batch))
+
+    def _record(self, size, batch_seconds, wait_seconds):
+        with self._lock:
+            stats = self._stats.setdefault(size, {'batches': 0, 'batch_seconds': 0.0, 'request_seconds': 0.0})
+            stats['batches'] += 1
+            stats['batch_seconds'] += batch_seconds
+            stats['request_seconds'] += wait_seconds
+
+    def stats(self):
+        """
+        Throughput and latency per batch size.
+
+        Returns:
+            Dictionary of batch size -> {'batches', 'items', 'batch_ms' (mean
+            time of the batch function), 'request_ms' (mean time from submit
+            to result), 'items_per_second' (while running batch_fn)}
+        """
+        with self._lock:
+            report = {}
+            for size, stats in sorted(self._stats.items()):
+                items = stats['batches'] * size
+                report[size] = {
+                    'batches': stats['batches'],
+                    'items': items,
+                    'batch_ms': round(stats['batch_seconds'] / stats['batches'] * 1000, 2),
+                    'request_ms': round(stats['request_seconds'] / items * 1000, 2),
+                    'items_per_second': round(items / stats['batch_seconds'], 1) if stats['batch_seconds'] else None
+                }
+            return report
+
+# Process-wide classifier and batcher, set up by configure_classifier()
+_classifier = None
+_batcher = None
+
+def configure_classifier(model_path=None, categories=DEFAULT_CATEGORIES, input_size=224, threads=None,
+                         max_batch_size=8, max_wait_ms=5, warm=False):
+    """
+    Set up the process-wide garment classifier.
+
+    Args:
+        model_path: TorchScript model file, or None to disable classification
+        categories: Category of each output logit, in order
+        input_size: Side of the square model input
+        threads: torch intra-op threads, or None for torch's default
+        max_batch_size: Largest micro-batch; 1 classifies each call directly
+        max_wait_ms: Longest time a call waits for others to join its batch
+        warm: Load the model now rather than on the first classification
+
+    Returns:
+        The GarmentClassifier, or None if classification is disabled
+    """
+    global _classifier, _batcher
+    _classifier = _batcher = None
+
+    if not model_path:
+        return None
+    if importlib.util.find_spec('torch') is None:
+        logger.error("Error loading garment classifier: torch is not installed")
+        return None
+    if not os.path.exists(model_path):
+        logger.error("Error loading garment classifier: %s not found", model_path)
+        return None
+
+    classifier = GarmentClassifier(model_path, categories, input_size, threads)
+    if warm:
+        try:
+            classifier.load()
+        except Exception:
+            logger.exception("Error loading garment classifier")
+            return None
+
+    _classifier = classifier
+    if max_batch_size > 1:
+        _batcher = MicroBatcher(classifier.predict, max_batch_size, max_wait_ms)
+    return classifier
+
+def get_classifier():
+    """Return the process-wide classifier, or None when classification is disabled"""
+    return _classifier
+
+def get_batcher():
+    """Return the process-wide micro-batcher, or None when calls are not batched"""
+    return _batcher
+
+def classify_garment(image):
+    """
+    Predict the category of a garment image.
+
+    Args:
+        image: RGB uint8 array
+
+    Returns:
+        Tuple of (category, confidence); (FALLBACK_CATEGORY, None) when no
+        classifier is configured or it fails
+    """
+    classifier = _classifier
+    if classifier is None:
+        return FALLBACK_CATEGORY, None
+    try:
+        if _batcher is not None:
+            return _batcher(image)
+        return classifier.predict([image])[0]
+    except Exception:
+        logger.exception("Error classifying garment")
+        return FALLBACK_CATEGORY, None
@@ -0,0 +1,142 @@
+import io
+import threading
+import cv2
+import numpy as np
+from modules.analysis_cache import content_digest
+
+# Smallest side every downstream consumer needs. The visualization is 400 px
+# wide and analysis works at 300 px, so decoding can be scaled down as long
+# as the short side stays at or above this.
+DEFAULT_TARGET_SIZE = 400
+
+# JPEG-style reduced decoding factors supported by OpenCV
+_REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+]
+
+def _image_size(data):
+    """Read (width, height) from the image header without decoding the pixels"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+class ImagePipeline:
+    """Decode an image once and share its resized variants between consumers"""
+
+    def __init__(self, data, filename=None, target_size=DEFAULT_TARGET_SIZE):
+        """
+        Args:
+            data: Raw encoded image bytes
+            filename: Original filename, for error messages
+            target_size: Smallest side the decoded image must keep
+        """
+        self.data = data
+        self.filename = filename or '<upload>'
+        self.target_size = target_size
+        self._digest = None
+        self._image = None
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Create a pipeline from an image file on disk"""
+        with open(path, 'rb') as f:
+            return cls(f.read(), filename=path, **kwargs)
+
+    @classmethod
+    def from_upload(cls, file_storage, **kwargs):
+        """Create a pipeline from a Werkzeug FileStorage, reading the in-memory stream"""
+        return cls(file_storage.read(), filename=file_storage.filename, **kwargs)
+
+    @property
+    def digest(self):
+        """SHA-256 of the encoded bytes (the same key the blob store and cache use)"""
+        if self._digest is None:
+            self._digest = content_digest(self.data)
+        return self._digest
+
+    @property
+    def image(self):
+        """The decoded image as an RGB array, decoded on first access only"""
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    self._image = self._decode()
+        return self._image
+
+    def _decode(self):
+        buffer = np.frombuffer(self.data, dtype=np.uint8)
+        flags = cv2.IMREAD_COLOR
+
+        # Large photos can be decoded directly at 1/2, 1/4 or 1/8 scale, which
+        # is far cheaper than a full decode followed by a resize
+        size = _image_size(self.data)
+        if size is not None:
+            short_side = min(size)
+            for factor, reduced_flag in _REDUCED_DECODE_FLAGS:
+                if short_side // factor >= self.target_size:
+                    flags = reduced_flag
+                    break
+
+        image = cv2.imdecode(buffer, flags)
+        if image is None:
+            raise Exception(f"Could not read image at {self.filename}")
+
+        # Convert to RGB (OpenCV uses BGR)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def _variant(self, key, size_fn):
+        if key not in self._variants:
+            image = self.image
+            h, w = image.shape[:2]
+            new_size = size_fn(h, w)
+            self._variants[key] = cv2.resize(image, new_size) if new_size else image
+        return self._variants[key]
+
+    def fit(self, max_size):
+        """
+        The image resized so that neither side exceeds max_size.
+
+        Args:
+            max_size: Max width or height
+
+        Returns:
+            RGB array (the decoded image itself if it is already small enough)
+        """
+        def size_fn(h, w):
+            if max(h, w) <= max_size:
+                return None
+            if h > w:
+                return (int(w * max_size / h), max_size)
+            return (max_size, int(h * max_size / w))
+        return self._variant(('fit', max_size), size_fn)
+
+    def fit_width(self, max_width):
+        """
+        The image resized so that its width does not exceed max_width.
+
+        Args:
+            max_width: Max width
+
+        Returns:
+            RGB array (the decoded image itself if it is already narrow enough)
+        """
+        def size_fn(h, w):
+            if w <= max_width:
+                return None
+            return (max_width, int(h * max_width / w))
+        return self._variant(('fit_width', max_width), size_fn)
+
+    def pixels(self, max_size):
+        """The image resized to fit max_size, flattened to an (N, 3) pixel list"""
+        return self.fit(max_size).reshape(-1, 3)
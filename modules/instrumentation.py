@@ -0,0 +1,244 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from modules.database import db
+
+# Upper bounds in seconds of the latency buckets (the Prometheus client defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Upper bounds of the SQL-statements-per-request buckets
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, one series per label set"""
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            name: Metric name
+            documentation: HELP text
+            label_names: Names of the labels passed to observe(), in order
+            buckets: Increasing upper bounds of the buckets (+Inf is added)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """Record one value for the series of the given label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        """Lines of the Prometheus text format"""
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _format_value(float(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(values[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+class Counter:
+    """Monotonic count, one series per label set"""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines.extend(f'{self.name}{_format_labels(self.label_names, labels)} {value}' for labels, value in series)
+        return lines
+
+REQUEST_SECONDS = Histogram('fashion_advisor_request_duration_seconds',
+                            'Time to handle a request, until the response is returned by the view',
+                            ('method', 'endpoint', 'status'))
+REQUEST_QUERIES = Histogram('fashion_advisor_request_queries', 'SQL statements executed per request',
+                            ('method', 'endpoint'), QUERY_BUCKETS)
+REQUEST_QUERY_SECONDS = Histogram('fashion_advisor_request_query_duration_seconds',
+                                  'Time spent executing SQL statements per request', ('method', 'endpoint'))
+STAGE_SECONDS = Histogram('fashion_advisor_stage_duration_seconds',
+                          'Time spent in an instrumented stage (analysis, outfit generation)', ('stage',))
+STAGE_ERRORS = Counter('fashion_advisor_stage_errors_total', 'Stages that ended with an exception', ('stage',))
+
+METRICS = [REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_QUERY_SECONDS, STAGE_SECONDS, STAGE_ERRORS]
+
+class RequestTimings:
+    """Stage durations and SQL statements of the current request, for the Server-Timing header"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def header(self, total_seconds):
+        """Server-Timing header value (durations in milliseconds)"""
+        entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.stages.items()]
+        entries.append(f'db;desc="{self.queries} queries";dur={self.query_seconds * 1000:.2f}')
+        entries.append(f'total;dur={total_seconds * 1000:.2f}')
+        return ', '.join(entries)
+
+# Span collectors of the current thread (see collect_spans)
+_local = threading.local()
+
+def _request_timings():
+    return g.get('request_timings') if has_app_context() else None
+
+def record_span(name, seconds):
+    """
+    Record the duration of a stage measured elsewhere.
+
+    Args:
+        name: Stage name, e.g. 'analysis.cluster'
+        seconds: Duration of the stage
+    """
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _request_timings()
+    if timings is not None:
+        timings.add(name, seconds)
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        spans.append((name, seconds))
+
+@contextmanager
+def span(name):
+    """
+    Time a stage: the block (or, used as a decorator, the function).
+
+    The duration goes to the stage histogram of /metrics and to the
+    Server-Timing entries of the current request. Exceptions are counted
+    and re-raised.
+
+    Args:
+        name: Stage name, e.g. 'analysis.cluster'
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(name)
+        raise
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+@contextmanager
+def collect_spans():
+    """
+    Gather the spans this thread records in the with block.
+
+    Used by the analysis worker processes, whose metrics would otherwise
+    never reach /metrics: the spans are sent back with the result and
+    recorded in the web process with record_spans().
+
+    Yields:
+        List that fills with (stage name, seconds) tuples
+    """
+    previous = getattr(_local, 'spans', None)
+    _local.spans = spans = []
+    try:
+        yield spans
+    finally:
+        _local.spans = previous
+
+def record_spans(spans):
+    """Record spans gathered by collect_spans() (e.g. in another process)"""
+    for name, seconds in spans:
+        record_span(name, seconds)
+
+def render_metrics():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return  # Started before the listener was installed
+    start = starts.pop()
+    timings = _request_timings()
+    if timings is not None:
+        timings.queries += 1
+        timings.query_seconds += time.perf_counter() - start
+
+def init_app(app):
+    """
+    Time every request of a Flask application and count its SQL statements.
+
+    Each request is recorded in the request histograms by method, endpoint
+    (the view name, so URL parameters don't multiply the series) and
+    status. With SERVER_TIMING set, responses carry a Server-Timing header
+    with the stage durations, the SQL statements and the total. For
+    streamed responses the timings end when the view returns the stream.
+    """
+    server_timing = app.config.get('SERVER_TIMING', False)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_query)
+    event.listen(engine, 'after_cursor_execute', _after_query)
+
+    @app.before_request
+    def start_request_timing():
+        g.request_timings = RequestTimings()
+
+    @app.after_request
+    def record_request_timing(response):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return response
+        elapsed = time.perf_counter() - timings.start
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, request.method, endpoint, str(response.status_code))
+        REQUEST_QUERIES.observe(timings.queries, request.method, endpoint)
+        REQUEST_QUERY_SECONDS.observe(timings.query_seconds, request.method, endpoint)
+        if server_timing:
+            response.headers['Server-Timing'] = timings.header(elapsed)
+        return response
@@ -1,8 +1,12 @@
 from modules.database import db
+from modules.palettes import palette_columns
 import datetime
 import json
 import numpy as np
 
+# Owner of rows created without one: the single user of a non-multi-tenant install
+DEFAULT_OWNER_ID = 1
+
 def convert_numpy_types(obj):
     """Convert NumPy types to Python native types for JSON serialization"""
     if isinstance(obj, np.integer):
@@ -21,42 +25,110 @@ def convert_numpy_types(obj):
 class WardrobeItem(db.Model):
     """Model for clothing items in the wardrobe"""
     __tablename__ = 'wardrobe_items'
+    __table_args__ = (
+        # Every query is scoped to one owner, so the owner leads every index.
+        # Newest-first listing and keyset pagination, optionally filtered:
+        db.Index('ix_wardrobe_items_owner_date_added_id', 'owner_id', 'date_added', 'id'),
+        db.Index('ix_wardrobe_items_owner_category_date_added_id', 'owner_id', 'category', 'date_added', 'id'),
+        db.Index('ix_wardrobe_items_owner_color_date_added_id', 'owner_id', 'color', 'date_added', 'id'),
+        # Season filter and per-category counts within a season
+        db.Index('ix_wardrobe_items_owner_season_category', 'owner_id', 'season', 'category'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, nullable=False, default=DEFAULT_OWNER_ID, server_default=str(DEFAULT_OWNER_ID))
     name = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(50), nullable=False)
     color = db.Column(db.String(50), nullable=False)
     season = db.Column(db.String(50))
     image_path = db.Column(db.String(200), nullable=False)
     features = db.Column(db.Text)  # JSON string of extracted features
+    palette = db.Column(db.LargeBinary)  # Dominant colors packed by modules.palettes.encode_palette
+    primary_color_id = db.Column(db.Integer)  # Index of the primary color in COLOR_NAMES
     date_added = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')  # pending, ready or failed
     
-    def __init__(self, name, category, color, season, image_path, features=None):
+    def __init__(self, name, category, color, season, image_path, features=None, status='ready', owner_id=DEFAULT_OWNER_ID):
+        self.owner_id = owner_id
         self.name = name
         self.category = category
         self.color = color
         self.season = season
         self.image_path = image_path
-        
-        if features:
-            # Convert NumPy types before JSON serialization
-            features = convert_numpy_types(features)
-            self.features = json.dumps(features)
-        else:
-            self.features = json.dumps({})
+        self.status = status
+        self.set_features(features)
     
     def __repr__(self):
         return f'<WardrobeItem {self.name}>'
     
+    def set_features(self, features):
+        """Store analysis features as JSON and as the binary palette columns"""
+        # Convert NumPy types before JSON serialization
+        features = convert_numpy_types(features or {})
+        self.features = json.dumps(features)
+        for column, value in palette_columns(features).items():
+            setattr(self, column, value)
+    
+    @classmethod
+    def count_image_references(cls, image_path):
+        """
+        Number of items using an image, counted on a connection of its own
+        so that items other processes committed meanwhile are included
+        """
+        with db.engine.connect() as connection:
+            return connection.execute(
+                db.select(db.func.count()).select_from(cls).where(cls.image_path == image_path)
+            ).scalar()
+    
     def to_dict(self):
         """Convert model to dictionary for JSON serialization"""
         return {
             'id': self.id,
+            'owner_id': self.owner_id,
             'name': self.name,
             'category': self.category,
             'color': self.color,
             'season': self.season,
             'image_path': self.image_path,
             'features': self.features,
+            'status': self.status,
             'date_added': self.date_added.isoformat() if self.date_added else None
-    }
\ No newline at end of file
+    }
+
+class WardrobeVersion(db.Model):
+    """Change counter of one owner's wardrobe, bumped by every transaction that changes their items"""
+    __tablename__ = 'wardrobe_versions'
+    
+    owner_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<WardrobeVersion {self.owner_id} {self.version}>'
+
+class AnalysisJob(db.Model):
+    """Model for background garment analysis jobs"""
+    __tablename__ = 'analysis_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('wardrobe_items.id', ondelete='SET NULL'), index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done or failed
+    worker = db.Column(db.String(100))  # Process that claimed the job
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<AnalysisJob {self.id} {self.status}>'
+    
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'item_id': self.item_id,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
\ No newline at end of file
@@ -1,24 +1,25 @@
+import datetime
+import itertools
 import random
 from collections import defaultdict
-from modules.models import WardrobeItem
+from modules.models import WardrobeItem, DEFAULT_OWNER_ID
 from modules.database import db
-from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from modules.wardrobe_index import get_wardrobe_index
+from modules.outfit_search import OutfitSearch
+from modules.instrumentation import span
+from modules.pagination import keyset_page
+from modules.color_compatibility import get_compatibility
 
-# Color compatibility rules
-COLOR_COMPATIBILITY = {
-    'Black': ['White', 'Gray', 'Red', 'Blue', 'Green', 'Purple', 'Pink', 'Yellow', 'Orange'],
-    'White': ['Black', 'Gray', 'Blue', 'Red', 'Purple', 'Pink', 'Green', 'Brown'],
-    'Gray': ['Black', 'White', 'Blue', 'Red', 'Purple', 'Pink'],
-    'Blue': ['White', 'Gray', 'Black', 'Beige', 'Brown', 'Green', 'Purple'],
-    'Red': ['Black', 'White', 'Gray', 'Beige', 'Brown'],
-    'Green': ['Black', 'White', 'Beige', 'Brown', 'Blue', 'Gray'],
-    'Purple': ['White', 'Gray', 'Black', 'Pink', 'Blue'],
-    'Pink': ['White', 'Gray', 'Black', 'Purple', 'Blue'],
-    'Yellow': ['Black', 'Blue', 'Purple', 'Gray'],
-    'Orange': ['Black', 'Blue', 'White', 'Gray'],
-    'Brown': ['White', 'Blue', 'Green', 'Beige', 'Gray'],
-    'Beige': ['Brown', 'Blue', 'Green', 'Red', 'Black']
-}
+def __getattr__(name):
+    """
+    COLOR_COMPATIBILITY: the color rules of the matrix in use (the current
+    app's COLOR_COMPATIBILITY_FILE, see modules/color_compatibility.py),
+    read on access rather than at import
+    """
+    if name == 'COLOR_COMPATIBILITY':
+        return get_compatibility().rules
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Style compatibility - which categories go well together
 STYLE_COMPATIBILITY = {
@@ -48,6 +49,12 @@ SEASON_CATEGORY_RULES = {
     }
 }
 
+# Color schemes offered on the outfits page
+COLOR_SCHEMES = ('Monochrome', 'Complementary', 'Analogous')
+
+# Orders in which iter_outfits() can yield outfits
+OUTFIT_MODES = ('sample', 'top')
+
 class ClothingItem:
     def __init__(self, id, name, category, color, image_path):
         self.id = id
@@ -68,7 +75,7 @@ class ClothingItem:
 class OutfitGenerator:
     """Generate outfit recommendations based on wardrobe items"""
     
-    def __init__(self, season=None, style=None, color_scheme=None):
+    def __init__(self, season=None, style=None, color_scheme=None, index=None, owner_id=DEFAULT_OWNER_ID):
         """
         Initialize the outfit generator with optional filters
         
@@ -76,57 +83,75 @@ class OutfitGenerator:
             season: Optional season to filter by
             style: Optional style to filter by
             color_scheme: Optional color scheme to use
+            index: OwnerIndex to draw items from (defaults to the owner's
+                partition of the current app's index)
+            owner_id: Owner whose wardrobe the outfits are made from
         """
         self.season = season
         self.style = style
         self.color_scheme = color_scheme
+        self.index = index or get_wardrobe_index().for_owner(owner_id)
+        self.seed = None
     
-    def generate_outfit(self):
-        """
-        Generate a complete outfit based on available wardrobe items
-        
-        Returns:
-            Dictionary with outfit items by category
-        """
-        # Get all items from wardrobe with appropriate filters
-        query = WardrobeItem.query
-        
-        # Filter by season if specified and not "Any"
+    def _season_key(self):
+        """Lowercase season used by the index, or None for any season"""
         if self.season and self.season != 'Any':
             # Convert season to lowercase to match database values
-            season_lower = self.season.lower()
-            
-            # Include items that match the season OR are marked as "all" seasons
-            query = query.filter(or_(WardrobeItem.season == season_lower, 
-                                    WardrobeItem.season == 'all'))
-        
-        all_items = query.all()
-        
-        if not all_items:
+            return self.season.lower()
+        return None
+    
+    def _style_key(self):
+        """Style used to restrict categories, or None for any style"""
+        if self.style and self.style != 'Any':
+            return self.style
+        return None
+    
+    def _check_wardrobe(self, items_by_category):
+        """Return an error dictionary if no outfit can be built, otherwise None"""
+        if not items_by_category:
             return {"error": "Your wardrobe is empty or no items match the selected filters. Try different filters or add more items."}
         
-        # Group items by category
-        items_by_category = {}
-        for item in all_items:
-            if item.category not in items_by_category:
-                items_by_category[item.category] = []
-            items_by_category[item.category].append(item)
-        
         # Check if we have enough categories for a complete outfit
         required_categories = ['tops', 'bottoms']
         for category in required_categories:
             if category not in items_by_category or not items_by_category[category]:
                 return {"error": f"You need at least one {category} item that matches your filters for an outfit"}
+        return None
+    
+    def _items_by_category(self):
+        """Items usable in the season grouped by category, from the in-memory index"""
+        # Loads the owner's partition from the database when it is stale
+        with span('outfit.query'):
+            snapshot = self.index.snapshot()
+        with span('outfit.grouping'):
+            return snapshot.view(self._season_key())
+    
+    def generate_outfit(self):
+        """
+        Generate a complete outfit based on available wardrobe items
+        
+        Returns:
+            Dictionary with outfit items by category
+        """
+        # Items that match the season OR are marked as "all" seasons, grouped
+        # by category. This comes from the in-memory index, not the database.
+        season_key = self._season_key()
+        items_by_category = self._items_by_category()
+        
+        error = self._check_wardrobe(items_by_category)
+        if error:
+            return error
         
+        with span('outfit.matching'):
+            return self._match_outfit(season_key, items_by_category)
+    
+    def _match_outfit(self, season_key, items_by_category):
+        """Pick a top and the items that go with it (see generate_outfit)"""
         # Start with a top
         selected_top = random.choice(items_by_category['tops'])
         
         # Find compatible bottoms based on color
-        compatible_bottoms = []
-        if 'bottoms' in items_by_category:
-            for bottom in items_by_category['bottoms']:
-                if self._are_colors_compatible(selected_top.color, bottom.color):
-                    compatible_bottoms.append(bottom)
+        compatible_bottoms = self.index.compatible_items(season_key, 'bottoms', (selected_top.color,))
         
         if not compatible_bottoms and 'bottoms' in items_by_category:
             # If no compatible bottoms, just use any bottom
@@ -169,11 +194,8 @@ class OutfitGenerator:
             
             if category in items_by_category and items_by_category[category]:
                 # Try to find a compatible item
-                compatible_items = []
-                for item in items_by_category[category]:
-                    if self._are_colors_compatible(selected_top.color, item.color) or \
-                       (selected_bottom and self._are_colors_compatible(selected_bottom.color, item.color)):
-                        compatible_items.append(item)
+                colors = (selected_top.color, selected_bottom.color) if selected_bottom else (selected_top.color,)
+                compatible_items = self.index.compatible_items(season_key, category, colors)
                 
                 if not compatible_items:
                     # If no compatible items, just use any item from this category
@@ -183,39 +205,60 @@ class OutfitGenerator:
         
         return outfit
     
-    def generate_multiple_outfits(self, count=3):
+    def check(self):
         """
-        Generate multiple outfit options
+        Check that the wardrobe can produce outfits with the current filters
         
-        Args:
-            count: Number of outfits to generate
-            
         Returns:
-            List of outfit dictionaries
+            Error dictionary, or None if outfits can be generated
         """
-        outfits = []
-        max_attempts = count * 3  # Try more times than needed to get unique outfits
-        attempts = 0
+        return self._check_wardrobe(self._items_by_category())
+    
+    def iter_outfits(self, mode='sample', seed=None):
+        """
+        Yield scored outfits one at a time, as soon as each is found
         
-        while len(outfits) < count and attempts < max_attempts:
-            outfit = self.generate_outfit()
-            if "error" in outfit:
-                return [outfit]  # Return the error
-            
-            # Check if this outfit is unique (not exactly the same as previous outfits)
-            is_unique = True
-            for existing_outfit in outfits:
-                if (existing_outfit.get('tops') == outfit.get('tops') and 
-                    existing_outfit.get('bottoms') == outfit.get('bottoms')):
-                    is_unique = False
-                    break
+        Every combination is scored by OutfitSearch (color compatibility,
+        season rules and style). 'top' yields the best outfits first;
+        'sample' yields varied outfits drawn from the near-best ones and is
+        reproducible with the same seed. Call check() first.
+        
+        Args:
+            mode: 'sample' or 'top'
+            seed: Seed for 'sample' mode (a random one is picked if None)
             
-            if is_unique:
-                outfits.append(outfit)
+        Yields:
+            (score, outfit) tuples with distinct top/bottom pairs
+        """
+        search = OutfitSearch(self.index, season=self._season_key(), style=self._style_key(),
+                              season_rules=SEASON_CATEGORY_RULES, style_rules=STYLE_COMPATIBILITY)
+        if mode == 'top':
+            return search.iter_top()
+        
+        # Remember the seed so the caller can reproduce this sequence of outfits
+        self.seed = seed if seed is not None else random.randrange(2 ** 31)
+        return search.iter_sample(seed=self.seed)
+    
+    def generate_multiple_outfits(self, count=3, mode='sample', seed=None):
+        """
+        Generate multiple outfit options with distinct top/bottom pairs
+        
+        Args:
+            count: Number of outfits to generate
+            mode: 'sample' or 'top' (see iter_outfits)
+            seed: Seed for 'sample' mode (a random one is picked if None)
             
-            attempts += 1
+        Returns:
+            List of outfit dictionaries, best first
+        """
+        error = self.check()
+        if error:
+            return [error]
         
-        return outfits
+        with span('outfit.matching'):
+            results = list(itertools.islice(self.iter_outfits(mode=mode, seed=seed), count))
+        results.sort(key=lambda result: -result[0])
+        return [outfit for score, outfit in results]
     
     def _are_colors_compatible(self, color1, color2):
         """
@@ -228,33 +271,42 @@ class OutfitGenerator:
         Returns:
             Boolean indicating if colors are compatible
         """
-        # Same colors are always compatible
-        if color1 == color2:
-            return True
-        
-        # Check color compatibility rules
-        if color1 in COLOR_COMPATIBILITY and color2 in COLOR_COMPATIBILITY[color1]:
-            return True
-        
-        if color2 in COLOR_COMPATIBILITY and color1 in COLOR_COMPATIBILITY[color2]:
-            return True
+        return are_colors_compatible(color1, color2)
+
+def are_colors_compatible(color1, color2):
+    """
+    Check if two colors are compatible based on color theory
+    
+    Args:
+        color1: First color
+        color2: Second color
         
-        # Default compatibility for colors not in our rules
-        return False
+    Returns:
+        Boolean indicating if colors are compatible
+    """
+    # Same colors are always compatible; everything else comes from the rules file
+    return get_compatibility().compatible(color1, color2)
 
 # Create a model for saved outfits
 class SavedOutfit(db.Model):
     """Model for saved outfit combinations"""
     __tablename__ = 'saved_outfits'
+    __table_args__ = (
+        # Newest-first keyset pagination of one owner's saved outfits
+        db.Index('ix_saved_outfits_owner_date_created_id', 'owner_id', 'date_created', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, nullable=False, default=DEFAULT_OWNER_ID, server_default=str(DEFAULT_OWNER_ID))
     name = db.Column(db.String(100), nullable=False)
     top_id = db.Column(db.Integer, db.ForeignKey('wardrobe_items.id'))
     bottom_id = db.Column(db.Integer, db.ForeignKey('wardrobe_items.id'))
     outerwear_id = db.Column(db.Integer, db.ForeignKey('wardrobe_items.id'), nullable=True)
     footwear_id = db.Column(db.Integer, db.ForeignKey('wardrobe_items.id'), nullable=True)
     accessory_id = db.Column(db.Integer, db.ForeignKey('wardrobe_items.id'), nullable=True)
-    date_created = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # Set in Python like WardrobeItem.date_added, so every row is stored in the
+    # same format and keyset comparisons against cursor datetimes are exact
+    date_created = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     
     # Define relationships
     top = db.relationship('WardrobeItem', foreign_keys=[top_id])
@@ -267,6 +319,7 @@ class SavedOutfit(db.Model):
         """Convert model to dictionary for JSON serialization"""
         return {
             'id': self.id,
+            'owner_id': self.owner_id,
             'name': self.name,
             'top': self.top.to_dict() if self.top else None,
             'bottom': self.bottom.to_dict() if self.bottom else None,
@@ -276,6 +329,33 @@ class SavedOutfit(db.Model):
             'date_created': self.date_created.isoformat() if self.date_created else None
         }
 
+# Relationships rendered for every saved outfit, loaded eagerly in one query
+SAVED_OUTFIT_ITEMS = ('top', 'bottom', 'outerwear', 'footwear', 'accessory')
+
+def saved_outfits_page(owner_id, cursor=None, limit=12):
+    """
+    One page of an owner's saved outfits, newest first, with their items loaded
+    
+    Uses keyset pagination on (owner_id, date_created, id), so every page
+    costs the same single query no matter how deep it is or how many outfits
+    exist.
+    
+    Args:
+        owner_id: Owner of the outfits
+        cursor: Cursor returned for the previous page, or None for the first page
+        limit: Number of outfits per page
+        
+    Returns:
+        Tuple of (list of SavedOutfit, cursor for the next page or None)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    query = SavedOutfit.query.filter_by(owner_id=owner_id).options(
+        *[joinedload(getattr(SavedOutfit, name)) for name in SAVED_OUTFIT_ITEMS]
+    )
+    return keyset_page(query, SavedOutfit.date_created, SavedOutfit.id, cursor, limit)
+
 if __name__ == '__main__':
     # Example Usage
     items = [
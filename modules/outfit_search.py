@@ -0,0 +1,394 @@
+import heapq
+import itertools
+import random
+import numpy as np
+
+# Score of every pair of items in an outfit whose colors are compatible / not compatible
+MATCH_SCORE = 1.0
+CLASH_SCORE = -1.0
+
+# Bonus per item whose season is exactly the requested one (rather than 'all')
+SEASON_MATCH_BONUS = 0.25
+
+# Bonus for completing the outfit with an optional category, and the extra
+# bonus when the season rules recommend that category
+COMPLETENESS_BONUS = 0.5
+RECOMMENDED_BONUS = 1.0
+
+# Sampling enumerates the near-optimal outfits when there are at most this
+# many, and otherwise draws at random until this many draws in a row repeat
+SAMPLE_ENUMERATION_LIMIT = 5000
+SAMPLE_MAX_MISSES = 50
+
+BASE_CATEGORIES = ('tops', 'bottoms')
+OPTIONAL_CATEGORIES = ('outerwear', 'footwear', 'accessories')
+
+class _Cell:
+    """Items of one category that share a color and season match, and so a score"""
+
+    __slots__ = ('color_id', 'exact', 'items')
+
+    def __init__(self, color_id, exact, items):
+        self.color_id = color_id
+        self.exact = exact
+        self.items = items
+
+class _Entry:
+    """Best completion found for one (top cell, bottom cell) pair"""
+
+    __slots__ = ('score', 'seq', 'top', 'bottom', 'extras')
+
+    def __init__(self, score, seq, top, bottom, extras):
+        self.score = score
+        self.seq = seq
+        self.top = top
+        self.bottom = bottom
+        self.extras = extras  # list of (category, cell)
+
+    @property
+    def count(self):
+        """Number of distinct (top, bottom) outfits this entry stands for"""
+        return len(self.top.items) * len(self.bottom.items)
+
+def category_bonuses(season, style, season_rules, style_rules):
+    """
+    Decide which optional categories may be added and what they are worth.
+
+    Args:
+        season: Lowercase season name, or None
+        style: Style name, or None for any style
+        season_rules: SEASON_CATEGORY_RULES-style dictionary
+        style_rules: STYLE_COMPATIBILITY-style dictionary
+
+    Returns:
+        Dictionary of category -> (bonus, required)
+    """
+    rules = season_rules.get(season, {}) if season else {}
+    style_categories = style_rules.get(style) if style else None
+
+    bonuses = {}
+    for category in OPTIONAL_CATEGORIES:
+        if category in rules.get('exclude', ()):
+            continue
+        # Only categories the season includes, as in OutfitGenerator.generate_outfit
+        # (so spring, whose outerwear is only 'optional', never adds any)
+        if 'include' in rules and category not in rules['include']:
+            continue
+        if style_categories is not None and category not in style_categories:
+            continue
+
+        if category in rules.get('optional', ()):
+            bonus = 0.0
+        elif category in rules.get('recommended', ()):
+            bonus = COMPLETENESS_BONUS + RECOMMENDED_BONUS
+        else:
+            bonus = COMPLETENESS_BONUS
+        bonuses[category] = (bonus, category in rules.get('required', ()))
+    return bonuses
+
+class OutfitSearch:
+    """
+    Deterministic scored search over every outfit combination.
+
+    An outfit scores MATCH_SCORE or CLASH_SCORE for every pair of its items,
+    plus season and completeness bonuses. Items with the same category,
+    color and season match are interchangeable for scoring, so the search
+    runs over these cells rather than over items: (top, bottom) cell pairs
+    are visited best bound first, each gets its optimal set of optional
+    pieces, and results are produced lazily as soon as no remaining pair
+    can beat them, so callers that stop after K outfits never evaluate the
+    rest.
+    """
+
+    def __init__(self, index, season=None, style=None, season_rules=None, style_rules=None):
+        """
+        Args:
+            index: WardrobeIndex to search
+            season: Lowercase season name, or None for any season
+            style: Style name restricting the categories, or None
+            season_rules: SEASON_CATEGORY_RULES-style dictionary
+            style_rules: STYLE_COMPATIBILITY-style dictionary
+        """
+        self.snapshot = index.snapshot()
+        self.compatibility = self.snapshot.compatibility
+        self.season = season
+        self.style = style
+        self.bonuses = category_bonuses(season, style, season_rules or {}, style_rules or {})
+        self.stats = {'pairs': 0, 'evaluated': 0}
+
+    def _cells(self, category):
+        """Cells of a category, memoized on the index snapshot"""
+        def build():
+            groups = {}
+            items = self.snapshot.view(self.season).get(category, [])
+            column = self.snapshot.color_column(self.season, category)
+            for item, color_id in zip(items, column.tolist()):
+                exact = self.season is not None and item.season == self.season
+                groups.setdefault((color_id, exact), []).append(item)
+            return [_Cell(color_id, exact, tuple(members)) for (color_id, exact), members in sorted(groups.items())]
+        return self.snapshot.memo(('outfit_cells', self.season, category), build)
+
+    def _weights(self):
+        """Pair score for every two color IDs"""
+        matrix = self.compatibility.matrix
+        return self.snapshot.memo(('outfit_weights', matrix.shape[0]),
+                                  lambda: np.where(matrix, MATCH_SCORE, CLASH_SCORE))
+
+    def _options(self):
+        """Per optional category: (category, cells, colors, bonuses, can_omit)"""
+        options = []
+        for category, (bonus, required) in self.bonuses.items():
+            # Only the best cell per color matters for scoring: prefer exact season matches
+            best = {}
+            for cell in self._cells(category):
+                if cell.color_id not in best or cell.exact:
+                    best[cell.color_id] = cell
+            if not best:
+                continue
+            cells = list(best.values())
+            colors = np.array([cell.color_id for cell in cells], dtype=np.int32)
+            values = np.array([bonus + (SEASON_MATCH_BONUS if cell.exact else 0.0) for cell in cells])
+            options.append((category, cells, colors, values, not required))
+        return options
+
+    def _ranked_entries(self, margin=0.0):
+        """
+        Branch-and-bound over (top cell, bottom cell) pairs.
+
+        Pairs are evaluated in order of their upper bound, and an entry is
+        yielded as soon as no unevaluated pair can score higher.
+
+        Args:
+            margin: Pairs within this many points of the best score are
+                evaluated together in one batch (callers that will consume
+                them anyway set it to save per-pair overhead)
+
+        Yields:
+            _Entry objects, best score first
+        """
+        tops, bottoms = self._cells('tops'), self._cells('bottoms')
+        if not tops or not bottoms:
+            return
+
+        # Build every cell first: interning new colors can grow the matrix
+        options = self._options()
+        weights = self._weights()
+        top_colors = np.array([cell.color_id for cell in tops], dtype=np.int32)
+        bottom_colors = np.array([cell.color_id for cell in bottoms], dtype=np.int32)
+        top_bonus = np.array([SEASON_MATCH_BONUS if cell.exact else 0.0 for cell in tops])
+        bottom_bonus = np.array([SEASON_MATCH_BONUS if cell.exact else 0.0 for cell in bottoms])
+
+        # Pair scores between optional categories, with a zero row/column for "omitted"
+        pair_tables = {}
+        for (i, a), (j, b) in itertools.combinations(enumerate(options), 2):
+            table = weights[np.ix_(a[2], b[2])]
+            table = np.pad(table, ((0, int(a[4])), (0, int(b[4]))))
+            pair_tables[(i, j)] = table
+
+        # Exact score of the top/bottom pair itself
+        base = weights[np.ix_(top_colors, bottom_colors)] + top_bonus[:, None] + bottom_bonus[None, :]
+
+        # Upper bound for the optional pieces: each category at its own best
+        # given the pair, and every pair of optional pieces matching
+        bound = base.copy()
+        for category, cells, colors, values, can_omit in options:
+            gain = values[None, None, :] + weights[np.ix_(top_colors, colors)][:, None, :] \
+                + weights[np.ix_(bottom_colors, colors)][None, :, :]
+            best = gain.max(axis=2)
+            bound += np.maximum(best, 0.0) if can_omit else best
+        bound += sum(float(table.max()) for table in pair_tables.values())
+
+        # Best optional pieces per (top color, bottom color), shared by every
+        # search with the same filters on this snapshot
+        completions = self.snapshot.memo(('outfit_completions', self.season, self.style), dict)
+
+        # The part of the option tensor that does not depend on the top and
+        # bottom: category bonuses plus the pairs between optional pieces
+        static = np.zeros([len(option[1]) + int(option[4]) for option in options], dtype=np.float32)
+        for i, (category, cells, colors, values, can_omit) in enumerate(options):
+            shape = [1] * len(options)
+            shape[i] = static.shape[i]
+            static += np.pad(values, (0, int(can_omit))).reshape(shape).astype(np.float32)
+        for (i, j), table in pair_tables.items():
+            shape = [1] * len(options)
+            shape[i], shape[j] = table.shape
+            static += table.reshape(shape).astype(np.float32)
+
+        def complete_many(color_pairs):
+            # Exhaustive evaluation of the (small) option tensor, for many
+            # color pairs at once
+            missing = sorted({pair for pair in color_pairs if pair not in completions})
+            if not missing:
+                return
+            top_ids = np.array([pair[0] for pair in missing], dtype=np.int32)
+            bottom_ids = np.array([pair[1] for pair in missing], dtype=np.int32)
+            total = np.repeat(static[None], len(missing), axis=0)
+            for i, (category, cells, colors, values, can_omit) in enumerate(options):
+                gain = weights[np.ix_(top_ids, colors)] + weights[np.ix_(bottom_ids, colors)]
+                if can_omit:
+                    gain = np.pad(gain, ((0, 0), (0, 1)))
+                shape = [len(missing)] + [1] * len(options)
+                shape[i + 1] = gain.shape[1]
+                total += gain.reshape(shape).astype(np.float32)
+
+            flat = total.reshape(len(missing), -1)
+            best = flat.argmax(axis=1)
+            scores = flat[np.arange(len(missing)), best]
+            choices = np.unravel_index(best, total.shape[1:]) if options else ()
+            for row, pair in enumerate(missing):
+                extras = []
+                for i, choice in enumerate(choices):
+                    c = int(choice[row])
+                    if c < len(options[i][1]):
+                        extras.append((options[i][0], options[i][1][c]))
+                completions[pair] = (float(scores[row]), extras)
+
+        flat_bound = bound.ravel()
+        order = np.argsort(-flat_bound, kind='stable')
+        # Plain lists are much cheaper than NumPy scalars in the loop below
+        bound_list, flat_base = flat_bound[order].tolist(), base.ravel().tolist()
+        order_list = order.tolist()
+        top_color_list, bottom_color_list = top_colors.tolist(), bottom_colors.tolist()
+        n_bottoms = len(bottoms)
+        self.stats['pairs'] = len(order_list)
+
+        ready = []      # Evaluated entries not yet yielded (heap, best first)
+        position = 0    # Next pair to evaluate, in bound order
+        batched = False
+
+        while True:
+            # An entry is final once no unevaluated pair can beat it
+            while position < len(order_list) and (not ready or -ready[0][0] < bound_list[position]):
+                flat = order_list[position]
+                t, b = divmod(flat, n_bottoms)
+                color_pair = (top_color_list[t], bottom_color_list[b])
+                if color_pair not in completions:
+                    complete_many([color_pair])
+                extra_score, extras = completions[color_pair]
+                entry = _Entry(flat_base[flat] + extra_score, position, tops[t], bottoms[b], extras)
+                heapq.heappush(ready, (-entry.score, entry.seq, entry))
+                self.stats['evaluated'] += 1
+                position += 1
+
+            if not ready:
+                return
+            entry = heapq.heappop(ready)[2]
+
+            if not batched:
+                # The best score is now known and every pair whose bound is
+                # within the margin of it will be needed: do them in one
+                # vectorized pass instead of one at a time
+                remaining = order[position:]
+                remaining = remaining[flat_bound[remaining] >= entry.score - margin]
+                complete_many(list(zip(top_colors[remaining // n_bottoms].tolist(),
+                                       bottom_colors[remaining % n_bottoms].tolist())))
+                batched = True
+
+            yield entry
+
+    @staticmethod
+    def _outfit(entry, top, bottom, pick):
+        outfit = {'tops': top, 'bottoms': bottom}
+        for category, cell in entry.extras:
+            outfit[category] = pick(cell.items)
+        return outfit
+
+    def iter_top(self):
+        """
+        Yield outfits from best to worst, each with a distinct (top, bottom) pair.
+
+        Outfits are produced lazily: the first one is available as soon as
+        it is provably the best. Ties are broken deterministically by item
+        order, and optional pieces rotate through their cell so similar
+        outfits differ.
+
+        Yields:
+            (score, outfit) tuples; outfit maps category -> item
+        """
+        for entry in self._ranked_entries():
+            for i, (top, bottom) in enumerate(itertools.product(entry.top.items, entry.bottom.items)):
+                yield entry.score, self._outfit(entry, top, bottom, lambda items: items[i % len(items)])
+
+    def iter_sample(self, seed=None, margin=1.0):
+        """
+        Yield distinct outfits in a random order, best-scoring first.
+
+        Outfits within `margin` points of the best score are drawn at random;
+        once they run out the remaining outfits follow in ranked order. The
+        sequence depends only on the wardrobe, the filters and the seed, so
+        the first N outfits are the same whatever N the caller stops at.
+
+        Args:
+            seed: Seed for the random generator
+            margin: How far below the best score a randomly drawn outfit may be
+
+        Yields:
+            (score, outfit) tuples
+        """
+        rng = random.Random(seed)
+        entries = self._ranked_entries(margin)
+        pool, rest = [], []
+        for entry in entries:
+            if pool and entry.score < pool[0].score - margin:
+                rest.append(entry)
+                break
+            pool.append(entry)
+        seen = set()
+
+        total = sum(entry.count for entry in pool)
+        if total <= SAMPLE_ENUMERATION_LIMIT:
+            candidates = [(entry, top, bottom) for entry in pool
+                          for top, bottom in itertools.product(entry.top.items, entry.bottom.items)]
+            rng.shuffle(candidates)
+            for entry, top, bottom in candidates:
+                seen.add((top.id, bottom.id))
+                yield entry.score, self._outfit(entry, top, bottom, rng.choice)
+        else:
+            # Too many to enumerate: rejection-sample until draws keep repeating
+            weights = [entry.count for entry in pool]
+            misses = 0
+            while misses < SAMPLE_MAX_MISSES:
+                entry = rng.choices(pool, weights=weights)[0]
+                top, bottom = rng.choice(entry.top.items), rng.choice(entry.bottom.items)
+                if (top.id, bottom.id) in seen:
+                    misses += 1
+                    continue
+                misses = 0
+                seen.add((top.id, bottom.id))
+                yield entry.score, self._outfit(entry, top, bottom, rng.choice)
+
+        for entry in itertools.chain(pool, rest, entries):
+            for top, bottom in itertools.product(entry.top.items, entry.bottom.items):
+                if (top.id, bottom.id) not in seen:
+                    seen.add((top.id, bottom.id))
+                    yield entry.score, self._outfit(entry, top, bottom, rng.choice)
+
+    def top(self, k=3):
+        """
+        The K best outfits (see iter_top).
+
+        Args:
+            k: Number of outfits
+
+        Returns:
+            List of (score, outfit) tuples, best first
+        """
+        return list(itertools.islice(self.iter_top(), k))
+
+    def sample(self, k=3, seed=None, margin=1.0):
+        """
+        K distinct outfits drawn at random from the near-optimal ones (see iter_sample).
+
+        The same seed always returns the same outfits for the same wardrobe.
+
+        Args:
+            k: Number of outfits
+            seed: Seed for the random generator
+            margin: How far below the best score a randomly drawn outfit may be
+
+        Returns:
+            List of (score, outfit) tuples, best first
+        """
+        results = list(itertools.islice(self.iter_sample(seed, margin), k))
+        results.sort(key=lambda result: -result[0])
+        return results
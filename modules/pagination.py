@@ -0,0 +1,85 @@
+import base64
+import datetime
+import json
+from sqlalchemy import and_, or_
+
+def encode_cursor(state):
+    """
+    Encode a position (in a listing or an outfit stream) as an opaque URL-safe token
+
+    Args:
+        state: JSON-serializable dictionary
+
+    Returns:
+        Cursor string
+    """
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(state, dict):
+        raise ValueError('Invalid cursor')
+    return state
+
+def keyset_page(query, date_column, id_column, cursor=None, limit=24):
+    """
+    One page of a query, newest first, by keyset pagination on (date, id).
+
+    Rows are ordered by date_column descending with NULL dates last (the
+    explicit NULLS LAST keeps PostgreSQL in line with SQLite), then by
+    id_column descending. The cursor holds the date and ID of the last row
+    of the previous page, so every page costs one indexed query however
+    deep it is.
+
+    Args:
+        query: ORM query to paginate (already filtered, e.g. by owner)
+        date_column: Mapped DateTime attribute, e.g. WardrobeItem.date_added
+        id_column: Mapped primary key attribute, e.g. WardrobeItem.id
+        cursor: Cursor returned for the previous page, or None for the first page
+        limit: Number of rows per page
+
+    Returns:
+        Tuple of (list of rows, cursor for the next page or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor:
+        state = decode_cursor(cursor)
+        try:
+            last_id = int(state['id'])
+            last_date = datetime.datetime.fromisoformat(state['date']) if state.get('date') else None
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+
+        if last_date is None:
+            query = query.filter(date_column.is_(None), id_column < last_id)
+        else:
+            query = query.filter(or_(
+                date_column < last_date,
+                and_(date_column == last_date, id_column < last_id),
+                date_column.is_(None)
+            ))
+
+    # Fetch one extra row to know whether another page follows
+    rows = query.order_by(date_column.desc().nulls_last(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        last_date = getattr(last, date_column.key)
+        next_cursor = encode_cursor({
+            'date': last_date.isoformat() if last_date else None,
+            'id': getattr(last, id_column.key)
+        })
+    return rows, next_cursor
@@ -0,0 +1,68 @@
+import json
+import numpy as np
+from modules.color_names import COLOR_NAMES, rgb_to_lab
+
+# Colors kept per item; analysis extracts 5, shorter palettes are zero-padded
+PALETTE_COLORS = 5
+
+# Columns of a palette row: R, G, B (0-255), L*, a*, b*, weight (0-1)
+PALETTE_FIELDS = 7
+RGB = slice(0, 3)
+LAB = slice(3, 6)
+WEIGHT = 6
+
+# Bytes of one encoded palette (float32)
+PALETTE_BYTES = PALETTE_COLORS * PALETTE_FIELDS * 4
+
+# Stable IDs for analyzer color names: their position in COLOR_NAMES
+COLOR_NAME_IDS = {name: i for i, name in enumerate(COLOR_NAMES.values())}
+
+def encode_palette(colors):
+    """
+    Pack an analyzed palette into a fixed-size binary blob.
+
+    Args:
+        colors: List of {'rgb': [r, g, b], 'percentage': p} dictionaries, as in
+            the 'colors' entry of the analysis features
+
+    Returns:
+        PALETTE_BYTES bytes (float32 array of PALETTE_COLORS x PALETTE_FIELDS),
+        or None if there are no colors
+    """
+    colors = sorted(colors or [], key=lambda c: c['percentage'], reverse=True)[:PALETTE_COLORS]
+    if not colors:
+        return None
+
+    palette = np.zeros((PALETTE_COLORS, PALETTE_FIELDS), dtype=np.float32)
+    rgb = np.array([c['rgb'] for c in colors], dtype=np.float64)
+    palette[:len(colors), RGB] = rgb
+    palette[:len(colors), LAB] = rgb_to_lab(rgb)
+    palette[:len(colors), WEIGHT] = [c['percentage'] / 100.0 for c in colors]
+    return palette.tobytes()
+
+def decode_palette(blob):
+    """
+    Unpack a blob produced by encode_palette.
+
+    Returns:
+        Float32 array of shape (PALETTE_COLORS, PALETTE_FIELDS)
+    """
+    return np.frombuffer(blob, dtype=np.float32).reshape(PALETTE_COLORS, PALETTE_FIELDS)
+
+def palette_columns(features):
+    """
+    Binary feature columns of a WardrobeItem for analysis features.
+
+    Args:
+        features: Dictionary (or JSON string) with 'colors' and 'primary_color'
+
+    Returns:
+        Dictionary with 'palette' and 'primary_color_id' values
+    """
+    if isinstance(features, str):
+        features = json.loads(features or '{}')
+    features = features or {}
+    return {
+        'palette': encode_palette(features.get('colors')),
+        'primary_color_id': COLOR_NAME_IDS.get(features.get('primary_color'))
+    }
@@ -0,0 +1,233 @@
+import threading
+import numpy as np
+from modules.palettes import LAB, WEIGHT
+
+# Soft LAB histogram: bin centers on a regular grid over the gamut of sRGB
+L_CENTERS = np.linspace(5, 95, 5)
+AB_CENTERS = np.linspace(-90, 90, 7)
+BIN_CENTERS = np.stack(np.meshgrid(L_CENTERS, AB_CENTERS, AB_CENTERS, indexing='ij'), axis=-1).reshape(-1, 3)
+
+# Width of the Gaussian spreading each color over neighbouring bins (LAB units)
+BIN_SIGMA = 12.0
+
+EMBEDDING_SIZE = len(BIN_CENTERS)
+
+def palette_embeddings(palettes, chunk_size=4096):
+    """
+    Fixed-length embeddings of weighted palettes.
+
+    Each palette color is spread over the LAB histogram bins with a Gaussian
+    kernel and weighted by its share of the garment, so similar shades land
+    in overlapping bins. Rows are L2-normalized: the dot product of two
+    embeddings is their cosine similarity.
+
+    Args:
+        palettes: Float array of shape (N, colors, PALETTE_FIELDS)
+        chunk_size: Rows processed at once, bounding memory use
+
+    Returns:
+        Float32 array of shape (N, EMBEDDING_SIZE); all zeros for empty palettes
+    """
+    centers = BIN_CENTERS.astype(np.float32)
+    center_norms = (centers * centers).sum(axis=1)
+    embeddings = np.zeros((len(palettes), EMBEDDING_SIZE), dtype=np.float32)
+
+    for start in range(0, len(palettes), chunk_size):
+        chunk = np.asarray(palettes[start:start + chunk_size], dtype=np.float32)
+        lab = chunk[:, :, LAB]
+        # |x - c|^2 for every color and bin, shape (n, colors, bins)
+        distances = (lab * lab).sum(axis=2)[:, :, None] - 2.0 * lab @ centers.T + center_norms
+        kernel = np.exp(-np.maximum(distances, 0) / (2 * BIN_SIGMA ** 2))
+        # Far bins would hold denormal floats, which make every later dot product slow
+        kernel[kernel < 1e-6] = 0
+        embeddings[start:start + len(chunk)] = np.einsum('nc,ncb->nb', chunk[:, :, WEIGHT], kernel)
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+class ExactIndex:
+    """Brute-force cosine similarity over all embeddings (one matrix-vector product)"""
+
+    def __init__(self, embeddings):
+        """
+        Args:
+            embeddings: Array from palette_embeddings
+        """
+        self.embeddings = embeddings
+
+    def search(self, query, k, exclude=None):
+        """
+        Rows most similar to a query embedding.
+
+        Args:
+            query: Embedding of shape (EMBEDDING_SIZE,)
+            k: Number of results
+            exclude: Optional row to leave out (the query item itself)
+
+        Returns:
+            Tuple of (row indices, cosine similarities), best first
+        """
+        scores = self.embeddings @ query
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        rows = _top_k(scores, k)
+        rows = rows[np.isfinite(scores[rows])]
+        return rows, scores[rows]
+
+class LSHIndex:
+    """
+    Approximate cosine similarity with random-hyperplane locality-sensitive hashing.
+
+    Each of n_tables tables hashes an embedding to n_bits sign bits. A query
+    collects the rows sharing its bucket (and, with probes, the buckets one
+    bit away) in any table, then ranks only those candidates exactly.
+    """
+
+    def __init__(self, embeddings, n_tables=12, n_bits=16, probes=True, seed=0):
+        """
+        Args:
+            embeddings: Array from palette_embeddings
+            n_tables: Number of independent hash tables (more: higher recall)
+            n_bits: Bits per hash (more: smaller buckets, faster, lower recall)
+            probes: Also look in the buckets one bit flip away
+            seed: Seed of the random hyperplanes
+        """
+        self.embeddings = embeddings
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probes = probes
+        # Embeddings are non-negative, so hyperplanes through the origin would
+        # barely split them; hash the offsets from the mean instead
+        self.center = embeddings.mean(axis=0) if len(embeddings) else np.zeros(embeddings.shape[1], dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((embeddings.shape[1], n_tables * n_bits)).astype(np.float32)
+        self._powers = (1 << np.arange(n_bits)).astype(np.int64)
+
+        self.tables = []
+        for codes in self._hash(embeddings):
+            # Rows grouped by code: sort once, then slice per bucket
+            order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[order]
+            keys, starts = np.unique(sorted_codes, return_index=True)
+            ends = np.append(starts[1:], len(order))
+            self.tables.append({key: order[start:end] for key, start, end in zip(keys.tolist(), starts, ends)})
+
+    def _hash(self, vectors):
+        """Bucket codes of each vector in every table, shape (n_tables, N)"""
+        bits = (np.atleast_2d(vectors) - self.center) @ self.planes > 0
+        bits = bits.reshape(len(bits), self.n_tables, self.n_bits).transpose(1, 0, 2)
+        return bits.astype(np.int64) @ self._powers
+
+    def candidates(self, query):
+        """Rows sharing a bucket with the query in at least one table"""
+        flips = [0] + ([1 << bit for bit in range(self.n_bits)] if self.probes else [])
+        buckets = []
+        for table, code in zip(self.tables, self._hash(query)[:, 0].tolist()):
+            for flip in flips:
+                rows = table.get(code ^ flip)
+                if rows is not None:
+                    buckets.append(rows)
+        if not buckets:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(buckets))
+
+    def search(self, query, k, exclude=None):
+        """Same as ExactIndex.search, over the LSH candidates only"""
+        rows = self.candidates(query)
+        if exclude is not None:
+            rows = rows[rows != exclude]
+        scores = self.embeddings[rows] @ query
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
+
+class SimilaritySearch:
+    """
+    "Find similar items" over the palettes in a FeatureStore.
+
+    Results never cross owners: each owner's embeddings and indexes are
+    built from their partition of the store on first use, and rebuilt when
+    that partition swaps in a new matrix.
+    Owners with at least approximate_threshold analyzed items are searched
+    with LSH.
+    """
+
+    def __init__(self, feature_store, approximate_threshold=20000):
+        """
+        Args:
+            feature_store: FeatureStore providing the palettes
+            approximate_threshold: Item count from which LSH is used, or None
+                to always search exactly
+        """
+        self.feature_store = feature_store
+        self.approximate_threshold = approximate_threshold
+        self._built = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read SIMILARITY_APPROXIMATE_THRESHOLD from the app config"""
+        self.approximate_threshold = app.config.get('SIMILARITY_APPROXIMATE_THRESHOLD', self.approximate_threshold)
+        app.extensions['similarity_search'] = self
+
+    def _indexes(self, owner_id):
+        matrix = self.feature_store.for_owner(owner_id).matrix()
+        with self._lock:
+            built = self._built.get(owner_id)
+            if built is None or built['matrix'] is not matrix:
+                rows = np.flatnonzero(matrix.has_palette)
+                embeddings = palette_embeddings(matrix.palettes[rows])
+                built = self._built[owner_id] = {
+                    'matrix': matrix,
+                    'rows': rows,  # Embedding row -> matrix row
+                    'positions': {row: i for i, row in enumerate(rows.tolist())},
+                    'embeddings': embeddings,
+                    'exact': ExactIndex(embeddings),
+                    'lsh': None
+                }
+        return built
+
+    def similar(self, item_id, owner_id, k=10, approximate=None):
+        """
+        Items of an owner whose palettes look most like the palette of a given item.
+
+        Args:
+            item_id: ID of the reference item
+            owner_id: Owner of the item; only their items are searched
+            k: Number of results
+            approximate: True to use LSH, False for exact search, None to
+                decide by wardrobe size
+
+        Returns:
+            List of (item ID, cosine similarity) tuples, most similar first
+
+        Raises:
+            KeyError: If the owner has no analyzed palette for the item
+        """
+        built = self._indexes(owner_id)
+        matrix = built['matrix']
+        position = built['positions'].get(matrix.rows.get(item_id, -1))
+        if position is None:
+            raise KeyError(item_id)
+
+        if approximate is None:
+            approximate = self.approximate_threshold is not None and len(built['rows']) >= self.approximate_threshold
+        if approximate:
+            if built['lsh'] is None:
+                with self._lock:
+                    if built['lsh'] is None:
+                        built['lsh'] = LSHIndex(built['embeddings'])
+            index = built['lsh']
+        else:
+            index = built['exact']
+
+        positions, scores = index.search(built['embeddings'][position], k, exclude=position)
+        item_ids = matrix.ids[built['rows'][positions]]
+        return [(int(item_id), float(score)) for item_id, score in zip(item_ids, scores)]
@@ -0,0 +1,43 @@
+import re
+from flask import g, session, request, abort, has_request_context
+from modules.models import DEFAULT_OWNER_ID
+
+# Upload folder shards holding one owner's images, e.g. 'u42'
+SHARD_PATTERN = re.compile(r'^u([1-9]\d*)$')
+
+def init_app(app):
+    """
+    Resolve the owner of every request before it is handled.
+
+    The owner is taken from session['owner_id'] when a login flow sets it,
+    otherwise from the TENANT_HEADER request header when configured (for
+    deployments behind an authenticating proxy that sets it), otherwise
+    DEFAULT_OWNER_ID, so single-user installs behave as before.
+    """
+    header = app.config.get('TENANT_HEADER')
+
+    @app.before_request
+    def resolve_owner():
+        owner_id = session.get('owner_id')
+        if owner_id is None and header and request.headers.get(header):
+            value = request.headers[header]
+            if not value.isdigit() or int(value) <= 0:
+                abort(400, f"Invalid {header} header")
+            owner_id = int(value)
+        g.owner_id = owner_id or DEFAULT_OWNER_ID
+
+def current_owner_id():
+    """Owner of the current request (DEFAULT_OWNER_ID outside requests, e.g. in CLI commands)"""
+    if has_request_context():
+        return g.get('owner_id', DEFAULT_OWNER_ID)
+    return DEFAULT_OWNER_ID
+
+def owner_shard(owner_id):
+    """Upload folder shard holding one owner's images, e.g. 'u42'"""
+    return f"u{int(owner_id)}"
+
+
+def shard_owner_id(shard):
+    """Owner whose images a shard holds ('u42' -> 42), or None if the folder is not an owner shard"""
+    match = SHARD_PATTERN.match(shard)
+    return int(match.group(1)) if match else None
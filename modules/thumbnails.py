@@ -0,0 +1,124 @@
+import os
+import tempfile
+import threading
+
+# Widths of the derivatives generated for every upload (card, 2x card, detail)
+DEFAULT_WIDTHS = (200, 400, 800)
+
+# Formats in order of preference; browsers without WebP fall back to JPEG
+FORMATS = {
+    'webp': {'format': 'WEBP', 'mimetype': 'image/webp', 'options': {'method': 4}},
+    'jpeg': {'format': 'JPEG', 'mimetype': 'image/jpeg', 'options': {'optimize': True, 'progressive': True}},
+}
+
+class ThumbnailStore:
+    """
+    Fixed-width WebP/JPEG derivatives of uploaded images.
+
+    Derivatives live in a 'thumbs' folder beside the blobs and are named
+    after the blob, e.g. uploads/thumbs/<digest>-400.webp. They are
+    generated on first request; all widths of a format are produced from a
+    single reduced decode of the original.
+    """
+
+    def __init__(self, blob_store, widths=DEFAULT_WIDTHS, quality=80):
+        """
+        Args:
+            blob_store: BlobStore holding the original uploads
+            widths: Widths in pixels of the derivatives
+            quality: Encoder quality (0-100) for both formats
+        """
+        self.blob_store = blob_store
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def relative_path(self, image_path, width, fmt):
+        """Path of a derivative relative to the static folder"""
+        return self.blob_store.derivative_path(image_path, f'{width}.{fmt}')
+
+    def get(self, image_path, width, fmt):
+        """
+        Return the absolute path of a derivative, generating it if needed.
+
+        Args:
+            image_path: Path of the original relative to the static folder
+            width: One of self.widths
+            fmt: 'webp' or 'jpeg'
+
+        Returns:
+            Absolute path of the derivative
+
+        Raises:
+            ValueError: If the width or format is not supported
+            FileNotFoundError: If the original does not exist
+        """
+        if width not in self.widths or fmt not in FORMATS:
+            raise ValueError(f'Unsupported thumbnail {width}.{fmt}')
+
+        path = self.blob_store.absolute_path(self.relative_path(image_path, width, fmt))
+        if os.path.exists(path):
+            return path
+
+        # One generation per original and format, even with concurrent requests
+        key = (image_path, fmt)
+        with self._locks_lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if not os.path.exists(path):
+                self.generate(image_path, formats=[fmt])
+        with self._locks_lock:
+            self._locks.pop(key, None)
+        return path
+
+    def generate(self, image_path, formats=None):
+        """
+        Write every width of the given formats for one original.
+
+        Args:
+            image_path: Path of the original relative to the static folder
+            formats: Format names, defaults to all of FORMATS
+
+        Returns:
+            List of derivative paths relative to the static folder
+        """
+        source = self.blob_store.absolute_path(image_path)
+        if not os.path.exists(source):
+            raise FileNotFoundError(source)
+
+        # Imported here so that starting the app does not load Pillow
+        from PIL import Image, ImageOps
+
+        with Image.open(source) as original:
+            # JPEGs decode directly at 1/2, 1/4 or 1/8 scale when that still
+            # covers the largest width, which is most of the cost saved. The
+            # box is square because EXIF rotation may swap the sides.
+            largest = self.widths[-1]
+            original.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(original).convert('RGB')
+
+        written = []
+        # Resize from the previous (larger) derivative rather than the original
+        for width in reversed(self.widths):
+            if image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            for fmt in formats or FORMATS:
+                relative = self.relative_path(image_path, width, fmt)
+                self._save(image, self.blob_store.absolute_path(relative), fmt)
+                written.append(relative)
+        return written
+
+    def _save(self, image, path, fmt):
+        # Write to a temporary file first so readers never see a partial image
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='temp_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, FORMATS[fmt]['format'], quality=self.quality, **FORMATS[fmt]['options'])
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
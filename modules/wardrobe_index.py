@@ -0,0 +1,455 @@
+import threading
+import time
+import numpy as np
+from flask import g, current_app, has_app_context, has_request_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from modules.color_compatibility import get_compatibility
+from modules.database import db
+from modules.models import WardrobeItem, WardrobeVersion, DEFAULT_OWNER_ID
+
+# INSERT ... ON CONFLICT DO UPDATE, per database
+UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def bump_versions(connection, owner_ids):
+    """
+    Increment the wardrobe version of some owners in the current transaction.
+
+    The version rows stay locked until the transaction ends, so concurrent
+    writers bump them one after the other and every committed change gets
+    its own version.
+
+    Args:
+        connection: Connection of the transaction changing the items
+        owner_ids: Owners whose items change
+
+    Returns:
+        Dictionary of owner ID -> new version (empty on databases without
+        INSERT ... ON CONFLICT, where other processes rely on the TTL)
+    """
+    upsert = UPSERTS.get(connection.dialect.name)
+    owner_ids = sorted(set(owner_ids))
+    if upsert is None or not owner_ids:
+        return {}
+    table = WardrobeVersion.__table__
+    statement = upsert(table).values([{'owner_id': owner_id, 'version': 1} for owner_id in owner_ids])
+    statement = statement.on_conflict_do_update(index_elements=[table.c.owner_id],
+                                                set_={'version': table.c.version + 1})
+    return dict(connection.execute(statement.returning(table.c.owner_id, table.c.version)).all())
+
+def get_wardrobe_index():
+    """Return the wardrobe index of the current application (see WardrobeIndex.init_app)"""
+    return current_app.extensions['wardrobe_index']
+
+def stored_version(owner_id):
+    """Wardrobe version of an owner in the database (0 if their items never changed)"""
+    return db.session.execute(
+        select(WardrobeVersion.version).where(WardrobeVersion.owner_id == owner_id)
+    ).scalar() or 0
+
+def version_check_due(partition):
+    """
+    Whether an owner partition (of the wardrobe index or the feature store)
+    should read its owner's wardrobe version again: once per request, and
+    on every use outside requests.
+    """
+    if not has_request_context():
+        return True
+    checked = g.setdefault('wardrobe_versions_checked', set())
+    if partition in checked:
+        return False
+    checked.add(partition)
+    return True
+
+def committed_versions(session):
+    """
+    Wardrobe versions bumped by the transaction being committed.
+
+    Read by the after_commit handlers of the wardrobe index and the feature
+    store; the record is dropped when the transaction ends.
+
+    Returns:
+        Dictionary of owner ID -> (first, last) version, or None
+    """
+    return session.info.get('wardrobe_versions')
+
+class IndexedItem:
+    """Read-only snapshot of a WardrobeItem, safe to share between requests"""
+
+    __slots__ = ('id', 'name', 'category', 'color', 'season', 'image_path', '_data')
+
+    def __init__(self, data):
+        """
+        Args:
+            data: Dictionary produced by WardrobeItem.to_dict()
+        """
+        self.id = data['id']
+        self.name = data['name']
+        self.category = data['category']
+        self.color = data['color']
+        self.season = data['season']
+        self.image_path = data['image_path']
+        self._data = data
+
+    def __repr__(self):
+        return f'<IndexedItem {self.name}>'
+
+    def to_dict(self):
+        """Same dictionary as WardrobeItem.to_dict()"""
+        return dict(self._data)
+
+class _Snapshot:
+    """Immutable grouping of the wardrobe; replaced as a whole on every change"""
+
+    def __init__(self, items, compatibility):
+        self.items = items
+        self.compatibility = compatibility
+        self.by_key = {}
+        for item in items.values():
+            self.by_key.setdefault((item.season, item.category), []).append(item)
+        for bucket in self.by_key.values():
+            bucket.sort(key=lambda item: item.id)
+
+        # Derived views, memoized per snapshot
+        self._views = {}
+        self._columns = {}
+        self._matches = {}
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def view(self, season):
+        """Items usable in a season, grouped by category"""
+        view = self._views.get(season)
+        if view is None:
+            view = {}
+            for (item_season, category), bucket in self.by_key.items():
+                if season is None or item_season in (season, 'all'):
+                    view.setdefault(category, []).extend(bucket)
+            with self._lock:
+                self._views[season] = view
+        return view
+
+    def memo(self, key, build):
+        """Compute a derived value once per snapshot (build is called without arguments)"""
+        value = self._memo.get(key)
+        if value is None:
+            value = build()
+            with self._lock:
+                self._memo[key] = value
+        return value
+
+    def color_column(self, season, category):
+        """Color IDs of the items in view(season)[category], as an array"""
+        key = (season, category)
+        column = self._columns.get(key)
+        if column is None:
+            column = self.compatibility.color_ids([item.color for item in self.view(season).get(category, [])])
+            with self._lock:
+                self._columns[key] = column
+        return column
+
+    def compatible_items(self, season, category, colors):
+        """Items of a category whose color goes with at least one of the given colors"""
+        key = (season, category, colors)
+        matches = self._matches.get(key)
+        if matches is None:
+            candidates = self.view(season).get(category, [])
+            mask = self.compatibility.mask(self.compatibility.color_ids(colors), self.color_column(season, category))
+            matches = [candidates[i] for i in np.flatnonzero(mask)]
+            with self._lock:
+                self._matches[key] = matches
+        return matches
+
+class OwnerIndex:
+    """One owner's partition of a WardrobeIndex, with its own snapshot"""
+
+    def __init__(self, parent, owner_id):
+        """
+        Args:
+            parent: WardrobeIndex the partition belongs to
+            owner_id: Owner whose items the partition holds
+        """
+        self.parent = parent
+        self.owner_id = owner_id
+        self._snapshot = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """
+        Return the current snapshot, loading it from the database if needed.
+
+        A snapshot loaded from the database is reloaded when the owner's
+        wardrobe version there has moved on, i.e. another process changed
+        their items. The version is one primary key lookup, made at most
+        once per request; the TTL still applies as a fallback.
+        """
+        snapshot = self._snapshot
+        ttl = self.parent.ttl
+        if snapshot is None or snapshot.compatibility is not self.parent._compatibility() \
+                or (ttl is not None and time.monotonic() - self._loaded_at > ttl):
+            return self.reload()
+
+        version = self._version
+        if version is not None and version_check_due(self):
+            current = stored_version(self.owner_id)
+            if current != version:
+                snapshot = self.reload(current)
+        return snapshot
+
+    def reload(self, version=None):
+        """
+        Rebuild the partition from the database (uses the owner-leading indexes).
+
+        Args:
+            version: Wardrobe version just read from the database, if any
+        """
+        if version is None:
+            version = stored_version(self.owner_id)
+        return self.load((item.to_dict() for item in WardrobeItem.query.filter_by(owner_id=self.owner_id)), version)
+
+    def load(self, rows, version=None):
+        """
+        Replace the partition contents.
+
+        Args:
+            rows: Iterable of dictionaries shaped like WardrobeItem.to_dict()
+            version: Wardrobe version the rows were read at, or None for rows
+                that do not come from the database (never checked against it)
+
+        Returns:
+            The new snapshot
+        """
+        with self._lock:
+            items = {row['id']: IndexedItem(row) for row in rows}
+            self._snapshot = _Snapshot(items, self.parent._compatibility())
+            self._version = version
+            self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Drop the snapshot; it is rebuilt on next use"""
+        with self._lock:
+            self._snapshot = None
+
+    def apply(self, updated=(), deleted=(), versions=None):
+        """
+        Apply item changes to the loaded snapshot.
+
+        Args:
+            updated: Dictionaries from WardrobeItem.to_dict() for new or edited items
+            deleted: IDs of removed items
+            versions: (first, last) wardrobe versions the committed
+                transaction bumped the owner to, if known
+        """
+        with self._lock:
+            if self._snapshot is None:
+                return  # Nothing loaded yet; the next use reads the fresh data
+            if versions is not None and self._version is not None:
+                first, last = versions
+                if self._version != first - 1:
+                    # Another process changed the wardrobe too; read it all again
+                    self._snapshot = None
+                    return
+                self._version = last
+            items = dict(self._snapshot.items)
+            for data in updated:
+                items[data['id']] = IndexedItem(data)
+            for item_id in deleted:
+                items.pop(item_id, None)
+            self._snapshot = _Snapshot(items, self.parent._compatibility())
+
+    def view(self, season=None):
+        """
+        Items usable in a season, grouped by category.
+
+        Args:
+            season: Lowercase season name, or None for the whole wardrobe.
+                Items marked 'all' are included in every season.
+
+        Returns:
+            Dictionary of category -> list of IndexedItem
+        """
+        return self.snapshot().view(season)
+
+    def compatible_items(self, season, category, colors):
+        """
+        Items of a category whose color is compatible with any of the given colors.
+
+        Args:
+            season: Lowercase season name, or None for the whole wardrobe
+            category: Category to pick from
+            colors: Tuple of colors the item must go with
+
+        Returns:
+            List of IndexedItem
+        """
+        return self.snapshot().compatible_items(season, category, tuple(colors))
+
+class WardrobeIndex:
+    """
+    In-memory wardrobe grouped by (season, category), for outfit generation.
+
+    The index is partitioned by owner: for_owner() returns an OwnerIndex
+    holding only that owner's items, so lookups cost the same however many
+    tenants share the database. Candidate filtering uses the compiled color
+    compatibility matrix over a per-category column of color IDs.
+
+    Each partition is built from the database on first use and then kept up
+    to date from SQLAlchemy session events: items added, edited or deleted
+    through the ORM are applied incrementally once their transaction
+    commits, and bulk statements on the wardrobe table trigger a rebuild.
+
+    Every transaction that changes an owner's items also bumps their row
+    in wardrobe_versions, so other processes see the change on their next
+    request (see OwnerIndex.snapshot). On databases other than SQLite and
+    PostgreSQL, changes made by other processes are picked up after `ttl`
+    seconds.
+    """
+
+    def __init__(self, compatibility=None, app=None, ttl=60):
+        """
+        Args:
+            compatibility: CompatibilityMatrix used to match colors, defaults
+                to the process-wide one from get_compatibility()
+            app: Optional Flask application to attach to
+            ttl: Seconds before a partition is reloaded from the database
+                whatever its version, or None to rely on versions only
+        """
+        self.compatibility = compatibility
+        self.ttl = ttl
+        self._owners = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Attach the index to a Flask application and listen for wardrobe changes"""
+        self.ttl = app.config.get('WARDROBE_INDEX_TTL', self.ttl)
+        app.extensions['wardrobe_index'] = self
+
+        # The session is shared by every app, so listen once however many
+        # apps are created; each event goes to the index of the app in use
+        if not event.contains(db.session, 'after_commit', _after_commit):
+            event.listen(db.session, 'after_flush', _after_flush)
+            event.listen(db.session, 'do_orm_execute', _on_orm_execute)
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_soft_rollback', _after_rollback)
+            event.listen(db.session, 'after_transaction_end', _forget_versions)
+
+    def _compatibility(self):
+        return self.compatibility or get_compatibility()
+
+    def for_owner(self, owner_id):
+        """Return the partition of one owner, creating it on first use"""
+        partition = self._owners.get(owner_id)
+        if partition is None:
+            with self._lock:
+                partition = self._owners.setdefault(owner_id, OwnerIndex(self, owner_id))
+        return partition
+
+    def invalidate(self):
+        """Drop every partition's snapshot; each is rebuilt on next use"""
+        for partition in list(self._owners.values()):
+            partition.invalidate()
+
+    def apply(self, updated=(), deleted=(), versions=None):
+        """
+        Apply item changes to the loaded partitions.
+
+        Args:
+            updated: Dictionaries from WardrobeItem.to_dict() for new or edited items
+            deleted: Dictionaries from WardrobeItem.to_dict() for removed items
+            versions: Dictionary of owner ID -> (first, last) wardrobe
+                versions bumped by the transaction
+        """
+        versions = versions or {}
+        changes = {}
+        for data in updated:
+            changes.setdefault(data['owner_id'], ([], []))[0].append(data)
+        for data in deleted:
+            changes.setdefault(data['owner_id'], ([], []))[1].append(data['id'])
+        for owner_id in set(changes) | set(versions):
+            partition = self._owners.get(owner_id)
+            if partition is not None:
+                owner_updated, owner_deleted = changes.get(owner_id, ((), ()))
+                partition.apply(owner_updated, owner_deleted, versions.get(owner_id))
+
+    # Session event handlers. Changes are collected per session and only
+    # applied once the transaction commits, so rollbacks never leak in.
+
+    def _bump(self, session, owner_ids):
+        # Keep the first and last version of each owner bumped in this transaction
+        bumped = session.info.setdefault('wardrobe_versions', {})
+        for owner_id, version in bump_versions(session.connection(), owner_ids).items():
+            bumped[owner_id] = (bumped.get(owner_id, (version, version))[0], version)
+
+    def _after_flush(self, session, flush_context):
+        changes = session.info.setdefault('wardrobe_index_changes', {'updated': {}, 'deleted': {}})
+        owner_ids = set()
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, WardrobeItem) and obj.id is not None:
+                changes['updated'][obj.id] = obj.to_dict()
+                changes['deleted'].pop(obj.id, None)
+                # An item moved to another owner changes both wardrobes
+                owner_ids.update(inspect(obj).attrs.owner_id.history.deleted)
+                owner_ids.add(obj.owner_id)
+        for obj in session.deleted:
+            if isinstance(obj, WardrobeItem):
+                changes['updated'].pop(obj.id, None)
+                changes['deleted'][obj.id] = {'id': obj.id, 'owner_id': obj.owner_id}
+                owner_ids.add(obj.owner_id)
+        if owner_ids:
+            self._bump(session, owner_ids)
+
+    def _on_orm_execute(self, orm_execute_state):
+        # Bulk INSERT/UPDATE/DELETE statements bypass the unit of work
+        if orm_execute_state.is_select:
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is WardrobeItem:
+            session = orm_execute_state.session
+            session.info['wardrobe_index_stale'] = True
+            # Runs before the statement: bump the owners of the inserted
+            # rows, or else every owner with items (a DELETE may remove all
+            # of someone's items)
+            rows = orm_execute_state.parameters
+            if orm_execute_state.is_insert and rows:
+                rows = [rows] if isinstance(rows, dict) else rows
+                owner_ids = {row.get('owner_id', DEFAULT_OWNER_ID) for row in rows}
+            else:
+                owner_ids = session.connection().execute(select(WardrobeItem.owner_id).distinct()).scalars()
+            self._bump(session, owner_ids)
+
+    def _after_commit(self, session):
+        changes = session.info.pop('wardrobe_index_changes', None)
+        versions = committed_versions(session)
+        if session.info.pop('wardrobe_index_stale', False):
+            self.invalidate()
+        elif changes or versions:
+            changes = changes or {'updated': {}, 'deleted': {}}
+            self.apply(changes['updated'].values(), changes['deleted'].values(), versions)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop('wardrobe_index_changes', None)
+            session.info.pop('wardrobe_index_stale', None)
+
+def _session_handler(name):
+    """Session event listener calling the named handler of the current app's index"""
+    def handler(*args):
+        index = current_app.extensions.get('wardrobe_index') if has_app_context() else None
+        if index is not None:
+            getattr(index, name)(*args)
+    return handler
+
+_after_flush = _session_handler('_after_flush')
+_on_orm_execute = _session_handler('_on_orm_execute')
+_after_commit = _session_handler('_after_commit')
+_after_rollback = _session_handler('_after_rollback')
+
+def _forget_versions(session, transaction):
+    # Runs after the after_commit handlers (and on rollback)
+    if transaction.parent is None:
+        session.info.pop('wardrobe_versions', None)
@@ -0,0 +1,69 @@
+from sqlalchemy import func
+from modules.database import db
+from modules.models import WardrobeItem
+from modules.pagination import keyset_page
+
+# Query string parameters accepted as filters by wardrobe_page()
+WARDROBE_FILTERS = ('category', 'season', 'color')
+
+def filter_items(query, owner_id, category=None, season=None, color=None):
+    """
+    Restrict a WardrobeItem query to one owner's items matching the given filters.
+
+    Args:
+        query: WardrobeItem query to filter
+        owner_id: Owner of the items
+        category: Exact category, e.g. 'tops'
+        season: Season name; items marked 'all' match every season
+        color: Exact color name as stored on the item
+
+    Returns:
+        Filtered query
+    """
+    query = query.filter(WardrobeItem.owner_id == owner_id)
+    if category:
+        query = query.filter(WardrobeItem.category == category)
+    if season and season != 'all':
+        query = query.filter(WardrobeItem.season.in_([season, 'all']))
+    elif season:
+        query = query.filter(WardrobeItem.season == 'all')
+    if color:
+        query = query.filter(WardrobeItem.color == color)
+    return query
+
+def wardrobe_page(owner_id, cursor=None, limit=24, **filters):
+    """
+    One page of an owner's wardrobe items, newest first.
+
+    Uses keyset pagination on (date_added, id) backed by the owner-leading
+    composite indexes on wardrobe_items, so deep pages cost the same as the
+    first one and other owners' items are never scanned.
+
+    Args:
+        owner_id: Owner of the items
+        cursor: Cursor returned for the previous page, or None for the first page
+        limit: Number of items per page
+        **filters: category, season and/or color (see filter_items)
+
+    Returns:
+        Tuple of (list of WardrobeItem, cursor for the next page or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    query = filter_items(WardrobeItem.query, owner_id, **filters)
+    return keyset_page(query, WardrobeItem.date_added, WardrobeItem.id, cursor, limit)
+
+def category_counts(owner_id, **filters):
+    """
+    Number of an owner's wardrobe items per category, in a single grouped query.
+
+    Args:
+        owner_id: Owner of the items
+        **filters: season and/or color (see filter_items)
+
+    Returns:
+        Dictionary of category -> item count; categories without items are absent
+    """
+    query = filter_items(db.session.query(WardrobeItem.category, func.count(WardrobeItem.id)), owner_id, **filters)
+    return dict(query.group_by(WardrobeItem.category).all())
@@ -53,6 +53,32 @@ function setupImagePreview(inputId, previewId, placeholderId) {
     }
 }
 
+// Widths served by /thumbnails, listed on <body> by base.html
+function thumbnailWidths() {
+    return (document.body.dataset.thumbnailWidths || '').split(',').filter(Boolean).map(Number);
+}
+
+// URL of a resized derivative of an uploaded image
+function thumbnailUrl(imagePath, width, format = 'jpeg') {
+    const path = imagePath.replace(/\\/g, '/').replace(/^static\//, '');
+    return '/thumbnails/' + width + '/' + format + '/' + path.split('/').map(encodeURIComponent).join('/');
+}
+
+// srcset attribute value listing every thumbnail width of an image
+function thumbnailSrcset(imagePath, format = 'jpeg') {
+    return thumbnailWidths().map(width => thumbnailUrl(imagePath, width, format) + ' ' + width + 'w').join(', ');
+}
+
+// <picture> markup for an upload: WebP with a JPEG fallback (see templates/macros/images.html)
+function responsiveImage(imagePath, alt, sizes, className = '', style = '') {
+    return '<picture>' +
+        '<source type="image/webp" srcset="' + thumbnailSrcset(imagePath, 'webp') + '" sizes="' + sizes + '">' +
+        '<img src="' + thumbnailUrl(imagePath, 400) + '" srcset="' + thumbnailSrcset(imagePath) + '" sizes="' + sizes + '"' +
+        ' alt="' + alt + '" class="' + className + '"' + (style ? ' style="' + style + '"' : '') +
+        ' loading="lazy" decoding="async">' +
+        '</picture>';
+}
+
 // Document ready function
 document.addEventListener('DOMContentLoaded', function() {
     // Global initialization code can go here
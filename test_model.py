@@ -1,6 +1,8 @@
-from app import app, db
+from app import create_app, db
 from modules.outfit_generator import SavedOutfit
 
+app = create_app()
+
 # Print all models registered with SQLAlchemy
 print("Registered models:")
 for model in db.Model.__subclasses__():
@@ -0,0 +1,26 @@
+import pytest
+from app import create_app
+from modules.database import db
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Application on a scratch SQLite database, analyzing inline, with the tenant header enabled"""
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'ANALYSIS_WORKERS': 0,
+        'ANALYSIS_CACHE_FILE': None,
+        'TENANT_HEADER': 'X-Owner-Id'
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
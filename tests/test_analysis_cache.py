@@ -0,0 +1,67 @@
+import sqlite3
+import numpy as np
+import pytest
+from PIL import Image
+from modules import analysis_cache
+from modules.analysis_cache import AnalysisCache, configure_cache
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(str(tmp_path / 'cache.db'), max_entries=3)
+
+def test_values_round_trip_and_persist(cache):
+    cache.set_json('a', {'color': 'Navy'})
+    cache.set_bytes('b', b'\x00\x01')
+
+    reopened = AnalysisCache(cache.path)
+    assert reopened.get_json('a') == {'color': 'Navy'}
+    assert reopened.get_bytes('b') == b'\x00\x01'
+    assert reopened.get_json('missing') is None
+
+def last_used(cache, key):
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute('SELECT last_used FROM cache_entries WHERE key = ?', (key,)).fetchone()[0]
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.db'), max_entries=3, touch_interval=0)
+    for key in 'abc':
+        cache.set_json(key, key)
+    cache.get_json('a')  # 'b' is now the least recently used
+    cache.set_json('d', 'd')
+
+    assert cache.get_json('b') is None
+    assert [cache.get_json(key) for key in 'acd'] == ['a', 'c', 'd']
+    stats = cache.stats()
+    assert (stats['entries'], stats['evictions'], stats['hits'], stats['misses']) == (3, 1, 4, 1)
+
+def test_hits_only_touch_entries_older_than_the_interval(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(analysis_cache.time, 'time', lambda: clock[0])
+    cache = AnalysisCache(str(tmp_path / 'cache.db'), touch_interval=60)
+    cache.set_json('a', 'a')
+
+    clock[0] += 30
+    assert cache.get_json('a') == 'a'
+    assert last_used(cache, 'a') == 1000.0
+
+    clock[0] += 31
+    assert cache.get_json('a') == 'a'
+    assert last_used(cache, 'a') == 1061.0
+
+def test_identical_images_are_analyzed_once(tmp_path, monkeypatch):
+    from modules.garment_analyzer import analyze_garment
+    monkeypatch.setattr(analysis_cache, '_cache', None)
+    cache = configure_cache(str(tmp_path / 'cache.db'))
+
+    pixels = np.zeros((64, 64, 3), dtype=np.uint8)
+    pixels[:, :32] = (200, 30, 30)
+    pixels[:, 32:] = (20, 20, 160)
+    for name in ('first.png', 'copy.png'):
+        Image.fromarray(pixels).save(tmp_path / name)
+
+    first = analyze_garment(str(tmp_path / 'first.png'))
+    copy = analyze_garment(str(tmp_path / 'copy.png'))
+
+    assert first['analysis_mode'] != 'fallback'
+    assert copy == first
+    assert (cache.stats()['hits'], cache.stats()['entries']) == (1, 1)
@@ -0,0 +1,58 @@
+import datetime
+from modules.database import db
+from modules.models import WardrobeItem, AnalysisJob
+
+def add_job(status, started_at=None, worker=None):
+    item = WardrobeItem('shirt', 'tops', 'Black', 'all', 'uploads/missing.jpg', status='pending')
+    db.session.add(item)
+    db.session.flush()
+    job = AnalysisJob(item_id=item.id, status=status, started_at=started_at, worker=worker)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def test_a_queued_job_is_claimed_once(app):
+    worker = app.extensions['analysis_worker']
+    with app.app_context():
+        job_id = add_job('queued')
+
+        assert worker.claim(job_id)
+        assert not worker.claim(job_id)
+
+        job = db.session.get(AnalysisJob, job_id)
+        assert job.status == 'running'
+        assert job.worker == worker.worker_id
+        assert job.started_at is not None
+
+def test_a_running_job_is_reclaimed_only_after_its_lease(app):
+    worker = app.extensions['analysis_worker']
+    now = datetime.datetime.utcnow()
+    with app.app_context():
+        fresh = add_job('running', now, 'other-host:1')
+        stale = add_job('running', now - datetime.timedelta(seconds=worker.lease + 1), 'other-host:2')
+
+        assert not worker.claim(fresh)
+        assert worker.claim(stale)
+        assert db.session.get(AnalysisJob, stale).worker == worker.worker_id
+
+def test_resume_skips_finished_jobs_and_fails_missing_images(app):
+    worker = app.extensions['analysis_worker']
+    with app.app_context():
+        queued = add_job('queued')
+        done = add_job('done')
+
+        worker.resume_pending()
+
+        # Analysis runs inline in the tests and saves its outcome in its own
+        # session; the image does not exist
+        db.session.expire_all()
+        assert db.session.get(AnalysisJob, queued).status == 'failed'
+        assert db.session.get(AnalysisJob, done).status == 'done'
+
+def test_pool_is_sized_per_web_worker(app, monkeypatch):
+    from app import create_app
+    monkeypatch.setattr('os.cpu_count', lambda: 8)
+    sized = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                        'ANALYSIS_WORKERS': None, 'WEB_WORKERS': 4})
+
+    assert sized.extensions['analysis_worker'].max_workers == 2
@@ -0,0 +1,92 @@
+import io
+import os
+import pytest
+from PIL import Image
+from modules.blob_store import BlobStore
+from modules.thumbnails import ThumbnailStore
+
+def as_owner(owner_id):
+    return {'X-Owner-Id': str(owner_id)}
+
+def jpeg_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (600, 400), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+@pytest.fixture
+def store(app, tmp_path):
+    """Blob store, asset server and thumbnails on a scratch static folder"""
+    store = BlobStore(str(tmp_path), 'uploads')
+    app.extensions['blob_store'] = store
+    app.extensions['asset_server'].static_folder = str(tmp_path)
+    app.extensions['thumbnail_store'] = ThumbnailStore(store, (200, 400))
+    return store
+
+def write(store, name, data):
+    with open(os.path.join(store.directory, *name.split('/')), 'wb') as f:
+        f.write(data)
+    return 'uploads/' + name
+
+def test_owner_uploads_are_private_and_immutable(client, store):
+    path = store.put(jpeg_bytes('red'), 'shirt.jpg', shard='u1')
+
+    response = client.get('/static/' + path, headers=as_owner(1))
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, max-age=31536000, immutable'
+    assert response.headers['ETag'].strip('"') == os.path.basename(path).replace('.', '-')
+
+def test_another_owners_upload_is_not_found(client, store):
+    path = store.put(jpeg_bytes('red'), 'shirt.jpg', shard='u1')
+    etag = os.path.basename(path).replace('.', '-')
+
+    assert client.get('/static/' + path, headers=as_owner(2)).status_code == 404
+    # Knowing the ETag does not help either
+    assert client.get('/static/' + path, headers={**as_owner(2), 'If-None-Match': f'"{etag}"'}).status_code == 404
+
+@pytest.mark.parametrize('mode, header', [('x-accel-redirect', 'X-Accel-Redirect'), ('x-sendfile', 'X-Sendfile')])
+def test_sendfile_modes_check_the_owner_first(app, client, store, mode, header):
+    app.extensions['asset_server'].sendfile = mode
+    path = store.put(jpeg_bytes('red'), 'shirt.jpg', shard='u1')
+
+    denied = client.get('/static/' + path, headers=as_owner(2))
+    allowed = client.get('/static/' + path, headers=as_owner(1))
+
+    assert denied.status_code == 404 and header not in denied.headers
+    assert allowed.status_code == 200 and header in allowed.headers
+    assert allowed.get_data() == b''
+
+def test_matching_etag_is_not_modified(client, store):
+    path = store.put(jpeg_bytes('red'), 'shirt.jpg', shard='u1')
+    etag = client.get('/static/' + path, headers=as_owner(1)).headers['ETag']
+
+    response = client.get('/static/' + path, headers={**as_owner(1), 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+
+def test_generated_files_are_revalidated(client, store):
+    os.makedirs(os.path.join(store.directory, 'u1'))
+    shared = write(store, 'color_analysis_1.png', b'first')
+    owned = write(store, 'u1/color_analysis_2.png', b'second')
+
+    first = client.get('/static/' + shared)
+    assert first.headers['Cache-Control'] == 'public, no-cache'
+    assert client.get('/static/' + owned).headers['Cache-Control'] == 'private, no-cache'
+
+    # The ETag follows the content of files rewritten in place
+    write(store, 'color_analysis_1.png', b'changed')
+    assert client.get('/static/' + shared, headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+def test_thumbnails_are_only_generated_for_the_owner(client, store):
+    path = store.put(jpeg_bytes('blue'), 'shirt.jpg', shard='u1')
+    url = f'/thumbnails/200/jpeg/{path}'
+
+    assert client.get(url, headers=as_owner(2)).status_code == 404
+    assert not os.path.exists(os.path.join(store.directory, 'u1', 'thumbs'))
+
+    response = client.get(url, headers=as_owner(1))
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['Cache-Control'] == 'private, max-age=31536000, immutable'
@@ -0,0 +1,90 @@
+import os
+import pytest
+from modules.blob_store import BlobStore
+from modules.database import db
+from modules.models import WardrobeItem
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path), 'uploads')
+
+def files_under(store):
+    return sorted(os.path.relpath(os.path.join(root, name), store.directory).replace(os.sep, '/')
+                  for root, _, names in os.walk(store.directory) for name in names)
+
+def test_identical_uploads_share_one_blob_per_shard(store):
+    first = store.put(b'image', 'a.JPG', shard='u1')
+    second = store.put(b'image', 'b.jpg', shard='u1')
+    other_owner = store.put(b'image', 'a.jpg', shard='u2')
+
+    assert first == second
+    assert first.startswith('uploads/u1/') and first.endswith('.jpg')
+    assert other_owner.startswith('uploads/u2/')
+    assert len(files_under(store)) == 2
+
+def test_release_keeps_a_blob_that_is_still_referenced(store):
+    path = store.put(b'image', 'a.jpg', shard='u1')
+
+    assert not store.release(path, lambda: 1)
+    assert os.path.exists(store.absolute_path(path))
+
+    assert store.release(path, lambda: 0)
+    assert files_under(store) == []
+
+def test_release_puts_back_a_blob_reused_while_it_was_released(store):
+    path = store.put(b'image', 'a.jpg', shard='u1')
+    # An upload of the same content commits between the two counts
+    counts = iter([0, 1])
+
+    assert not store.release(path, lambda: next(counts))
+    assert files_under(store) == [path.removeprefix('uploads/')]
+
+def test_ensure_rewrites_a_blob_released_before_the_upload_committed(store):
+    path = store.put(b'image', 'a.jpg', shard='u1')
+    store.release(path, lambda: 0)
+
+    assert store.ensure(path, lambda: b'image')
+    assert not store.ensure(path, lambda: pytest.fail('read an existing blob'))
+    with open(store.absolute_path(path), 'rb') as f:
+        assert f.read() == b'image'
+
+def test_compact_copies_legacy_uploads_into_each_owners_shard(store):
+    for name, data in (('shirt.jpg', b'shirt'), ('shirt copy.jpg', b'shirt'), ('orphan.png', b'orphan')):
+        with open(os.path.join(store.directory, name), 'wb') as f:
+            f.write(data)
+
+    mapping, stats, originals = store.compact({'shirt.jpg': {'u1', 'u2'}, 'shirt copy.jpg': {'u1'}})
+
+    assert mapping[('shirt.jpg', 'u1')] == mapping[('shirt copy.jpg', 'u1')]
+    assert mapping[('shirt.jpg', 'u2')].startswith('uploads/u2/')
+    assert '/' not in mapping[('orphan.png', None)].removeprefix('uploads/')
+    assert stats['files'] == 3 and stats['duplicates'] == 1
+
+    # Nothing is removed until the caller has committed the new paths
+    assert all(os.path.exists(path) for path in originals)
+    store.remove_files(originals)
+    assert sorted(files_under(store)) == sorted(path.removeprefix('uploads/') for path in set(mapping.values()))
+
+def test_compact_dry_run_changes_nothing(store):
+    with open(os.path.join(store.directory, 'shirt.jpg'), 'wb') as f:
+        f.write(b'shirt')
+
+    mapping, stats, _ = store.compact({'shirt.jpg': {'u1'}}, dry_run=True)
+
+    assert files_under(store) == ['shirt.jpg']
+    assert mapping[('shirt.jpg', 'u1')].startswith('uploads/u1/')
+
+def test_deleting_an_item_keeps_a_blob_another_item_shares(app, client, store):
+    app.extensions['blob_store'] = store
+    path = store.put(b'shared image', 'shirt.jpg', shard='u1')
+    with app.app_context():
+        items = [WardrobeItem('shirt', 'tops', 'Black', 'all', path) for _ in range(2)]
+        db.session.add_all(items)
+        db.session.commit()
+        first, second = [item.id for item in items]
+
+    client.post(f'/delete-item/{first}')
+    assert os.path.exists(store.absolute_path(path))
+
+    client.post(f'/delete-item/{second}')
+    assert not os.path.exists(store.absolute_path(path))
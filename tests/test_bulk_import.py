@@ -0,0 +1,42 @@
+import os
+from concurrent.futures import Future
+import pytest
+from modules.blob_store import BlobStore
+from modules.bulk_import import BulkImporter
+
+class InlineAnalysis:
+    """Stands in for AnalysisWorker: every image is a black top"""
+    max_workers = 1
+
+    def analyze_async(self, image_path):
+        future = Future()
+        future.set_result({'name': 'Black top', 'category': 'tops', 'color': 'Black', 'features': {}})
+        return future
+
+@pytest.fixture
+def importer(tmp_path):
+    return BulkImporter(BlobStore(str(tmp_path), 'uploads'), InlineAnalysis(), batch_size=2)
+
+def blobs(importer):
+    return [name for _, _, names in os.walk(importer.blob_store.directory) for name in names]
+
+def test_import_stores_one_blob_per_distinct_image(app, importer):
+    files = [('a.jpg', lambda: b'one'), ('b.jpg', lambda: b'two'), ('c.jpg', lambda: b'one')]
+    with app.app_context():
+        results = importer.import_files(files)
+
+    assert [result['status'] for result in results] == ['imported'] * 3
+    assert len(blobs(importer)) == 2
+
+def test_failed_batch_releases_its_blobs(app, importer, monkeypatch):
+    def insert(rows):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(importer, '_insert', insert)
+
+    files = [('a.jpg', lambda: b'one'), ('b.jpg', lambda: b'two'), ('c.jpg', lambda: b'three')]
+    with app.app_context():
+        results = importer.import_files(files)
+
+    assert [result['status'] for result in results] == ['error'] * 3
+    assert results[0]['error'] == 'Database error: disk full'
+    assert blobs(importer) == []
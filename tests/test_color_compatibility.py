@@ -0,0 +1,61 @@
+import itertools
+import json
+from app import create_app
+from modules import outfit_generator
+from modules.color_compatibility import CompatibilityMatrix, get_compatibility
+
+# The rules as they were hard-coded in outfit_generator.py before they moved to data/
+BASELINE_COMPATIBILITY = {
+    'Black': ['White', 'Gray', 'Red', 'Blue', 'Green', 'Purple', 'Pink', 'Yellow', 'Orange'],
+    'White': ['Black', 'Gray', 'Blue', 'Red', 'Purple', 'Pink', 'Green', 'Brown'],
+    'Gray': ['Black', 'White', 'Blue', 'Red', 'Purple', 'Pink'],
+    'Blue': ['White', 'Gray', 'Black', 'Beige', 'Brown', 'Green', 'Purple'],
+    'Red': ['Black', 'White', 'Gray', 'Beige', 'Brown'],
+    'Green': ['Black', 'White', 'Beige', 'Brown', 'Blue', 'Gray'],
+    'Purple': ['White', 'Gray', 'Black', 'Pink', 'Blue'],
+    'Pink': ['White', 'Gray', 'Black', 'Purple', 'Blue'],
+    'Yellow': ['Black', 'Blue', 'Purple', 'Gray'],
+    'Orange': ['Black', 'Blue', 'White', 'Gray'],
+    'Brown': ['White', 'Blue', 'Green', 'Beige', 'Gray'],
+    'Beige': ['Brown', 'Blue', 'Green', 'Red', 'Black']
+}
+
+def baseline_compatible(color1, color2):
+    """OutfitGenerator._are_colors_compatible as it was before the matrix"""
+    if color1 == color2:
+        return True
+    if color1 in BASELINE_COMPATIBILITY and color2 in BASELINE_COMPATIBILITY[color1]:
+        return True
+    return color2 in BASELINE_COMPATIBILITY and color1 in BASELINE_COMPATIBILITY[color2]
+
+def test_shipped_rules_match_the_baseline_for_every_pair():
+    matrix = CompatibilityMatrix.from_file()
+    # Every rule color, plus names the rules do not know (other spellings, analyzer shades)
+    colors = sorted(BASELINE_COMPATIBILITY) + ['black', 'Navy Blue', 'Maroon', 'Grey', '']
+
+    assert matrix.rules == BASELINE_COMPATIBILITY
+    for color1, color2 in itertools.product(colors, repeat=2):
+        assert matrix.compatible(color1, color2) == baseline_compatible(color1, color2), (color1, color2)
+
+def test_mask_matches_pairwise_compatibility():
+    matrix = CompatibilityMatrix.from_file()
+    candidates = sorted(BASELINE_COMPATIBILITY) + ['Teal']
+    candidate_ids = matrix.color_ids(candidates)
+
+    for anchors in itertools.combinations(sorted(BASELINE_COMPATIBILITY), 2):
+        mask = matrix.mask(matrix.color_ids(anchors), candidate_ids)
+        expected = [any(baseline_compatible(anchor, color) for anchor in anchors) for color in candidates]
+        assert mask.tolist() == expected, anchors
+
+def test_each_app_uses_its_own_rules(app, tmp_path):
+    rules_file = tmp_path / 'rules.json'
+    rules_file.write_text(json.dumps({'compatible': {'Red': ['Green']}}))
+    other = create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                        'COLOR_COMPATIBILITY_FILE': str(rules_file)})
+
+    with other.app_context():
+        assert get_compatibility().compatible('Red', 'Green')
+        assert outfit_generator.COLOR_COMPATIBILITY == {'Red': ['Green']}
+    with app.app_context():
+        assert not get_compatibility().compatible('Red', 'Green')
+        assert outfit_generator.COLOR_COMPATIBILITY is get_compatibility().rules
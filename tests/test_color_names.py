@@ -0,0 +1,57 @@
+import itertools
+import numpy as np
+import pytest
+from modules.color_names import COLOR_NAMES, LUT_LEVELS, ColorNamer, rgb_to_lab
+
+# Every 16th value of each channel, plus the extremes
+GRID = np.array(list(itertools.product(list(range(0, 256, 16)) + [255], repeat=3)), dtype=np.float64)
+
+def brute_force_name(rgb, space):
+    """Nearest named color by looping over the palette, as the original analyzer did"""
+    convert = rgb_to_lab if space == 'lab' else np.asarray
+    point = convert(np.array([rgb], dtype=np.float64))[0]
+    distances = [np.linalg.norm(point - convert(np.array([color], dtype=np.float64))[0]) for color in COLOR_NAMES]
+    return list(COLOR_NAMES.values())[int(np.argmin(distances))]
+
+@pytest.mark.parametrize('space', ['rgb', 'lab'])
+def test_exact_namer_matches_a_brute_force_search(space):
+    namer = ColorNamer(space=space)
+    sample = GRID[::37]
+
+    assert namer.name_many(sample) == [brute_force_name(rgb, space) for rgb in sample]
+
+@pytest.mark.parametrize('space', ['rgb', 'lab'])
+def test_lut_agrees_with_the_exact_namer_at_cell_centers(space):
+    step = 256 // LUT_LEVELS
+    centers = np.arange(LUT_LEVELS) * step + step // 2
+    cells = np.array(list(itertools.product(centers, repeat=3)), dtype=np.float64)
+
+    exact = ColorNamer(space=space).nearest_indices(cells)
+    lut = ColorNamer(space=space, use_lut=True).nearest_indices(cells)
+
+    assert (lut == exact).all()
+
+@pytest.mark.parametrize('space', ['rgb', 'lab'])
+def test_lut_is_within_one_cell_of_the_exact_namer_on_a_grid(space):
+    exact_namer = ColorNamer(space=space)
+    lut_namer = ColorNamer(space=space, use_lut=True)
+    exact = exact_namer.nearest_indices(GRID)
+    lut = lut_namer.nearest_indices(GRID)
+
+    # The grid points sit on cell corners, as far from the cell centers as possible
+    assert (lut == exact).mean() >= 0.85
+    # Where they differ, the LUT picked the color nearest to the cell center,
+    # so it is at most twice the query-to-center distance farther away
+    step = 256 // LUT_LEVELS
+    cell_centers = (np.clip(GRID, 0, 255).astype(np.int64) // step) * step + step // 2
+    points, centers = exact_namer._convert(GRID), exact_namer._convert(cell_centers)
+    to_lut = np.linalg.norm(points - exact_namer.points[lut], axis=1)
+    to_exact = np.linalg.norm(points - exact_namer.points[exact], axis=1)
+    assert (to_lut - to_exact <= 2 * np.linalg.norm(points - centers, axis=1) + 1e-9).all()
+
+def test_single_and_batch_naming_agree():
+    namer = ColorNamer()
+    sample = GRID[::101]
+
+    assert namer.name_many(sample) == [namer.name(rgb) for rgb in sample]
+    assert [namer.name(rgb) for rgb in COLOR_NAMES] == list(COLOR_NAMES.values())
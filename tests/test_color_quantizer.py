@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from PIL import Image
+from modules.color_quantizer import QUANTIZERS, quantize, get_default_method, set_default_method
+
+# Five clearly separated colors, in stripes of different widths (shares 40/25/15/12/8%)
+STRIPES = [((200, 30, 30), 40), ((30, 30, 180), 25), ((240, 240, 240), 15), ((30, 140, 50), 12), ((20, 20, 20), 8)]
+
+def striped_pixels(noise=6, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = np.concatenate([np.tile(color, (width, 1)) for color, width in STRIPES])
+    image = np.repeat(columns[None, :, :], 60, axis=0).astype(np.float64)
+    return np.clip(image + rng.normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+
+@pytest.mark.parametrize('method', sorted(QUANTIZERS))
+def test_every_backend_returns_a_palette_covering_every_pixel(method):
+    pixels = striped_pixels().reshape(-1, 3)
+
+    centers, counts = quantize(pixels, n_colors=5, method=method)
+
+    assert centers.shape == (5, 3) and counts.shape == (5,)
+    assert counts.sum() == len(pixels)
+    assert ((centers >= 0) & (centers <= 255)).all()
+
+@pytest.mark.parametrize('method', ['minibatch', 'sklearn'])
+def test_kmeans_backends_find_the_five_stripes(method):
+    # Median cut splits boxes by pixel count, so it may merge the small stripes
+    pixels = striped_pixels().reshape(-1, 3)
+
+    centers, counts = quantize(pixels, n_colors=5, method=method)
+
+    # Each stripe is matched by one center, holding the stripe's share of the pixels
+    for color, width in STRIPES:
+        nearest = np.linalg.norm(centers - np.array(color), axis=1).argmin()
+        assert np.linalg.norm(centers[nearest] - np.array(color)) < 25
+        assert counts[nearest] / counts.sum() == pytest.approx(width / 100, abs=0.02)
+
+@pytest.mark.parametrize('method', sorted(QUANTIZERS))
+def test_dominant_colors_are_weighted_and_sum_to_100(tmp_path, method):
+    from modules.garment_analyzer import extract_dominant_colors
+    path = tmp_path / 'stripes.png'
+    Image.fromarray(striped_pixels()).save(path)
+
+    colors = extract_dominant_colors(str(path), n_colors=5, method=method)
+
+    assert len(colors) == 5
+    assert sum(color['percentage'] for color in colors) == pytest.approx(100.0)
+    assert [color['percentage'] for color in colors] == sorted((color['percentage'] for color in colors), reverse=True)
+    assert all(color['name'] and len(color['rgb']) == 3 for color in colors)
+
+def test_unknown_backends_are_rejected():
+    with pytest.raises(ValueError):
+        quantize(np.zeros((4, 3)), method='octree')
+    with pytest.raises(ValueError):
+        set_default_method('octree')
+    assert get_default_method() in QUANTIZERS
@@ -0,0 +1,70 @@
+from sqlalchemy import insert
+from modules.database import db, count_queries
+from modules.feature_store import get_feature_store
+from modules.models import WardrobeItem
+from modules.wardrobe_index import bump_versions
+
+def add_item(name, owner_id=1):
+    item = WardrobeItem(name, 'tops', 'Black', 'all', f'uploads/{name}.jpg', owner_id=owner_id)
+    db.session.add(item)
+    db.session.commit()
+    return item.id
+
+def ids(partition):
+    return sorted(partition.matrix().ids.tolist())
+
+def test_each_owner_has_their_own_matrix(app):
+    with app.test_request_context():
+        shirt = add_item('shirt', owner_id=1)
+        coat = add_item('coat', owner_id=2)
+        store = get_feature_store()
+
+        assert ids(store.for_owner(1)) == [shirt]
+        assert ids(store.for_owner(2)) == [coat]
+
+def test_a_write_only_replaces_the_writers_matrix(app):
+    with app.test_request_context():
+        add_item('shirt', owner_id=1)
+        add_item('coat', owner_id=2)
+        store = get_feature_store()
+        first, second = store.for_owner(1).matrix(), store.for_owner(2).matrix()
+
+    with app.test_request_context():
+        hat = add_item('hat', owner_id=1)
+        with count_queries() as counter:
+            updated = store.for_owner(1).matrix()
+            untouched = store.for_owner(2).matrix()
+
+        # Applied in place: no reload, only the once-per-request version checks
+        assert counter.count == 2
+        assert updated is not first and hat in updated.ids.tolist()
+        assert untouched is second
+
+def test_changes_committed_by_another_process_are_seen_on_the_next_request(app):
+    with app.test_request_context():
+        add_item('shirt')
+        partition = get_feature_store().for_owner(1)
+        assert len(partition.matrix()) == 1
+
+    # Another process inserts an item: plain SQL on its own connection, plus the version bump
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(insert(WardrobeItem.__table__).values(
+            owner_id=1, name='scarf', category='accessories', color='Red', season='all',
+            image_path='uploads/scarf.jpg', status='ready'))
+        bump_versions(connection, [1])
+
+    with app.test_request_context():
+        assert len(partition.matrix()) == 2
+
+def test_an_item_moved_to_another_owner_leaves_the_first_matrix(app):
+    with app.test_request_context():
+        item_id = add_item('shirt', owner_id=1)
+        store = get_feature_store()
+        assert ids(store.for_owner(1)) == [item_id]
+        assert ids(store.for_owner(2)) == []
+
+        db.session.get(WardrobeItem, item_id).owner_id = 2
+        db.session.commit()
+
+        assert ids(store.for_owner(1)) == []
+        assert ids(store.for_owner(2)) == [item_id]
@@ -0,0 +1,84 @@
+import threading
+import numpy as np
+import pytest
+from modules import garment_classifier
+from modules.garment_classifier import (MicroBatcher, FALLBACK_CATEGORY, classify_garment, configure_classifier,
+                                        preprocess)
+
+class RecordingModel:
+    """Stands in for GarmentClassifier.predict: labels each item by its value, remembering the batches"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def predict(self, items):
+        with self.lock:
+            self.batches.append(len(items))
+        if self.fail:
+            raise RuntimeError('model crashed')
+        return [(f'category {item}', 0.9) for item in items]
+
+def test_concurrent_submits_are_batched_in_order():
+    model = RecordingModel()
+    batcher = MicroBatcher(model.predict, max_batch_size=8, max_wait_ms=200)
+
+    futures = [batcher.submit(n) for n in range(8)]
+
+    assert [future.result(timeout=5) for future in futures] == [(f'category {n}', 0.9) for n in range(8)]
+    assert model.batches == [8]
+    assert batcher.stats()[8]['items'] == 8
+
+def test_batches_never_exceed_the_maximum_size():
+    model = RecordingModel()
+    batcher = MicroBatcher(model.predict, max_batch_size=3, max_wait_ms=200)
+    results = [None] * 10
+
+    def call(n):
+        results[n] = batcher(n)
+
+    threads = [threading.Thread(target=call, args=(n,)) for n in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results == [(f'category {n}', 0.9) for n in range(10)]
+    assert sum(model.batches) == 10 and max(model.batches) <= 3 and len(model.batches) < 10
+
+def test_a_failed_batch_fails_its_callers_and_the_batcher_keeps_running():
+    model = RecordingModel(fail=True)
+    batcher = MicroBatcher(model.predict, max_batch_size=4, max_wait_ms=50)
+
+    with pytest.raises(RuntimeError):
+        batcher(1)
+    model.fail = False
+    assert batcher(2) == ('category 2', 0.9)
+
+def test_classification_falls_back_to_tops_on_an_error(monkeypatch):
+    model = RecordingModel(fail=True)
+    monkeypatch.setattr(garment_classifier, '_classifier', model)
+    monkeypatch.setattr(garment_classifier, '_batcher', MicroBatcher(model.predict, max_wait_ms=1))
+    image = np.zeros((32, 32, 3), dtype=np.uint8)
+
+    assert classify_garment(image) == (FALLBACK_CATEGORY, None) == ('tops', None)
+
+    # Unbatched calls fall back the same way
+    monkeypatch.setattr(garment_classifier, '_batcher', None)
+    assert classify_garment(image) == ('tops', None)
+
+def test_no_model_means_the_fallback_category(monkeypatch, tmp_path):
+    monkeypatch.setattr(garment_classifier, '_classifier', None)
+    monkeypatch.setattr(garment_classifier, '_batcher', None)
+
+    assert configure_classifier(model_path=str(tmp_path / 'missing.pt')) is None
+    assert classify_garment(np.zeros((8, 8, 3), dtype=np.uint8)) == ('tops', None)
+
+def test_preprocess_produces_a_normalized_square_tensor():
+    image = np.full((120, 80, 3), 255, dtype=np.uint8)
+
+    tensor = preprocess(image, input_size=64)
+
+    assert tensor.shape == (3, 64, 64) and tensor.dtype == np.float32
+    assert tensor[0].max() == pytest.approx((1 - 0.485) / 0.229, rel=1e-3)
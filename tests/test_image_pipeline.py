@@ -0,0 +1,59 @@
+import io
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from modules import image_pipeline
+from modules.image_pipeline import ImagePipeline
+
+def jpeg_bytes(width, height):
+    pixels = np.zeros((height, width, 3), dtype=np.uint8)
+    pixels[:, :width // 2] = (200, 30, 30)
+    pixels[:, width // 2:] = (30, 30, 200)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+@pytest.mark.parametrize('width, height, decoded', [
+    (4000, 3200, (500, 400)),   # 1/8: the short side lands exactly on 400
+    (3000, 2000, (750, 500)),   # 1/4, since 1/8 would leave 250
+    (1000, 900, (500, 450)),    # 1/2
+    (700, 500, (700, 500)),     # Full size, any reduction would go under 400
+    (300, 200, (300, 200)),     # Already small
+])
+def test_reduced_decode_keeps_the_short_side_at_least_400(width, height, decoded):
+    image = ImagePipeline(jpeg_bytes(width, height)).image
+
+    assert (image.shape[1], image.shape[0]) == decoded
+    assert min(image.shape[:2]) >= min(400, width, height)
+
+def test_target_size_controls_the_reduction():
+    image = ImagePipeline(jpeg_bytes(4000, 3200), target_size=1000).image
+
+    assert image.shape[:2] == (1600, 2000)
+
+def test_decoded_image_is_rgb():
+    image = ImagePipeline(jpeg_bytes(800, 800)).image
+    height, width = image.shape[:2]
+
+    assert tuple(image[height // 2, width // 8]) == pytest.approx((200, 30, 30), abs=8)
+    assert tuple(image[height // 2, width * 7 // 8]) == pytest.approx((30, 30, 200), abs=8)
+
+def test_the_image_is_decoded_once_for_every_variant(monkeypatch):
+    calls = []
+    original = cv2.imdecode
+    monkeypatch.setattr(image_pipeline.cv2, 'imdecode', lambda *args: calls.append(args) or original(*args))
+    pipeline = ImagePipeline(jpeg_bytes(1200, 900))
+
+    small = pipeline.fit(300)
+    assert pipeline.fit(300) is small
+    wide = pipeline.fit_width(400)
+    pixels = pipeline.pixels(300)
+
+    assert len(calls) == 1
+    assert max(small.shape[:2]) == 300 and wide.shape[1] == 400
+    assert pixels.shape == (small.shape[0] * small.shape[1], 3)
+
+def test_unreadable_data_raises():
+    with pytest.raises(Exception, match='Could not read image'):
+        ImagePipeline(b'not an image', filename='broken.jpg').image
@@ -0,0 +1,83 @@
+import re
+import pytest
+from app import create_app
+from modules.database import db, count_queries
+from modules.models import WardrobeItem
+
+SAMPLE = re.compile(r'^(?P<name>[a-z_]+)(\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+def parse_metrics(text):
+    """Prometheus text format -> {(name, frozenset of label pairs): value}; fails on malformed lines"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP|TYPE) [a-z_]+ .+$', line), line
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        labels = frozenset(re.findall(r'(\w+)="([^"]*)"', match.group('labels') or ''))
+        samples[(match.group('name'), labels)] = float(match.group('value'))
+    return samples
+
+def sample(samples, name, **labels):
+    return samples.get((name, frozenset(labels.items())), 0)
+
+@pytest.fixture
+def timed_app(app):
+    """The test application with Server-Timing headers enabled"""
+    return create_app({**{key: app.config[key] for key in ('SQLALCHEMY_DATABASE_URI', 'ANALYSIS_WORKERS',
+                                                           'ANALYSIS_CACHE_FILE', 'TENANT_HEADER')},
+                       'TESTING': True, 'SERVER_TIMING': True})
+
+def test_metrics_are_served_in_the_prometheus_text_format(client):
+    before = parse_metrics(client.get('/metrics').get_data(as_text=True))
+    client.get('/api/wardrobe')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    text = response.get_data(as_text=True)
+    assert '# TYPE fashion_advisor_request_duration_seconds histogram' in text
+    after = parse_metrics(text)
+
+    labels = {'method': 'GET', 'endpoint': 'wardrobe_api', 'status': '200'}
+    name = 'fashion_advisor_request_duration_seconds'
+    assert sample(after, f'{name}_count', **labels) == sample(before, f'{name}_count', **labels) + 1
+    # Buckets are cumulative and end with +Inf, which equals the count
+    buckets = sorted((float(dict(key[1])['le']), value) for key, value in after.items()
+                     if key[0] == f'{name}_bucket' and set(labels.items()) < key[1])
+    assert [value for _, value in buckets] == sorted(value for _, value in buckets)
+    assert buckets[-1] == (float('inf'), sample(after, f'{name}_count', **labels))
+
+def test_server_timing_reports_the_requests_queries(timed_app):
+    with timed_app.app_context():
+        db.session.add(WardrobeItem('shirt', 'tops', 'Black', 'all', 'uploads/shirt.jpg'))
+        db.session.commit()
+    client = timed_app.test_client()
+    client.get('/api/wardrobe')  # The first request also resumes analysis jobs
+
+    with timed_app.app_context(), count_queries() as counter:
+        response = client.get('/api/wardrobe')
+
+    entries = dict(entry.split(';', 1) for entry in response.headers['Server-Timing'].split(', '))
+    assert set(entries) >= {'db', 'total'}
+    queries = re.match(r'desc="(\d+) queries";dur=[\d.]+$', entries['db'])
+    assert queries and int(queries.group(1)) == counter.count > 0
+    assert re.match(r'dur=[\d.]+$', entries['total'])
+
+def test_queries_per_request_are_recorded_by_endpoint(timed_app):
+    client = timed_app.test_client()
+    client.get('/api/saved-outfits')
+    name = 'fashion_advisor_request_queries_count'
+    labels = {'method': 'GET', 'endpoint': 'saved_outfits_api'}
+    before = parse_metrics(client.get('/metrics').get_data(as_text=True))
+
+    queries = int(re.search(r'(\d+) queries', client.get('/api/saved-outfits').headers['Server-Timing']).group(1))
+    after = parse_metrics(client.get('/metrics').get_data(as_text=True))
+
+    assert sample(after, name, **labels) == sample(before, name, **labels) + 1
+    total = 'fashion_advisor_request_queries_sum'
+    assert sample(after, total, **labels) == sample(before, total, **labels) + queries
+
+def test_server_timing_is_off_by_default(client):
+    assert 'Server-Timing' not in client.get('/api/wardrobe').headers
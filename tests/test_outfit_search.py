@@ -0,0 +1,61 @@
+import itertools
+import pytest
+from modules.database import db
+from modules.models import WardrobeItem
+from modules.outfit_generator import OutfitGenerator, SEASON_CATEGORY_RULES, STYLE_COMPATIBILITY
+from modules.outfit_search import category_bonuses
+
+COLORS = ('Black', 'White', 'Navy', 'Beige')
+
+@pytest.fixture
+def wardrobe(app):
+    """Two items of every category and color, half for one season and half for all seasons"""
+    with app.app_context():
+        for category in ('tops', 'bottoms', 'outerwear', 'footwear', 'accessories'):
+            for n, color in enumerate(COLORS):
+                for season in SEASON_CATEGORY_RULES:
+                    db.session.add(WardrobeItem(f'{color} {category}', category, color, season if n % 2 else 'all',
+                                                f'uploads/{category}-{color}-{season}.jpg'))
+        db.session.commit()
+    return app
+
+def search_outfits(app, season, mode='top', count=40):
+    """The first count outfits the generator yields, without their scores"""
+    with app.test_request_context():
+        generator = OutfitGenerator(season=season)
+        assert generator.check() is None
+        return [outfit for _, outfit in itertools.islice(generator.iter_outfits(mode=mode, seed=1), count)]
+
+@pytest.mark.parametrize('season', ['Spring', 'Summer'])
+@pytest.mark.parametrize('mode', ['top', 'sample'])
+def test_spring_and_summer_outfits_never_have_outerwear(wardrobe, season, mode):
+    outfits = search_outfits(wardrobe, season, mode)
+
+    assert outfits
+    assert not any('outerwear' in outfit for outfit in outfits)
+
+@pytest.mark.parametrize('mode', ['top', 'sample'])
+def test_winter_outfits_always_have_outerwear(wardrobe, mode):
+    outfits = search_outfits(wardrobe, 'Winter', mode)
+
+    assert outfits
+    assert all('outerwear' in outfit for outfit in outfits)
+
+@pytest.mark.parametrize('season', ['Any', 'Spring', 'Summer', 'Fall', 'Winter'])
+def test_outfits_have_a_top_and_a_bottom_for_the_season(wardrobe, season):
+    for outfit in search_outfits(wardrobe, season, 'sample'):
+        assert {'tops', 'bottoms'} <= set(outfit)
+        if season != 'Any':
+            assert all(item.season in (season.lower(), 'all') for item in outfit.values())
+
+@pytest.mark.parametrize('season', sorted(SEASON_CATEGORY_RULES))
+def test_categories_follow_the_baseline_season_rules(season):
+    rules = SEASON_CATEGORY_RULES[season]
+
+    bonuses = category_bonuses(season, None, SEASON_CATEGORY_RULES, STYLE_COMPATIBILITY)
+
+    for category in ('outerwear', 'footwear', 'accessories'):
+        allowed = category in rules['include'] and category not in rules.get('exclude', ())
+        assert (category in bonuses) == allowed
+        if allowed:
+            assert bonuses[category][1] == (category in rules.get('required', ()))
@@ -0,0 +1,35 @@
+import pytest
+from modules.pagination import encode_cursor
+
+VALID_STATE = {'season': 'Summer', 'style': 'Any', 'color_scheme': None, 'mode': 'sample', 'seed': 7, 'offset': 3}
+
+@pytest.mark.parametrize('field, value', [
+    ('season', ['Summer']),
+    ('season', 'Monsoon'),
+    ('style', {'$ne': 'Casual'}),
+    ('color_scheme', 5),
+    ('mode', 'all'),
+    ('mode', None),
+    ('seed', '7'),
+    ('seed', True),
+    ('offset', -1),
+    ('offset', 1.5),
+    ('offset', None),
+])
+def test_tampered_cursor_is_a_bad_request(client, field, value):
+    cursor = encode_cursor(dict(VALID_STATE, **{field: value}))
+
+    response = client.get('/generate-outfits/stream', query_string={'cursor': cursor})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': f'Invalid {field}'}
+
+def test_valid_cursor_is_accepted(client):
+    response = client.get('/generate-outfits/stream', query_string={'cursor': encode_cursor(VALID_STATE)})
+
+    assert response.status_code == 200
+
+def test_unknown_filter_in_the_query_string_is_a_bad_request(client):
+    response = client.get('/generate-outfits/stream', query_string={'style': 'Pyjamas'})
+
+    assert response.status_code == 400
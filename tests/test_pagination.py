@@ -0,0 +1,162 @@
+import datetime
+import re
+import pytest
+from modules.database import db, count_queries
+from modules.models import WardrobeItem
+from modules.outfit_generator import SavedOutfit
+
+CATEGORIES = ('tops', 'bottoms', 'outerwear', 'footwear', 'accessories')
+
+def add_items(count, owner_id=1):
+    """Add wardrobe items; several share a date_added and some have none, to exercise the tie-breaks"""
+    base = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    items = []
+    for n in range(count):
+        item = WardrobeItem(f'item {n}', CATEGORIES[n % len(CATEGORIES)], 'Black', 'all', f'uploads/{n}.jpg',
+                            owner_id=owner_id)
+        items.append(item)
+    db.session.add_all(items)
+    db.session.flush()
+    for n, item in enumerate(items):
+        item.date_added = None if n % 7 == 3 else base + datetime.timedelta(seconds=n // 3)
+    db.session.commit()
+    return [item.id for item in items]
+
+def add_outfits(count, owner_id=1):
+    """Add saved outfits, each with its own items so lazy loads could not hit the identity map"""
+    base = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    outfit_ids = []
+    for n in range(count):
+        items = [WardrobeItem(f'{category} {n}', category, 'Black', 'all', f'uploads/{n}-{category}.jpg',
+                              owner_id=owner_id) for category in CATEGORIES]
+        db.session.add_all(items)
+        db.session.flush()
+        outfit = SavedOutfit(name=f'outfit {n}', top_id=items[0].id, bottom_id=items[1].id,
+                             outerwear_id=items[2].id, footwear_id=items[3].id, accessory_id=items[4].id,
+                             owner_id=owner_id)
+        db.session.add(outfit)
+        db.session.flush()
+        # Runs of outfits saved in the same second, plus a few without a date
+        outfit.date_created = None if n % 6 == 5 else base + datetime.timedelta(seconds=n // 4)
+        outfit_ids.append(outfit.id)
+    db.session.commit()
+    return outfit_ids
+
+def expected_order(rows):
+    """(date, id) pairs sorted newest first, NULL dates last"""
+    dated = sorted((row for row in rows if row[0] is not None), reverse=True)
+    undated = sorted((row for row in rows if row[0] is None), key=lambda row: -row[1])
+    return [row_id for _, row_id in dated + undated]
+
+def walk_json(client, url, key, limit):
+    """Follow next_cursor from the first page to the last; return the IDs of every page"""
+    pages = []
+    cursor = None
+    while True:
+        response = client.get(url, query_string={'limit': limit, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        data = response.get_json()
+        pages.append([row['id'] for row in data[key]])
+        cursor = data['next_cursor']
+        if cursor is None:
+            return pages
+        assert len(pages) <= 100, 'pagination does not terminate'
+
+def test_saved_outfits_api_walks_every_outfit_once(app, client):
+    with app.app_context():
+        outfit_ids = add_outfits(23)
+        expected = expected_order([(outfit.date_created, outfit.id) for outfit in SavedOutfit.query.all()])
+
+    pages = walk_json(client, '/api/saved-outfits', 'outfits', limit=4)
+
+    assert [len(page) for page in pages] == [4, 4, 4, 4, 4, 3]
+    assert [outfit_id for page in pages for outfit_id in page] == expected
+    assert sorted(expected) == sorted(outfit_ids)
+
+def test_saved_outfits_page_follows_older_links_to_the_end(app, client):
+    app.config['SAVED_OUTFITS_PAGE_SIZE'] = 5
+    with app.app_context():
+        outfit_ids = add_outfits(17)
+
+    seen = []
+    url = '/saved-outfits'
+    for _ in range(10):
+        html = client.get(url).get_data(as_text=True)
+        seen.extend(int(outfit_id) for outfit_id in re.findall(r'/delete-outfit/(\d+)', html))
+        older = re.search(r'href="(/saved-outfits\?cursor=[^"]+)"', html)
+        if older is None:
+            break
+        url = older.group(1)
+    else:
+        pytest.fail('the Older link never ends')
+
+    assert len(seen) == len(set(seen)) == len(outfit_ids)
+    assert set(seen) == set(outfit_ids)
+
+def test_wardrobe_api_walks_every_item_once(app, client):
+    with app.app_context():
+        add_items(31)
+        expected = expected_order([(item.date_added, item.id) for item in WardrobeItem.query.all()])
+
+    pages = walk_json(client, '/api/wardrobe', 'items', limit=6)
+
+    assert [len(page) for page in pages] == [6, 6, 6, 6, 6, 1]
+    assert [item_id for page in pages for item_id in page] == expected
+
+def test_wardrobe_page_cursor_continues_where_the_api_left_off(app, client):
+    app.config['WARDROBE_PAGE_SIZE'] = 8
+    with app.app_context():
+        item_ids = add_items(20)
+
+    seen = []
+    cursor = ''
+    for _ in range(10):
+        html = client.get('/wardrobe', query_string={'cursor': cursor} if cursor else {}).get_data(as_text=True)
+        seen.extend(int(item_id) for item_id in re.findall(r'data-item-id="(\d+)"', html))
+        cursor = re.search(r'data-next-cursor="([^"]*)"', html).group(1)
+        if not cursor:
+            break
+    else:
+        pytest.fail('the wardrobe cursor never ends')
+
+    assert len(seen) == len(set(seen)) == len(item_ids)
+
+@pytest.mark.parametrize('url', ['/saved-outfits', '/api/saved-outfits', '/wardrobe', '/api/wardrobe'])
+def test_query_count_does_not_grow_with_the_listing(app, client, url):
+    counts = []
+    for total in (3, 40):
+        with app.app_context():
+            SavedOutfit.query.delete()
+            WardrobeItem.query.delete()
+            db.session.commit()
+            add_outfits(total)
+        client.get(url)  # The first request of a process may do one-off work
+
+        with app.app_context(), count_queries() as counter:
+            first = client.get(url)
+        assert first.status_code == 200
+        counts.append(counter.count)
+
+    assert counts[0] == counts[1]
+
+def test_deep_page_costs_the_same_as_the_first(app, client):
+    with app.app_context():
+        add_outfits(30)
+    cursor = client.get('/api/saved-outfits?limit=5').get_json()['next_cursor']
+    for _ in range(3):
+        cursor = client.get('/api/saved-outfits', query_string={'limit': 5, 'cursor': cursor}).get_json()['next_cursor']
+
+    with app.app_context(), count_queries() as first:
+        client.get('/api/saved-outfits?limit=5')
+    with app.app_context(), count_queries() as deep:
+        client.get('/api/saved-outfits', query_string={'limit': 5, 'cursor': cursor})
+
+    assert first.count == deep.count == 1
+
+@pytest.mark.parametrize('url', ['/api/saved-outfits', '/api/wardrobe'])
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'e30', 'eyJpZCI6Im5vIn0'])
+def test_malformed_cursor_is_a_bad_request(client, url, cursor):
+    response = client.get(url, query_string={'cursor': cursor})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from modules.color_names import COLOR_NAMES
+from modules.database import db
+from modules.feature_store import FeatureStore
+from modules.models import WardrobeItem
+from modules.palettes import encode_palette
+from modules.similarity import ExactIndex, LSHIndex, SimilaritySearch, palette_embeddings
+
+SHADES = {
+    'red': [(200, 20, 30), (170, 10, 20), (230, 60, 60)],
+    'blue': [(20, 40, 200), (10, 20, 150), (70, 100, 230)],
+    'green': [(30, 160, 40), (20, 110, 30), (90, 200, 90)],
+}
+
+def palette(rgb, accent=(240, 240, 240)):
+    """Analysis colors: one main color with a small light accent"""
+    return [{'rgb': list(rgb), 'percentage': 85.0}, {'rgb': list(accent), 'percentage': 15.0}]
+
+def random_palettes(n_items, seed=0):
+    """Palette blobs of garments in random shades of the analyzer's named colors"""
+    rng = np.random.default_rng(seed)
+    base = np.array(list(COLOR_NAMES.keys()), dtype=np.float64)
+    blobs = []
+    for _ in range(n_items):
+        main = base[rng.integers(len(base))]
+        colors = [main * rng.uniform(0.5, 1.1) if rng.random() > 0.3 else base[rng.integers(len(base))]
+                  for _ in range(5)]
+        weights = np.sort(rng.dirichlet(np.ones(5) * 0.8))[::-1] * 100
+        blobs.append(encode_palette([{'rgb': np.clip(rgb + rng.normal(0, 12, 3), 0, 255).tolist(), 'percentage': w}
+                                     for rgb, w in zip(colors, weights)]))
+    return blobs
+
+def store_with(rows_by_owner):
+    """FeatureStore whose partitions hold the given (id, blob, primary color ID) rows, without a database"""
+    store = FeatureStore(ttl=None)
+    for owner_id, rows in rows_by_owner.items():
+        store.for_owner(owner_id).load(rows)
+    return store
+
+def test_exact_search_returns_the_nearest_shades_first():
+    names = [name for name, shades in SHADES.items() for _ in shades]
+    palettes = np.stack([np.frombuffer(encode_palette(palette(rgb)), dtype=np.float32).reshape(5, 7)
+                         for shades in SHADES.values() for rgb in shades])
+    index = ExactIndex(palette_embeddings(palettes))
+
+    for row, name in enumerate(names):
+        rows, scores = index.search(index.embeddings[row], k=2, exclude=row)
+        assert row not in rows.tolist()
+        assert [names[other] for other in rows] == [name, name]
+        assert list(scores) == sorted(scores, reverse=True)
+
+def test_results_never_cross_owners():
+    # Owner 2 holds exact copies of owner 1's palettes, which would otherwise rank first
+    blobs = random_palettes(1000, seed=5)
+    store = store_with({1: [(item_id, blob, None) for item_id, blob in enumerate(blobs, start=1)],
+                        2: [(item_id, blob, None) for item_id, blob in enumerate(blobs, start=10001)]})
+    search = SimilaritySearch(store, approximate_threshold=None)
+
+    for approximate in (False, True):
+        found = []
+        for item_id in range(1, 21):
+            results = search.similar(item_id, owner_id=1, k=10, approximate=approximate)
+            assert all(other <= 1000 and other != item_id for other, _ in results)
+            found.extend(results)
+        # LSH may return fewer than k for an item in a sparse bucket, never for most
+        assert len(found) >= (200 if not approximate else 150)
+    with pytest.raises(KeyError):
+        search.similar(10001, owner_id=1)
+
+def test_lsh_keeps_most_of_the_exact_neighbours():
+    blobs = random_palettes(1000)
+    store = store_with({1: [(item_id, blob, None) for item_id, blob in enumerate(blobs, start=1)]})
+    # Forced low so the 1000-item wardrobe is searched approximately
+    approximate = SimilaritySearch(store, approximate_threshold=10)
+    exact = SimilaritySearch(store, approximate_threshold=None)
+
+    recalls = []
+    for item_id in np.random.default_rng(1).choice(len(blobs), size=100, replace=False) + 1:
+        truth = {other for other, _ in exact.similar(int(item_id), 1, k=10)}
+        found = {other for other, _ in approximate.similar(int(item_id), 1, k=10)}
+        recalls.append(len(truth & found) / len(truth))
+
+    assert approximate._built[1]['lsh'] is not None and exact._built[1]['lsh'] is None
+    assert np.mean(recalls) >= 0.65
+
+def test_lsh_candidates_always_include_identical_embeddings():
+    embeddings = palette_embeddings(np.stack([
+        np.frombuffer(blob, dtype=np.float32).reshape(5, 7) for blob in random_palettes(300, seed=3)]))
+    embeddings = np.concatenate([embeddings, embeddings[:10]])
+    lsh = LSHIndex(embeddings)
+
+    for row in range(10):
+        rows, scores = lsh.search(embeddings[row], k=1, exclude=row)
+        assert rows.tolist() == [300 + row]
+        assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+def test_similar_items_endpoint_ranks_the_owners_items(app, client):
+    with app.app_context():
+        items = []
+        for owner_id in (1, 2):
+            for name, shades in SHADES.items():
+                for rgb in shades:
+                    item = WardrobeItem(f'{name} {owner_id}', 'tops', name.title(), 'all', f'uploads/{name}.jpg',
+                                        owner_id=owner_id)
+                    item.set_features({'colors': palette(rgb)})
+                    items.append(item)
+        db.session.add_all(items)
+        db.session.commit()
+        red = items[0].id
+
+    data = client.get(f'/items/{red}/similar?k=2', headers={'X-Owner-Id': '1'}).get_json()
+
+    assert [entry['item']['name'] for entry in data['similar']] == ['red 1', 'red 1']
+    assert client.get(f'/items/{red}/similar', headers={'X-Owner-Id': '2'}).status_code == 404
@@ -0,0 +1,60 @@
+import json
+import pytest
+from modules.database import db
+from modules.models import WardrobeItem, AnalysisJob
+from modules.outfit_generator import SavedOutfit
+
+CATEGORIES = ('tops', 'bottoms', 'footwear')
+
+def as_owner(owner_id):
+    return {'X-Owner-Id': str(owner_id)}
+
+@pytest.fixture
+def wardrobes(app):
+    """A small wardrobe and one saved outfit for owners 1 and 2; returns their item IDs"""
+    ids = {}
+    with app.app_context():
+        for owner_id in (1, 2):
+            items = [WardrobeItem(f'owner {owner_id} {category}', category, 'Black', 'all',
+                                  f'uploads/u{owner_id}/{category}.jpg', owner_id=owner_id)
+                     for category in CATEGORIES]
+            db.session.add_all(items)
+            db.session.flush()
+            db.session.add(SavedOutfit(name=f'outfit of {owner_id}', top_id=items[0].id, bottom_id=items[1].id,
+                                       owner_id=owner_id))
+            db.session.add(AnalysisJob(item_id=items[0].id, status='done'))
+            ids[owner_id] = [item.id for item in items]
+        db.session.commit()
+    return ids
+
+def test_listings_only_show_the_owners_items(client, wardrobes):
+    for owner_id in (1, 2):
+        items = client.get('/api/wardrobe', headers=as_owner(owner_id)).get_json()['items']
+        outfits = client.get('/api/saved-outfits', headers=as_owner(owner_id)).get_json()['outfits']
+        counts = client.get('/api/wardrobe/counts', headers=as_owner(owner_id)).get_json()['counts']
+
+        assert sorted(item['id'] for item in items) == wardrobes[owner_id]
+        assert [outfit['name'] for outfit in outfits] == [f'outfit of {owner_id}']
+        assert sum(counts.values()) == len(CATEGORIES)
+
+def test_another_owners_items_cannot_be_touched(app, client, wardrobes):
+    item_id = wardrobes[1][0]
+
+    assert client.post(f'/delete-item/{item_id}', headers=as_owner(2)).status_code == 404
+    assert client.get(f'/items/{item_id}/similar', headers=as_owner(2)).status_code == 404
+    assert client.get(f'/items/{item_id}/similar', headers=as_owner(1)).status_code != 404
+    jobs = client.get('/jobs', query_string={'item_ids': item_id}, headers=as_owner(2)).get_json()['jobs']
+    assert jobs == []
+    with app.app_context():
+        assert db.session.get(WardrobeItem, item_id) is not None
+
+def test_outfits_are_made_from_the_owners_wardrobe(client, wardrobes):
+    response = client.get('/generate-outfits/stream', query_string={'mode': 'top', 'count': 5}, headers=as_owner(2))
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    item_ids = {item['id'] for line in lines if 'outfit' in line for item in line['outfit'].values()}
+    assert item_ids and item_ids <= set(wardrobes[2])
+
+@pytest.mark.parametrize('value', ['0', '-1', 'abc'])
+def test_invalid_owner_header_is_rejected(client, value):
+    assert client.get('/api/wardrobe', headers={'X-Owner-Id': value}).status_code == 400
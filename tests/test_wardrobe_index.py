@@ -0,0 +1,88 @@
+from sqlalchemy import insert
+from modules.database import db, count_queries
+from modules.models import WardrobeItem
+from modules.wardrobe_index import bump_versions, stored_version, get_wardrobe_index
+
+def add_item(name, owner_id=1):
+    item = WardrobeItem(name, 'tops', 'Black', 'all', f'uploads/{name}.jpg', owner_id=owner_id)
+    db.session.add(item)
+    db.session.commit()
+    return item.id
+
+def names(partition):
+    return sorted(item.name for item in partition.snapshot().items.values())
+
+def test_orm_changes_bump_the_owners_version_and_apply_in_place(app):
+    with app.test_request_context():
+        partition = get_wardrobe_index().for_owner(1)
+        assert names(partition) == []
+
+        item_id = add_item('shirt')
+        db.session.delete(db.session.get(WardrobeItem, item_id))
+        db.session.commit()
+        add_item('coat')
+
+        assert stored_version(1) == 3
+        assert stored_version(2) == 0
+        # This process made the changes, so the snapshot is current without a reload
+        assert partition._version == 3
+        assert names(partition) == ['coat']
+
+def test_changes_committed_by_another_process_are_seen_on_the_next_request(app):
+    with app.test_request_context():
+        partition = get_wardrobe_index().for_owner(1)
+        assert names(partition) == []
+
+    # Another process inserts an item: plain SQL on its own connection, plus the version bump
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(insert(WardrobeItem.__table__).values(
+            owner_id=1, name='scarf', category='accessories', color='Red', season='all',
+            image_path='uploads/scarf.jpg', status='ready'))
+        bump_versions(connection, [1])
+
+    with app.test_request_context():
+        assert names(partition) == ['scarf']
+
+def test_version_is_checked_once_per_request(app):
+    with app.app_context():
+        add_item('shirt')
+    with app.test_request_context():
+        partition = get_wardrobe_index().for_owner(1)
+        partition.snapshot()
+    with app.test_request_context(), count_queries() as counter:
+        for _ in range(5):
+            partition.snapshot()
+
+    assert counter.count == 1
+
+def test_bulk_statements_bump_every_affected_owner(app):
+    with app.app_context():
+        add_item('shirt', owner_id=1)
+        add_item('shirt', owner_id=2)
+        db.session.execute(insert(WardrobeItem), [
+            {'owner_id': 3, 'name': 'hat', 'category': 'accessories', 'color': 'Red', 'season': 'all',
+             'image_path': 'uploads/hat.jpg', 'status': 'ready'}])
+        db.session.commit()
+        assert [stored_version(owner_id) for owner_id in (1, 2, 3)] == [1, 1, 1]
+
+        WardrobeItem.query.filter_by(name='shirt').delete()
+        db.session.commit()
+        assert [stored_version(owner_id) for owner_id in (1, 2, 3)] == [2, 2, 2]
+
+def test_apps_on_different_databases_keep_their_own_index(app, tmp_path):
+    from app import create_app
+    other = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'other.db'),
+                        'ANALYSIS_WORKERS': 0, 'ANALYSIS_CACHE_FILE': None})
+    with other.app_context():
+        db.create_all()
+
+    for current, name in ((app, 'shirt'), (other, 'coat')):
+        with current.test_request_context():
+            assert names(get_wardrobe_index().for_owner(1)) == []
+            add_item(name)
+
+    with app.test_request_context():
+        assert names(get_wardrobe_index().for_owner(1)) == ['shirt']
+    with other.test_request_context():
+        assert names(get_wardrobe_index().for_owner(1)) == ['coat']
+        db.engine.dispose()